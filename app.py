@@ -1,20 +1,31 @@
+import time
+# Inicio del script, para medir cuanto tarda la pagina en estar lista
+inicio_script = time.perf_counter()
+
 import streamlit as st
-import speech_recognition as sr
-import whisper
-import tempfile
 import os
-import torch
-import openai
-import sqlite3
-import pandas as pd
 from dotenv import load_dotenv
-from io import BytesIO
+import importes
+from conexiones import get_connection
+from resultados import leer_pagina
+import visor_resultados as visor
+from cache_resultados import get_cache_resultados, leer_resultado_cacheado
+from plan_consulta import revisar as revisar_plan
+from exportar import FORMATOS, exportar
+import cache_reportes
+from esquema import get_db_schema
+import bases_datos
+from estadisticas_columnas import corregir_literales, enriquecer_esquema, get_estadisticas
+from cache_sql import get_cache_sql
+import modelos_audio
+from transcripcion import transcribir_audio
+from streaming_voz import FuenteMicrofono, transcribir_en_streaming
+from llm import get_backend, tomar_tokens
+import metricas
+from generacion_sql import generar_sql_en_streaming, validar_sql
+import trabajos
+from concurrent.futures import CancelledError
 from datetime import datetime
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 
 # Cargar variables de entorno
 load_dotenv()
@@ -217,181 +228,236 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Configurar OpenAI
+# Configurar OpenAI (no hace falta con VOICETOSQL_LLM=falso)
 api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
+if not api_key and os.getenv('VOICETOSQL_LLM', 'openai') == 'openai':
     st.error("OPENAI_API_KEY no encontrada. Asegurate de tener un archivo .env con OPENAI_API_KEY=tu_clave")
     st.stop()
-openai.api_key = api_key
 
-# Path a la base de datos
+# Path a la base de datos por defecto; las demas registradas (VOICETOSQL_BASES,
+# VOICETOSQL_DIR_BASES) se eligen segun la pregunta
 db_path = "identifier.sqlite"
+BASE_POR_DEFECTO = bases_datos.registrar(db_path)
+
+# Registra la base en el hilo que mantiene sus estadisticas de columnas (no bloquea)
+get_estadisticas(db_path)
+
+# Opcion del selector de base que deja elegirla segun la pregunta
+BASE_AUTOMATICA = "Automatica"
+
+# Filas por pagina en la tabla de resultados
+FILAS_POR_PAGINA = 500
+
+# Cada cuantos segundos se refresca el progreso de un trabajo en segundo plano
+INTERVALO_SONDEO = 0.5
+
+# Modelo de OpenAI usado para generar SQL
+MODELO_LLM = "gpt-3.5-turbo"
+
+# Modelo Whisper usado para transcribir (se precarga en segundo plano al final del script)
+MODELO_WHISPER = os.getenv("VOICETOSQL_WHISPER_MODEL", "tiny")
 
 # Funcion para cargar el modelo Whisper bajo demanda
+# (el modelo se comparte entre todas las sesiones del proceso)
 def get_audio_model():
-    if 'audio_model' not in st.session_state:
+    if not modelos_audio.is_loaded(MODELO_WHISPER):
         with st.spinner('Cargando modelo Whisper (solo la primera vez)...'):
-            st.session_state.audio_model = whisper.load_model("tiny")
-    return st.session_state.audio_model
-
-# Funcion para obtener el esquema de la BD
-def get_db_schema(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    schema = ""
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        col_names = [col[1] for col in columns]
-        schema += f"Tabla: {table_name}\nColumnas: {', '.join(col_names)}\n"
-    conn.close()
-    return schema
+            return modelos_audio.get_model(MODELO_WHISPER)
+    return modelos_audio.get_model(MODELO_WHISPER)
 
 # Funcion para grabar voz
 def grabar_voz():
-    audio_model = get_audio_model()
+    get_audio_model()
 
+    sr = importes.importar("speech_recognition")
     r = sr.Recognizer()
+    peticion = st.session_state.id_peticion
+    try:
+        with metricas.medir(peticion, "app", "grabacion"):
+            with sr.Microphone(sample_rate=16000) as source:
+                st.info("Escuchando... Habla ahora")
+                r.adjust_for_ambient_noise(source, duration=1)
+                audio = r.listen(source, timeout=5, phrase_time_limit=10)
+
+        with metricas.medir(peticion, "app", "whisper") as m:
+            texto = transcribir_audio(audio, MODELO_WHISPER)
+            m["bytes"] = len(audio.frame_data)
+        return texto
+    except Exception as e:
+        st.error(f"Error al grabar: {str(e)}")
+        return None
+
+# Funcion para grabar voz en streaming: transcribe por segmentos mientras se habla
+# y muestra el texto parcial en el placeholder indicado
+def grabar_voz_streaming(placeholder):
+    get_audio_model()
+
     try:
-        with sr.Microphone(sample_rate=16000) as source:
-            st.info("Escuchando... Habla ahora")
-            r.adjust_for_ambient_noise(source, duration=1)
-            audio = r.listen(source, timeout=5, phrase_time_limit=10)
-
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-            temp_wav.write(audio.get_wav_data())
-            temp_path = temp_wav.name
-
-        result = audio_model.transcribe(temp_path, fp16=torch.cuda.is_available())
-        text = result['text'].strip()
-        os.remove(temp_path)
-        return text
+        st.info("Escuchando... Habla ahora")
+        final = None
+        with metricas.medir(st.session_state.id_peticion, "app", "grabacion_streaming"):
+            for evento in transcribir_en_streaming(FuenteMicrofono(), MODELO_WHISPER):
+                if evento["tipo"] == "parcial":
+                    placeholder.text_area("Transcripcion parcial", evento["texto"], height=100, disabled=True)
+                else:
+                    final = evento
+        if final["ttft"] is not None:
+            st.session_state.fin_habla = final["fin_habla"]
+            st.session_state.metricas_streaming = (
+                f"Primer texto a los {final['ttft']:.2f} s de empezar a hablar; "
+                f"transcripcion completa {final['latencia_transcripcion']:.2f} s tras el fin del habla"
+            )
+        return final["texto"]
     except Exception as e:
         st.error(f"Error al grabar: {str(e)}")
         return None
 
-# Funcion para generar SQL
-def generar_sql(texto_usuario):
-    esquema_bd = get_db_schema(db_path)
+# Funcion para generar SQL; se ejecuta dentro de un trabajo en segundo plano.
+# Devuelve (sql, error_de_validacion, ruta_de_la_base) y deja el SQL parcial en
+# el progreso del trabajo. Con base=None la base se elige segun la pregunta.
+def generar_sql(trabajo, texto_usuario, base=None):
+    eleccion = bases_datos.elegir(texto_usuario, por_defecto=BASE_POR_DEFECTO, fija=base)
+    trabajo.actualizar(eleccion_base=eleccion)
+    cache = get_cache_sql()
+    huella = bases_datos.huella(eleccion)
+    sql_cacheado = cache.get(texto_usuario, huella, MODELO_LLM)
+    conn = get_connection(eleccion["ruta"])
+    # El SQL cacheado se valida igualmente: si no compila se vuelve a generar
+    if sql_cacheado is not None and validar_sql(conn, sql_cacheado) is None:
+        trabajo.actualizar(sql=sql_cacheado)
+        return sql_cacheado, None, eleccion["ruta"]
+
+    esquema_bd, seleccion = bases_datos.esquema_prompt(eleccion, texto_usuario)
+    esquema_bd = enriquecer_esquema(eleccion["ruta"], esquema_bd, texto_usuario)
+    trabajo.actualizar(seleccion_esquema=seleccion)
     messages = [
         {"role": "system", "content": f"Eres un cientifico de datos que ayuda a escribir consultas SQL. Solo responde con la consulta SQL, sin explicaciones, sin comentarios, y sin formateo markdown como triple backticks. La base de datos tiene la siguiente estructura: \n{esquema_bd}"},
         {"role": "user", "content": texto_usuario}
     ]
 
-    completion = openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=messages
-    )
-    sql_query = completion.choices[0].message.content
-    sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
-    return sql_query
-
-# Funcion para ejecutar SQL
-def ejecutar_sql(sql_query):
-    conn = sqlite3.connect(db_path)
-    try:
-        df = pd.read_sql_query(sql_query, conn)
-        return df, None
-    except Exception as e:
-        return None, str(e)
-    finally:
-        conn.close()
-
-# Funcion para generar PDF
-def generar_pdf(consulta_usuario, sql_query, df):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elementos = []
-
-    styles = getSampleStyleSheet()
-    titulo_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a1a2e'),
-        spaceAfter=30,
-        alignment=1
-    )
-
-    subtitulo_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=12
+    fragmentos = trabajo.iterar(get_backend().stream(messages, MODELO_LLM))
+    for evento in generar_sql_en_streaming(fragmentos, conn):
+        trabajo.actualizar(sql=evento["sql"])
+
+    sql_query, error = evento["sql"], evento["error"]
+    if not error:
+        cache.put(texto_usuario, huella, MODELO_LLM, sql_query, eleccion["ruta"])
+    return sql_query, error, eleccion["ruta"]
+
+# Precarga del SQL mientras el usuario aun edita el texto
+def precargar_sql(trabajo, texto_usuario, base=None):
+    with metricas.medir(metricas.nueva_peticion(), "app", "precarga_sql") as m:
+        tomar_tokens()
+        generado = generar_sql(trabajo, texto_usuario, base)
+        m["tokens"] = tomar_tokens()
+    return generado
+
+# Pipeline completo de una consulta, en un trabajo en segundo plano. Si hay
+# una precarga del SQL para el mismo texto se espera a ella en vez de repetir
+# la llamada al LLM. Antes de ejecutar se revisa el plan (avisa de escaneos de
+# tablas grandes y rechaza las consultas demasiado costosas) y la lectura,
+# acotada en filas y bytes, reutiliza el resultado si ya estaba en cache.
+def ejecutar_consulta(trabajo, texto_usuario, peticion, precarga=None, base=None):
+    salida = {"sql": None, "error": None, "resultado": None, "avisos": [], "cache_resultado": False,
+              "correcciones": [], "sugerencias": [], "db_path": None, "peticion": peticion}
+    trabajo.actualizar(etapa="Generando consulta SQL...")
+    with metricas.medir(peticion, "app", "generar_sql") as m:
+        tomar_tokens()
+        generado = None
+        if precarga is not None:
+            trabajo.actualizar(etapa="Esperando al SQL precargado...")
+            trabajo.esperar(precarga)
+            if precarga.estado == "terminado":
+                generado = precarga.resultado
+                trabajo.actualizar(sql=generado[0], **{
+                    k: v for k, v in precarga.progreso().items() if k in ("seleccion_esquema", "eleccion_base")
+                })
+        if generado is None:
+            generado = generar_sql(trabajo, texto_usuario, base)
+        m["tokens"] = tomar_tokens()
+    trabajo.actualizar(sql_listo=time.perf_counter())
+    salida["sql"], error_validacion, ruta = generado
+    salida["db_path"] = ruta
+    if error_validacion:
+        salida["error"] = f"la consulta generada no es valida ({error_validacion})"
+        return salida
+
+    trabajo.actualizar(etapa="Ejecutando consulta...")
+    with metricas.medir(peticion, "app", "ejecutar_sql") as m:
+        try:
+            # Literales que solo difieren en mayusculas o tildes se cambian por el valor de la columna
+            salida["sql"], salida["correcciones"], salida["sugerencias"] = corregir_literales(ruta, salida["sql"])
+            salida["avisos"] = revisar_plan(ruta, salida["sql"])["avisos"]
+            resultado, salida["cache_resultado"] = leer_resultado_cacheado(ruta, salida["sql"])
+        except CancelledError:
+            raise
+        except Exception as e:
+            salida["error"] = str(e)
+            return salida
+        m["filas"] = len(resultado)
+        m["bytes"] = resultado.bytes_leidos
+    # El DataFrame y su huella se preparan aqui para no bloquear la interfaz
+    salida["clave_reporte"] = cache_reportes.clave_reporte(
+        texto_usuario, salida["sql"], cache_reportes.huella_resultado(resultado.df, resultado.truncado)
     )
-
-    titulo = Paragraph("Reporte de Consulta SQL", titulo_style)
-    elementos.append(titulo)
-    elementos.append(Spacer(1, 0.3*inch))
-
-    fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    info = Paragraph(f"<b>Fecha de generacion:</b> {fecha_actual}", styles['Normal'])
-    elementos.append(info)
-    elementos.append(Spacer(1, 0.2*inch))
-
-    subtitulo1 = Paragraph("Consulta del Usuario", subtitulo_style)
-    elementos.append(subtitulo1)
-    consulta_texto = Paragraph(f"<i>{consulta_usuario}</i>", styles['Normal'])
-    elementos.append(consulta_texto)
-    elementos.append(Spacer(1, 0.2*inch))
-
-    subtitulo2 = Paragraph("Consulta SQL Generada", subtitulo_style)
-    elementos.append(subtitulo2)
-    sql_texto = Paragraph(f"<font name='Courier'>{sql_query}</font>", styles['Code'])
-    elementos.append(sql_texto)
-    elementos.append(Spacer(1, 0.3*inch))
-
-    subtitulo3 = Paragraph("Resultados", subtitulo_style)
-    elementos.append(subtitulo3)
-
-    if len(df) == 0:
-        elementos.append(Paragraph("No se encontraron resultados", styles['Normal']))
+    salida["resultado"] = resultado
+    return salida
+
+# Pasa el resultado de un trabajo terminado a la sesion
+def aplicar_trabajo(trabajo):
+    progreso = trabajo.progreso()
+    if trabajo.estado == "terminado":
+        salida = trabajo.resultado
     else:
-        datos = [df.columns.tolist()] + df.values.tolist()
-
-        if len(datos) > 51:
-            datos = datos[:51]
-            elementos.append(Paragraph(f"<i>Mostrando las primeras 50 filas de {len(df)} totales</i>", styles['Normal']))
-            elementos.append(Spacer(1, 0.1*inch))
-
-        datos_procesados = []
-        for fila in datos:
-            fila_procesada = []
-            for valor in fila:
-                valor_str = str(valor)
-                if len(valor_str) > 50:
-                    valor_str = valor_str[:47] + "..."
-                fila_procesada.append(valor_str)
-            datos_procesados.append(fila_procesada)
-
-        tabla = Table(datos_procesados)
-
-        tabla.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a1a2e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f0f0')])
-        ]))
-
-        elementos.append(tabla)
-        elementos.append(Spacer(1, 0.2*inch))
-        elementos.append(Paragraph(f"<b>Total de filas:</b> {len(df)}", styles['Normal']))
-
-    doc.build(elementos)
-    buffer.seek(0)
-    return buffer
-
+        salida = {"sql": progreso.get("sql"), "error": trabajo.error, "resultado": None,
+                  "avisos": [], "cache_resultado": False, "correcciones": [], "sugerencias": [], "db_path": None}
+
+    notas = []
+    eleccion = progreso.get("eleccion_base")
+    if eleccion and len(bases_datos.get_bases()) > 1:
+        adjuntas = f" (con {', '.join(eleccion['adjuntas'])} adjuntas)" if eleccion["adjuntas"] else ""
+        notas.append(f"Base de datos: {eleccion['principal']}{adjuntas}")
+    seleccion = progreso.get("seleccion_esquema")
+    if seleccion and seleccion['tablas_seleccionadas'] < seleccion['tablas_total']:
+        notas.append(
+            f"Esquema en el prompt: {seleccion['tablas_seleccionadas']} de {seleccion['tablas_total']} tablas "
+            f"({seleccion['reduccion']:.0%} menos texto, seleccion en {seleccion['segundos'] * 1000:.1f} ms)"
+        )
+    fin_habla = st.session_state.pop('fin_habla', None)
+    if fin_habla is not None and 'sql_listo' in progreso:
+        notas.append(f"Fin del habla a SQL generado: {progreso['sql_listo'] - fin_habla:.2f} s")
+    if salida["cache_resultado"]:
+        notas.append("Resultado reutilizado de la cache (los datos no han cambiado)")
+    for columna, original, corregido in salida["correcciones"]:
+        notas.append(f"Valor corregido en {columna}: '{original}' -> '{corregido}'")
+    for columna, original, parecido in salida["sugerencias"]:
+        notas.append(f"'{original}' no existe en {columna}; quiza querias '{parecido}'")
+    st.session_state.ultima_consulta = {
+        "sql": salida["sql"],
+        "error": salida["error"],
+        "avisos": salida["avisos"],
+        "notas": notas,
+        "cancelada": trabajo.estado == "cancelado",
+    }
+    if trabajo.estado == "cancelado":
+        return
+
+    st.session_state.pagina_resultados = 0
+    for clave in [c for c in st.session_state if c.startswith('visor_')]:
+        del st.session_state[clave]
+    for formato in FORMATOS:
+        st.session_state.pop(f'export_{formato}', None)
+    if salida["resultado"] is None:
+        st.session_state.resultado = None
+        st.session_state.df_resultados = None
+    else:
+        st.session_state.sql_query = salida["sql"]
+        st.session_state.db_resultado = salida["db_path"]
+        st.session_state.resultado = salida["resultado"]
+        st.session_state.df_resultados = salida["resultado"].df
+        st.session_state.pregunta_resultado = trabajo.clave[0]
+        st.session_state.id_resultado = salida["peticion"]
+        st.session_state.clave_reporte = salida["clave_reporte"]
 
 # =====================
 # INTERFAZ PRINCIPAL
@@ -420,72 +486,243 @@ with input_col:
     )
     if query_text:
         st.session_state.query_text = query_text
+    # Precarga del SQL en segundo plano en cuanto cambia el texto (p.ej. tras
+    # grabar la voz), para que al pulsar Ejecutar ya este generado
+    precarga = trabajos.get(st.session_state.get('id_precarga'))
+    texto = st.session_state.get('query_text')
+    base = st.session_state.get('base_datos')
+    base = None if base in (None, BASE_AUTOMATICA) else base
+    if st.session_state.get('precargar_sql', True) and texto and (precarga is None or precarga.clave != (texto, base)):
+        if precarga is not None:
+            trabajos.cancelar(precarga.id)
+        st.session_state.id_precarga = trabajos.lanzar("sql", (texto, base), precargar_sql, texto, base).id
+    parcial_placeholder = st.empty()
+    if 'metricas_streaming' in st.session_state:
+        st.caption(st.session_state.metricas_streaming)
 
 with btn_col:
+    modo_streaming = st.toggle("Streaming", value=False, help="Transcribe mientras hablas")
+    st.toggle("Precargar SQL", value=True, key="precargar_sql",
+              help="Genera el SQL en segundo plano mientras editas el texto")
+    if len(bases_datos.get_bases()) > 1:
+        st.selectbox("Base de datos", [BASE_AUTOMATICA] + list(bases_datos.get_bases()), key="base_datos",
+                     help="Automatica: se elige segun la pregunta")
     if st.button("Grabar Voz", use_container_width=True, type="secondary"):
-        texto = grabar_voz()
+        # La grabacion abre una peticion nueva que continua al ejecutar la consulta
+        st.session_state.id_peticion = metricas.nueva_peticion()
+        st.session_state.voz_pendiente = True
+        if modo_streaming:
+            texto = grabar_voz_streaming(parcial_placeholder)
+        else:
+            texto = grabar_voz()
         if texto:
             st.session_state.query_text = texto
             st.rerun()
 
-# Boton principal de ejecucion
+# Boton principal de ejecucion: lanza el pipeline en un trabajo en segundo
+# plano. Repetir el clic con el mismo texto no reinicia el trabajo en curso.
 if st.button("Ejecutar Consulta", use_container_width=True, type="primary"):
-    if 'query_text' in st.session_state and st.session_state.query_text:
-        with st.spinner('Generando consulta SQL...'):
-            sql_query = generar_sql(st.session_state.query_text)
-            st.session_state.sql_query = sql_query
+    texto = st.session_state.get('query_text')
+    base = st.session_state.get('base_datos')
+    base = None if base in (None, BASE_AUTOMATICA) else base
+    if texto:
+        actual = trabajos.get(st.session_state.get('id_trabajo'))
+        if actual is None or not actual.activo() or actual.clave != (texto, base):
+            if actual is not None:
+                trabajos.cancelar(actual.id)
+            if not st.session_state.pop('voz_pendiente', False):
+                st.session_state.id_peticion = metricas.nueva_peticion()
+            precarga = trabajos.get(st.session_state.get('id_precarga'))
+            if precarga is not None and (precarga.clave != (texto, base) or precarga.cancelado.is_set()):
+                precarga = None
+            trabajo = trabajos.lanzar(
+                "consulta", (texto, base), ejecutar_consulta, texto, st.session_state.id_peticion, precarga, base
+            )
+            st.session_state.id_trabajo = trabajo.id
+    else:
+        st.warning("Por favor, ingresa una consulta usando voz o texto antes de ejecutar.")
 
-        # Mostrar SQL generado en contenedor destacado
+# Progreso del trabajo en curso. El fragmento se refresca solo por sondeo, sin
+# repintar la pagina; al terminar pasa el resultado a la sesion y repinta todo.
+@st.fragment(run_every=INTERVALO_SONDEO)
+def progreso_trabajo():
+    trabajo = trabajos.get(st.session_state.get('id_trabajo'))
+    if trabajo is None:
+        return
+    if trabajo.activo():
+        progreso = trabajo.progreso()
         st.markdown('<p class="section-label">Consulta SQL generada</p>', unsafe_allow_html=True)
-        st.markdown(f'<div class="sql-display">{sql_query}</div>', unsafe_allow_html=True)
-
-        with st.spinner('Ejecutando consulta...'):
-            df, error = ejecutar_sql(sql_query)
+        if progreso.get('sql'):
+            st.markdown(f'<div class="sql-display">{progreso["sql"]}</div>', unsafe_allow_html=True)
+        estado_col, cancelar_col = st.columns([5, 1])
+        with estado_col:
+            st.info(progreso.get('etapa', 'En cola...'))
+        with cancelar_col:
+            if st.button("Cancelar", use_container_width=True):
+                trabajos.cancelar(trabajo.id)
+        return
+    aplicar_trabajo(trabajo)
+    del st.session_state.id_trabajo
+    st.rerun()
+
+if trabajos.get(st.session_state.get('id_trabajo')) is not None:
+    progreso_trabajo()
+elif st.session_state.get('ultima_consulta'):
+    ultima = st.session_state.ultima_consulta
+    if ultima['sql']:
+        st.markdown('<p class="section-label">Consulta SQL generada</p>', unsafe_allow_html=True)
+        st.markdown(f'<div class="sql-display">{ultima["sql"]}</div>', unsafe_allow_html=True)
+    for nota in ultima['notas']:
+        st.caption(nota)
+    for aviso in ultima['avisos']:
+        st.warning(aviso)
+    if ultima['cancelada']:
+        st.info("Consulta cancelada.")
+    elif ultima['error']:
+        st.error(f"Error al ejecutar la consulta: {ultima['error']}")
+
+# Contenedor de resultados. Al navegador solo va la pagina visible: sin orden ni
+# filtros se pagina sobre el resultado acotado en sesion, y con ellos (o fuera
+# de esa ventana) la pagina se lee de SQLite sobre la consulta envuelta
+if st.session_state.get('resultado') is not None:
+    resultado = st.session_state.resultado
+    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+    st.markdown('<p class="section-label">Resultados</p>', unsafe_allow_html=True)
+    st.markdown('<div class="results-container">', unsafe_allow_html=True)
 
-        if error:
-            st.error(f"Error al ejecutar la consulta: {error}")
-            st.session_state.df_resultados = None
+    if len(resultado) == 0:
+        st.info("No se encontraron resultados para esta consulta.")
+    else:
+        if resultado.truncado:
+            st.markdown(f'<span class="status-badge badge-success">Mostrando las primeras {len(resultado)} filas (resultado truncado)</span>', unsafe_allow_html=True)
         else:
-            st.session_state.df_resultados = df
-
-            # Contenedor de resultados
-            st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-            st.markdown('<p class="section-label">Resultados</p>', unsafe_allow_html=True)
-            st.markdown('<div class="results-container">', unsafe_allow_html=True)
+            st.markdown(f'<span class="status-badge badge-success">{len(resultado)} filas encontradas</span>', unsafe_allow_html=True)
+
+        db_resultado = st.session_state.db_resultado
+        columnas = resultado.columnas
+        col_orden, col_desc, col_filtro, col_operador, col_valor = st.columns([2, 1, 2, 1, 2])
+        with col_orden:
+            orden = st.selectbox("Ordenar por", [visor.SIN_ORDEN] + columnas, key="visor_orden")
+        with col_desc:
+            descendente = st.toggle("Descendente", key="visor_descendente")
+        with col_filtro:
+            columna_filtro = st.selectbox("Filtrar", ["(sin filtro)"] + columnas, key="visor_filtro")
+        with col_operador:
+            operador = st.selectbox("Operador", list(visor.OPERADORES), key="visor_operador")
+        with col_valor:
+            valor = st.text_input("Valor", key="visor_valor")
+        filtros = [(columna_filtro, operador, valor)] if columna_filtro in columnas and valor != "" else []
 
-            if len(df) == 0:
-                st.info("No se encontraron resultados para esta consulta.")
+        try:
+            vista = visor.consulta_vista(st.session_state.sql_query, columnas, filtros)
+            # Al cambiar el orden o el filtro se vuelve a la primera pagina
+            estado_vista = (vista, orden, descendente)
+            if st.session_state.get('visor_estado') != estado_vista:
+                st.session_state.visor_estado = estado_vista
+                st.session_state.pagina_resultados = 0
+            total = len(resultado) if not filtros and not resultado.truncado else visor.contar(db_resultado, vista)
+            if filtros:
+                st.caption(f"{total} filas cumplen el filtro")
+            total_paginas = max(1, -(-total // FILAS_POR_PAGINA))
+            pagina = 0
+            if total_paginas > 1:
+                pagina = st.number_input(
+                    f"Pagina (de {total_paginas})", min_value=1, max_value=total_paginas,
+                    value=min(st.session_state.get('pagina_resultados', 0) + 1, total_paginas), step=1
+                ) - 1
+                st.session_state.pagina_resultados = pagina
+            en_sesion = not filtros and orden == visor.SIN_ORDEN
+            if en_sesion and pagina * FILAS_POR_PAGINA < len(resultado):
+                inicio = pagina * FILAS_POR_PAGINA
+                st.dataframe(resultado.df.iloc[inicio:inicio + FILAS_POR_PAGINA], use_container_width=True, hide_index=True)
+            elif en_sesion:
+                # Paginas fuera de la ventana cargada se leen bajo demanda desde la BD
+                extra = leer_pagina(db_resultado, st.session_state.sql_query, pagina, FILAS_POR_PAGINA)
+                st.dataframe(extra.df, use_container_width=True, hide_index=True)
             else:
-                st.markdown(f'<span class="status-badge badge-success">{len(df)} filas encontradas</span>', unsafe_allow_html=True)
-                st.dataframe(df, use_container_width=True)
-
-            st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.warning("Por favor, ingresa una consulta usando voz o texto antes de ejecutar.")
-
-# Boton de PDF integrado en la seccion de resultados
+                ventana = visor.leer_ventana(db_resultado, vista, pagina, FILAS_POR_PAGINA, orden, descendente)
+                st.dataframe(ventana.df, use_container_width=True, hide_index=True)
+
+            # Resumen y grafico se calculan con agregados en SQLite sobre la vista
+            # completa, no sobre la pagina, y solo cuando se piden
+            if st.toggle("Resumen por columna", key="visor_resumen"):
+                st.dataframe(visor.resumen(db_resultado, vista, columnas).df, use_container_width=True, hide_index=True)
+            if st.toggle("Grafico", key="visor_grafico"):
+                col_tipo, col_x, col_y, col_agregacion = st.columns(4)
+                with col_tipo:
+                    tipo = st.selectbox("Tipo", ["Barras", "Histograma"], key="visor_tipo")
+                with col_x:
+                    x = st.selectbox("Columna", columnas, key="visor_x")
+                if tipo == "Barras":
+                    with col_y:
+                        y = st.selectbox("Valor", ["(filas)"] + columnas, key="visor_y")
+                    with col_agregacion:
+                        agregacion = st.selectbox("Agregacion", visor.AGREGACIONES, key="visor_agregacion",
+                                                  disabled=y == "(filas)")
+                    datos = visor.agrupar(db_resultado, vista, x, None if y == "(filas)" else y, agregacion)
+                    st.caption(f"Los {visor.MAX_GRUPOS} grupos mayores")
+                    st.bar_chart(datos.df, x=x, y="valor")
+                else:
+                    datos = visor.histograma(db_resultado, vista, x)
+                    st.bar_chart(datos.df, x=x, y="filas")
+        except Exception as e:
+            st.error(f"Error al leer los resultados: {e}")
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# Boton de PDF integrado en la seccion de resultados. El PDF se genera solo
+# cuando se pide y se reutiliza desde la cache entre reruns y sesiones.
 if 'df_resultados' in st.session_state and st.session_state.df_resultados is not None:
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
 
-    with st.spinner('Generando PDF...'):
-        pdf_buffer = generar_pdf(
-            st.session_state.query_text,
-            st.session_state.sql_query,
-            st.session_state.df_resultados
-        )
+    clave = st.session_state.clave_reporte
+    pdf_bytes = cache_reportes.get(clave)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     nombre_archivo = f"reporte_sql_{timestamp}.pdf"
 
-    dl_col1, dl_col2, dl_col3 = st.columns([2, 1, 2])
+    dl_col1, dl_col2, *export_cols, dl_col3 = st.columns([1, 1, 1, 1, 1, 1])
     with dl_col2:
-        st.download_button(
-            label="Descargar PDF",
-            data=pdf_buffer,
-            file_name=nombre_archivo,
-            mime="application/pdf",
-            use_container_width=True
-        )
+        if pdf_bytes is None and st.button("Generar PDF", use_container_width=True):
+            with st.spinner('Generando PDF...'), metricas.medir(st.session_state.id_resultado, "app", "generar_pdf") as m:
+                pdf_bytes = cache_reportes.get_or_build(clave, lambda: importes.importar("reportes").generar_pdf(
+                    st.session_state.pregunta_resultado,
+                    st.session_state.sql_query,
+                    st.session_state.df_resultados,
+                    truncado=st.session_state.resultado.truncado
+                ).getvalue())
+                m["filas"] = len(st.session_state.df_resultados)
+                m["bytes"] = len(pdf_bytes)
+        if pdf_bytes is not None:
+            st.download_button(
+                label="Descargar PDF",
+                data=pdf_bytes,
+                file_name=nombre_archivo,
+                mime="application/pdf",
+                use_container_width=True
+            )
+
+    # Exportaciones del resultado completo, leidas por lotes desde el cursor
+    for col, (formato, (etiqueta, mime)) in zip(export_cols, FORMATOS.items()):
+        with col:
+            clave_export = f'export_{formato}'
+            if clave_export not in st.session_state and st.button(f"Exportar {etiqueta}", use_container_width=True):
+                with st.spinner(f'Exportando a {etiqueta}...'):
+                    try:
+                        with metricas.medir(st.session_state.id_resultado, "app", f"exportar_{formato}") as m:
+                            with exportar(formato, st.session_state.db_resultado, st.session_state.sql_query) as archivo:
+                                st.session_state[clave_export] = archivo.read()
+                            m["bytes"] = len(st.session_state[clave_export])
+                    except Exception as e:
+                        st.error(f"Error al exportar: {e}")
+            if clave_export in st.session_state:
+                st.download_button(
+                    label=f"Descargar {etiqueta}",
+                    data=st.session_state[clave_export],
+                    file_name=f"resultado_{timestamp}.{formato}",
+                    mime=mime,
+                    use_container_width=True
+                )
 
 # --- Sidebar ---
 with st.sidebar:
@@ -507,9 +744,84 @@ with st.sidebar:
 </div>
 """, unsafe_allow_html=True)
 
+    with st.expander("Cache de consultas"):
+        stats = get_cache_sql().stats()
+        st.markdown(
+            f"**Entradas:** {stats['entradas']}  \n"
+            f"**Aciertos:** {stats['aciertos_exactos'] + stats['aciertos_normalizados']} "
+            f"({stats['aciertos_normalizados']} normalizados)  \n"
+            f"**Fallos:** {stats['fallos']}  \n"
+            f"**Tasa de aciertos:** {stats['tasa_aciertos']:.0%}"
+        )
+        stats = get_cache_resultados().stats()
+        st.markdown(
+            f"**Resultados en cache:** {stats['entradas']} "
+            f"({stats['bytes_disco'] / 1024 / 1024:.1f} de {stats['max_bytes_disco'] / 1024 / 1024:.0f} MB en disco, "
+            f"{stats['bytes_memoria'] / 1024 / 1024:.1f} de {stats['max_bytes_memoria'] / 1024 / 1024:.0f} MB en memoria)  \n"
+            f"**Aciertos:** {stats['aciertos_memoria'] + stats['aciertos_disco']} "
+            f"({stats['aciertos_disco']} desde disco)  \n"
+            f"**Fallos:** {stats['fallos']} ({stats['invalidaciones']} invalidaciones)  \n"
+            f"**Tasa de aciertos:** {stats['tasa_aciertos']:.0%}"
+        )
+
+    with st.expander("Modelos Whisper"):
+        modelos_stats = modelos_audio.stats()
+        if not modelos_stats:
+            st.caption("Ningun modelo cargado todavia.")
+        for nombre, info in modelos_stats.items():
+            memoria = info['memoria_bytes']
+            memoria_txt = f"{memoria / 1024 / 1024:.0f} MB" if memoria is not None else "n/d"
+            st.markdown(
+                f"**{nombre}:** carga {info['segundos_carga']:.1f} s, "
+                f"memoria {memoria_txt}, {info['transcripciones']} transcripciones"
+            )
+
+    with st.expander("Diagnostico"):
+        agregado = metricas.resumen(ventana=24 * 3600)
+        if not agregado:
+            st.caption("Sin metricas en las ultimas 24 horas.")
+        else:
+            st.caption("Tiempos por etapa (s) en las ultimas 24 horas")
+            st.dataframe(
+                [{k: fila[k] for k in ("origen", "etapa", "n", "p50", "p95", "p99", "tokens", "filas", "bytes", "errores")}
+                 for fila in agregado],
+                hide_index=True,
+                use_container_width=True
+            )
+            st.download_button(
+                label="Metricas (Prometheus)",
+                data=metricas.exportar_prometheus(),
+                file_name="metricas.prom",
+                mime="text/plain"
+            )
+        st.caption(f"Script ejecutado en {time.perf_counter() - inicio_script:.2f} s")
+        backend = get_backend()
+        if hasattr(backend, "stats"):
+            rutas = backend.stats()
+            st.caption(f"SQL local: {rutas['local']}, remoto: {rutas['remoto']} (umbral de confianza {rutas['umbral']:.2f})")
+        resumen = get_estadisticas(db_path).resumen()
+        if resumen["actualizado"]:
+            st.caption(f"Estadisticas de columnas: {resumen['columnas']} columnas, "
+                       f"{resumen['valores_indexados']} valores indexados "
+                       f"(actualizadas hace {time.time() - resumen['actualizado']:.0f} s)")
+        estados = trabajos.stats()
+        if estados:
+            st.caption("Trabajos en segundo plano: " + ", ".join(f"{n} {estado}" for estado, n in estados.items()))
+        tiempos_import = importes.tiempos()
+        if tiempos_import:
+            st.markdown("  \n".join(f"**{nombre}:** importado en {segundos:.2f} s"
+                                     for nombre, segundos in tiempos_import.items()))
+
     with st.expander("Esquema de la base de datos"):
         try:
             schema = get_db_schema(db_path)
             st.code(schema, language=None)
         except Exception:
             st.warning("No se pudo cargar el esquema de la base de datos.")
+
+# Precarga en segundo plano, una vez la pagina ya esta pintada: pandas y el
+# motor de PDF para el primer resultado y despues el modelo Whisper
+importes.precargar(
+    ["pandas", "reportes"],
+    al_terminar=lambda: modelos_audio.warmup([MODELO_WHISPER], en_segundo_plano=False)
+)
@@ -0,0 +1,178 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+
+from conexiones import registrar_adjuntable
+from esquema import get_schema_info
+from seleccion_esquema import IndiceBM25, TOP_K, seleccionar_esquema, tokenizar
+
+# Registro de las bases de datos SQLite disponibles y eleccion automatica de
+# la base para cada pregunta. Todas las tablas de todas las bases se indexan
+# juntas con BM25 (el indice se reconstruye solo si cambia el esquema de
+# alguna); la base con la tabla mejor puntuada es la principal, y las demas
+# que tambien puntuan alto se adjuntan con ATTACH para poder cruzarlas en una
+# sola consulta (sus tablas van al prompt como alias.tabla). Si la pregunta
+# nombra una base por su alias ("ventas de tienda_norte") esa manda.
+#   VOICETOSQL_BASES      rutas separadas por comas
+#   VOICETOSQL_DIR_BASES  directorio con una base por cliente (*.sqlite, *.db)
+BASES = os.getenv("VOICETOSQL_BASES", "identifier.sqlite,clientes.db")
+DIR_BASES = os.getenv("VOICETOSQL_DIR_BASES")
+# Una base se adjunta si su mejor tabla puntua al menos esta fraccion de la mejor
+PROPORCION_ADJUNTA = 0.6
+# Bases adjuntas como maximo por consulta (SQLite admite 10 por conexion)
+MAX_ADJUNTAS = 3
+# Con decenas de bases no se mira el esquema de todas en cada pregunta: el
+# indice se da por bueno durante este tiempo
+SEGUNDOS_INDICE = 5
+
+_lock = threading.Lock()
+_lock_inicio = threading.Lock()
+_bases = {}
+_iniciado = False
+_indice = None
+
+
+def _alias(db_path):
+    alias = re.sub(r"\W", "_", os.path.splitext(os.path.basename(db_path))[0]).lower()
+    return alias if not alias[:1].isdigit() else "bd_" + alias
+
+
+# Registra una base y devuelve su alias (el nombre del archivo sin extension)
+def registrar(db_path, alias=None):
+    global _indice
+    alias = alias or _alias(db_path)
+    with _lock:
+        if _bases.get(alias) == os.path.realpath(db_path):
+            return alias
+        _bases[alias] = os.path.realpath(db_path)
+        _indice = None
+    registrar_adjuntable(alias, db_path)
+    return alias
+
+
+# Registra las bases configuradas una sola vez; los demas hilos esperan a que
+# termine para no ver el registro a medias
+def _iniciar():
+    global _iniciado
+    with _lock_inicio:
+        if _iniciado:
+            return
+        rutas = [r.strip() for r in BASES.split(",") if r.strip()]
+        if DIR_BASES:
+            rutas += sorted(glob.glob(os.path.join(DIR_BASES, "*.sqlite")) + glob.glob(os.path.join(DIR_BASES, "*.db")))
+        for ruta in rutas:
+            if os.path.exists(ruta):
+                registrar(ruta)
+        _iniciado = True
+
+
+# {alias: ruta} de las bases registradas, en orden de registro
+def get_bases():
+    _iniciar()
+    with _lock:
+        return dict(_bases)
+
+
+def ruta(alias):
+    return get_bases()[alias]
+
+
+# Indice BM25 con las tablas de todas las bases; documentos (alias, tabla)
+def get_indice():
+    global _indice
+    with _lock:
+        if _indice is not None and time.monotonic() - _indice[2] < SEGUNDOS_INDICE:
+            return _indice[1]
+    bases = get_bases()
+    huellas = tuple((alias, get_schema_info(r)["huella"]) for alias, r in bases.items())
+    with _lock:
+        if _indice is not None and _indice[0] == huellas:
+            _indice = (huellas, _indice[1], time.monotonic())
+            return _indice[1]
+    documentos = {}
+    for alias, r in bases.items():
+        for tabla, columnas in get_schema_info(r)["tablas"].items():
+            if not tabla.startswith("sqlite_"):
+                documentos[(alias, tabla)] = tokenizar(f"{tabla} {tabla} {' '.join(columnas)}")
+    indice = IndiceBM25(documentos)
+    with _lock:
+        _indice = (huellas, indice, time.monotonic())
+    return indice
+
+
+# Elige la base principal y las adjuntas para la pregunta. Si la pregunta no
+# apunta a ninguna tabla se usa `por_defecto` (o la primera registrada); con
+# `fija` no se elige: se usa esa base sin adjuntas.
+def elegir(pregunta, por_defecto=None, fija=None):
+    inicio = time.perf_counter()
+    bases = get_bases()
+    por_base = {}
+    nombradas = []
+    if len(bases) > 1 and fija is None:
+        indice = get_indice()
+        puntuaciones = indice.puntuar(tokenizar(pregunta))
+        mejores = sorted((p, d) for d, p in puntuaciones.items() if p > 0)[::-1][:TOP_K]
+        for puntuacion, (alias, _) in mejores:
+            por_base[alias] = max(por_base.get(alias, 0.0), puntuacion)
+        # Un alias que coincide con el nombre de una tabla ("clientes") no cuenta como base nombrada
+        tablas = {tabla for _, tabla in indice.documentos}
+        nombradas = [a for a in bases if a not in tablas and re.search(rf"\b{re.escape(a)}\b", pregunta.lower())]
+    if fija is not None:
+        principal = fija
+        adjuntas = []
+    elif nombradas:
+        principal = max(nombradas, key=lambda a: por_base.get(a, 0.0))
+        adjuntas = [a for a in nombradas if a != principal][:MAX_ADJUNTAS]
+    elif por_base:
+        principal = max(por_base, key=por_base.get)
+        adjuntas = [a for a in sorted(por_base, key=por_base.get, reverse=True)
+                    if a != principal and por_base[a] >= por_base[principal] * PROPORCION_ADJUNTA][:MAX_ADJUNTAS]
+    else:
+        principal = por_defecto if por_defecto in bases else next(iter(bases))
+        adjuntas = []
+    return {
+        "principal": principal,
+        "ruta": bases[principal],
+        "adjuntas": adjuntas,
+        "puntuaciones": por_base,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+# Esquema para el prompt: tablas relevantes de la principal y, de cada
+# adjunta, sus tablas relevantes calificadas con el alias
+def esquema_prompt(eleccion, pregunta):
+    texto, seleccion = seleccionar_esquema(eleccion["ruta"], pregunta)
+    for alias in eleccion["adjuntas"]:
+        adjunto, _ = seleccionar_esquema(ruta(alias), pregunta)
+        texto += re.sub(r"^Tabla: ", f"Tabla: {alias}.", adjunto, flags=re.MULTILINE)
+    if eleccion["adjuntas"]:
+        texto += (f"Las tablas con prefijo ({', '.join(eleccion['adjuntas'])}) estan en otras bases "
+                  f"adjuntas: usa alias.tabla para consultarlas junto a las de {eleccion['principal']}.\n")
+    return texto, seleccion
+
+
+# Huella de los esquemas implicados, para las claves de cache
+def huella(eleccion):
+    partes = [get_schema_info(eleccion["ruta"])["huella"]]
+    partes += [a + ":" + get_schema_info(ruta(a))["huella"] for a in eleccion["adjuntas"]]
+    if len(partes) == 1:
+        return partes[0]
+    return hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bases de datos registradas y eleccion de base por pregunta")
+    parser.add_argument("pregunta", nargs="?", default=None)
+    args = parser.parse_args()
+
+    for alias, r in get_bases().items():
+        print(f"{alias}: {r} ({len(get_schema_info(r)['tablas'])} tablas)")
+    if args.pregunta:
+        eleccion = elegir(args.pregunta)
+        adjuntas = f", adjuntas {', '.join(eleccion['adjuntas'])}" if eleccion["adjuntas"] else ""
+        print(f"Base elegida: {eleccion['principal']}{adjuntas} ({eleccion['segundos'] * 1000:.1f} ms)")
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportes import construir_pdf
+
+# Mide paginas por segundo y memoria maxima del motor de reportes PDF con
+# resultados sinteticos de distinto tamano. Cada tamano se ejecuta en un
+# proceso hijo para que el pico de memoria de uno no contamine al siguiente.
+
+
+def pico_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En macOS ru_maxrss viene en bytes, en Linux en KiB
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def datos_sinteticos(filas, por_bloque=5000):
+    rng = np.random.default_rng(0)
+    for inicio in range(0, filas, por_bloque):
+        n = min(por_bloque, filas - inicio)
+        yield pd.DataFrame({
+            "id": np.arange(inicio, inicio + n),
+            "nombre": [f"cliente_{i}" for i in range(inicio, inicio + n)],
+            "email": [f"cliente_{i}@example.com" * 3 for i in range(inicio, inicio + n)],
+            "importe": rng.random(n) * 1000,
+        })
+
+
+def medir(filas):
+    inicio = time.perf_counter()
+    buffer, paginas = construir_pdf("benchmark", "SELECT * FROM clientes", datos_sinteticos(filas))
+    segundos = time.perf_counter() - inicio
+    print(f"{filas:>8} filas: {paginas:>5} paginas en {segundos:.1f} s "
+          f"({paginas / segundos:.1f} paginas/s), {len(buffer.getvalue()) / 1024 / 1024:.1f} MB de PDF, "
+          f"pico RSS {pico_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", nargs="+", type=int, default=[1000, 10000, 50000])
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        medir(args.filas[0])
+    else:
+        import subprocess
+        for filas in args.filas:
+            subprocess.run([sys.executable, __file__, "--hijo", "--filas", str(filas)], check=True)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Las caches locales del benchmark van a un directorio temporal para no
+# mezclarse con las de la aplicacion
+_tmp = tempfile.mkdtemp(prefix="voicetosql_bench_")
+os.environ.setdefault("VOICETOSQL_CACHE_SQL", os.path.join(_tmp, "cache_sql.sqlite"))
+os.environ.setdefault("VOICETOSQL_METRICAS", os.path.join(_tmp, "metricas.sqlite"))
+os.environ["VOICETOSQL_LLM"] = "falso"
+
+import esquema
+from generacion_sql import limpiar_sql
+from llm import BackendFalso, get_backend, set_backend
+from lote import PROMPT_SISTEMA
+from reportes import construir_pdf
+from resultados import leer_resultado
+from seleccion_esquema import seleccionar_esquema
+
+# Benchmark reproducible del pipeline voz -> SQL sin red ni microfono.
+# Genera bases SQLite sinteticas deterministas de tamano creciente, usa un LLM
+# falso determinista y mide cada etapa por separado. Los resultados se
+# comparan con un baseline guardado para detectar regresiones.
+DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".datos")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PREGUNTA = "Importe total de los clientes por ciudad"
+SQL_FIJO = "SELECT * FROM clientes WHERE importe > 500"
+# La lectura de SQL_FIJO esta acotada por MAX_FILAS; la agregacion recorre la tabla entera
+SQL_AGREGADO = "SELECT ciudad, COUNT(*), SUM(importe) FROM clientes GROUP BY ciudad"
+
+
+# Crea (o reutiliza) una base con `tablas` tablas y `filas` filas en clientes
+def generar_bd(filas, tablas):
+    os.makedirs(DATOS, exist_ok=True)
+    path = os.path.join(DATOS, f"bench_{filas}_{tablas}.sqlite")
+    if os.path.exists(path):
+        return path
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT, ciudad TEXT, importe REAL, fecha TEXT)")
+    conn.execute("""
+        WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+        INSERT INTO clientes
+        SELECT x, 'cliente_' || x,
+               CASE x % 5 WHEN 0 THEN 'Madrid' WHEN 1 THEN 'Barcelona' WHEN 2 THEN 'Sevilla'
+                          WHEN 3 THEN 'Valencia' ELSE 'Bilbao' END,
+               (x * 7919) % 1000 + 0.5,
+               date('2024-01-01', '+' || (x % 365) || ' days')
+        FROM n
+    """, (filas,))
+    for i in range(tablas - 1):
+        conn.execute(f"CREATE TABLE tabla_{i} (id INTEGER PRIMARY KEY, cliente_id INTEGER REFERENCES clientes(id), "
+                     f"campo_{i} TEXT, valor_{i} REAL)")
+        conn.execute(f"""
+            WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100)
+            INSERT INTO tabla_{i} SELECT x, x, 'valor_' || x, x * 1.5 FROM n
+        """)
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+    return path
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def bench_bd(db_path, repeticiones, filas_pdf):
+    set_backend(BackendFalso(respuestas={PREGUNTA: SQL_FIJO + ";"}))
+    etapas = {}
+
+    def esquema_frio():
+        esquema.clear_schema_cache(db_path)
+        esquema.get_db_schema(db_path)
+    etapas["esquema_frio"] = medir(esquema_frio, repeticiones)
+    etapas["esquema_cache"] = medir(lambda: esquema.get_db_schema(db_path), repeticiones)
+
+    def prompt():
+        esquema_bd, _ = seleccionar_esquema(db_path, PREGUNTA)
+        return [{"role": "system", "content": PROMPT_SISTEMA.format(esquema=esquema_bd)},
+                {"role": "user", "content": PREGUNTA}]
+    etapas["prompt"] = medir(prompt, repeticiones)
+    messages = prompt()
+    etapas["llm_falso"] = medir(lambda: limpiar_sql(get_backend().complete(messages, "falso")), repeticiones)
+
+    etapas["ejecucion"] = medir(lambda: leer_resultado(db_path, SQL_FIJO), repeticiones)
+    etapas["agregacion"] = medir(lambda: leer_resultado(db_path, SQL_AGREGADO), repeticiones)
+    resultado = leer_resultado(db_path, SQL_FIJO)
+    # Construccion del DataFrame y su serializacion a Arrow, que es lo que hace st.dataframe
+    etapas["dataframe"] = medir(lambda: pa.Table.from_pandas(pd.DataFrame(resultado.filas, columns=resultado.columnas)), repeticiones)
+
+    df = resultado.df.head(filas_pdf)
+    etapas["pdf"] = medir(lambda: construir_pdf(PREGUNTA, SQL_FIJO, df), max(1, repeticiones // 2))
+    return etapas
+
+
+def bench_transcripcion(audios, modelo, repeticiones):
+    import speech_recognition as sr
+    import modelos_audio
+    from transcripcion import audio_a_numpy
+
+    modelos_audio.warmup([modelo], en_segundo_plano=False)
+    datos = []
+    for path in audios:
+        with sr.AudioFile(path) as source:
+            datos.append(audio_a_numpy(sr.Recognizer().record(source)))
+    return medir(lambda: [modelos_audio.transcribe(modelo, audio) for audio in datos], repeticiones)
+
+
+# Una etapa regresa si empeora mas de `tolerancia` y mas de `minimo` segundos,
+# para que el ruido en etapas de microsegundos no rompa la comparacion
+def comparar(resultados, baseline, tolerancia, minimo=0.005):
+    regresiones = []
+    for caso, etapas in resultados.items():
+        for etapa, segundos in etapas.items():
+            referencia = baseline.get(caso, {}).get(etapa)
+            if referencia and segundos > referencia * (1 + tolerancia) and segundos - referencia > minimo:
+                regresiones.append((caso, etapa, referencia, segundos))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", nargs="+", type=int, default=[10000, 100000, 1000000],
+                        help="Filas de la tabla principal (hasta 10M)")
+    parser.add_argument("--tablas", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--repeticiones", default=5, type=int)
+    parser.add_argument("--filas-pdf", default=2000, type=int)
+    parser.add_argument("--audios", nargs="*", default=[], help="Audios de fixture para medir la transcripcion")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guarda estos resultados como baseline")
+    parser.add_argument("--tolerancia", default=0.2, type=float, help="Empeoramiento permitido (0.2 = 20%%)")
+    parser.add_argument("--minimo-ms", default=5.0, type=float, help="Empeoramiento absoluto minimo para contar como regresion")
+    args = parser.parse_args()
+
+    resultados = {}
+    for filas in args.filas:
+        for tablas in args.tablas:
+            caso = f"{filas}_filas_{tablas}_tablas"
+            db_path = generar_bd(filas, tablas)
+            resultados[caso] = bench_bd(db_path, args.repeticiones, args.filas_pdf)
+            print(caso + ": " + ", ".join(f"{etapa} {s * 1000:.1f} ms" for etapa, s in resultados[caso].items()))
+    if args.audios:
+        resultados["transcripcion"] = {args.model: bench_transcripcion(args.audios, args.model, args.repeticiones)}
+        print(f"transcripcion ({args.model}): {resultados['transcripcion'][args.model] * 1000:.1f} ms")
+
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, sort_keys=True)
+        print(f"Baseline guardado en {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia, args.minimo_ms / 1000)
+        for caso, etapa, referencia, segundos in regresiones:
+            print(f"REGRESION {caso} {etapa}: {referencia * 1000:.1f} ms -> {segundos * 1000:.1f} ms")
+        if regresiones:
+            sys.exit(1)
+        print("Sin regresiones respecto al baseline")
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+_tmp = tempfile.mkdtemp(prefix="voicetosql_bench_")
+os.environ.setdefault("VOICETOSQL_CACHE_SQL", os.path.join(_tmp, "cache_sql.sqlite"))
+os.environ.setdefault("VOICETOSQL_METRICAS", os.path.join(_tmp, "metricas.sqlite"))
+
+from generacion_sql import limpiar_sql
+from llm import BACKENDS, BackendEnrutado, tomar_ruta
+from lote import PROMPT_SISTEMA
+from resultados import leer_resultado
+from seleccion_esquema import seleccionar_esquema
+
+# Compara proveedores de SQL (latencia y acierto) sobre un conjunto fijo de
+# preguntas con su SQL esperado. Una respuesta es correcta si devuelve las
+# mismas filas que el SQL esperado (en el mismo orden si la pregunta lo pide).
+# Los proveedores que necesitan OpenAI se omiten si no hay OPENAI_API_KEY.
+PREGUNTAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preguntas_sql.jsonl")
+
+
+def _filas(db_path, sql, ordenado):
+    filas = [tuple(round(v, 6) if isinstance(v, float) else v for v in fila)
+             for fila in leer_resultado(db_path, sql).filas]
+    return filas if ordenado else sorted(filas, key=repr)
+
+
+def evaluar(backend, preguntas, db_path, modelo):
+    latencias = []
+    aciertos = 0
+    locales = 0
+    fallos = []
+    for p in preguntas:
+        esquema_bd, _ = seleccionar_esquema(db_path, p["pregunta"])
+        messages = [{"role": "system", "content": PROMPT_SISTEMA.format(esquema=esquema_bd)},
+                    {"role": "user", "content": p["pregunta"]}]
+        inicio = time.perf_counter()
+        try:
+            sql = limpiar_sql(backend.complete(messages, modelo))
+        except Exception as e:
+            sql = None
+            error = str(e)
+        latencias.append(time.perf_counter() - inicio)
+        if tomar_ruta() == "local":
+            locales += 1
+        try:
+            correcto = sql is not None and _filas(db_path, sql, p.get("ordenado")) == _filas(db_path, p["sql"], p.get("ordenado"))
+        except Exception as e:
+            correcto = False
+            error = str(e)
+        if correcto:
+            aciertos += 1
+        else:
+            fallos.append((p["pregunta"], sql if sql is not None else f"error: {error}"))
+    latencias.sort()
+    return {
+        "acierto": aciertos / len(preguntas),
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] * 1000,
+        "locales": locales,
+        "fallos": fallos,
+    }
+
+
+def crear_backend(nombre, remoto):
+    if nombre == "enrutado":
+        return BackendEnrutado(remoto=BACKENDS[remoto]())
+    return BACKENDS[nombre]()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["plantillas", "enrutado", "openai"])
+    parser.add_argument("--remoto", default="openai", help="Backend remoto del enrutado")
+    parser.add_argument("--db", default=os.path.join(RAIZ, "identifier.sqlite"))
+    parser.add_argument("--preguntas", default=PREGUNTAS)
+    parser.add_argument("--modelo", default="gpt-3.5-turbo")
+    parser.add_argument("--fallos", action="store_true", help="Muestra las preguntas falladas")
+    args = parser.parse_args()
+
+    with open(args.preguntas, encoding="utf-8") as f:
+        preguntas = [json.loads(linea) for linea in f if linea.strip()]
+    for nombre in args.backends:
+        necesita_openai = nombre == "openai" or (nombre == "enrutado" and args.remoto == "openai")
+        if necesita_openai and not os.getenv("OPENAI_API_KEY"):
+            print(f"{nombre}: omitido (sin OPENAI_API_KEY)")
+            continue
+        r = evaluar(crear_backend(nombre, args.remoto), preguntas, args.db, args.modelo)
+        ruta = f", {r['locales']}/{len(preguntas)} locales" if nombre == "enrutado" else ""
+        print(f"{nombre}: acierto {r['acierto']:.0%}, p50 {r['p50_ms']:.1f} ms, p95 {r['p95_ms']:.1f} ms{ruta}")
+        if args.fallos:
+            for pregunta, sql in r["fallos"]:
+                print(f"  FALLO {pregunta!r}: {sql}")
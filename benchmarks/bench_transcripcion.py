@@ -0,0 +1,66 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import speech_recognition as sr
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modelos_audio
+from transcripcion import audio_a_numpy
+
+# Compara la latencia por frase de la ruta antigua (WAV temporal + ffmpeg)
+# con la ruta en memoria (PCM -> numpy float32 a 16 kHz).
+
+
+def cargar_audio(path):
+    r = sr.Recognizer()
+    with sr.AudioFile(path) as source:
+        return r.record(source)
+
+
+def ruta_archivo(audio, modelo):
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
+        temp_wav.write(audio.get_wav_data())
+    try:
+        return modelos_audio.transcribe(modelo, temp_wav.name, fp16=torch.cuda.is_available())
+    finally:
+        os.remove(temp_wav.name)
+
+
+def ruta_memoria(audio, modelo):
+    return modelos_audio.transcribe(modelo, audio_a_numpy(audio), fp16=torch.cuda.is_available())
+
+
+def medir(funcion, audio, modelo, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(audio, modelo)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("audios", nargs="+", help="Archivos WAV/AIFF/FLAC con frases de prueba")
+    parser.add_argument("--model", default="tiny", choices=modelos_audio.MODELOS)
+    parser.add_argument("--repeticiones", default=5, type=int)
+    args = parser.parse_args()
+
+    modelos_audio.warmup([args.model], en_segundo_plano=False)
+    audios = [cargar_audio(path) for path in args.audios]
+    # Una pasada de calentamiento para no medir la primera inicializacion
+    ruta_memoria(audios[0], args.model)
+
+    for nombre, funcion in (("archivo temporal", ruta_archivo), ("en memoria", ruta_memoria)):
+        tiempos = []
+        for audio in audios:
+            tiempos.extend(medir(funcion, audio, args.model, args.repeticiones))
+        print(f"{nombre:>16}: media {statistics.mean(tiempos) * 1000:.1f} ms, "
+              f"mediana {statistics.median(tiempos) * 1000:.1f} ms, "
+              f"min {min(tiempos) * 1000:.1f} ms")
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modelos_audio
+from transcripcion_lote import transcribir_directorio
+
+# Rendimiento (segundos de audio por segundo de reloj) de la transcripcion
+# masiva con distintos tamanos de lote, en CPU si no hay GPU.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directorio", help="Directorio con audios de prueba")
+    parser.add_argument("--model", default="tiny", choices=modelos_audio.MODELOS)
+    parser.add_argument("--lotes", nargs="+", type=int, default=[1, 8, 16])
+    parser.add_argument("--procesos", default=None, type=int)
+    args = parser.parse_args()
+
+    modelos_audio.warmup([args.model], en_segundo_plano=False)
+    resumen = []
+    for tam_lote in args.lotes:
+        with tempfile.TemporaryDirectory() as tmp:
+            salida = os.path.join(tmp, "transcripciones.jsonl")
+            resultado = transcribir_directorio(args.directorio, salida, args.model, tam_lote, args.procesos)
+        resumen.append((tam_lote, resultado))
+
+    print()
+    for tam_lote, resultado in resumen:
+        print(f"lote {tam_lote:>3}: {resultado['rendimiento']:.1f} s de audio/s "
+              f"({resultado['audios']} audios, {resultado['segundos']:.1f} s)")
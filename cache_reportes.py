@@ -0,0 +1,63 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from importes import importar
+
+# Cache de PDFs a nivel de proceso, compartida por todas las sesiones.
+# La clave es un hash de (pregunta, SQL, huella del resultado) y se desaloja
+# por LRU cuando el total de bytes supera el limite.
+MAX_BYTES = int(os.getenv("VOICETOSQL_CACHE_PDF_BYTES", str(256 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_pdfs = OrderedDict()
+_bytes_totales = 0
+
+
+# Huella del contenido de un DataFrame (columnas, tipos y valores)
+def huella_resultado(df, truncado=False):
+    h = hashlib.sha1()
+    h.update(repr((list(df.columns), [str(t) for t in df.dtypes], len(df), truncado)).encode("utf-8"))
+    h.update(importar("pandas").util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def clave_reporte(pregunta, sql_query, huella):
+    return hashlib.sha1("\x1f".join((pregunta, sql_query, huella)).encode("utf-8")).hexdigest()
+
+
+def get(clave):
+    with _lock:
+        pdf = _pdfs.get(clave)
+        if pdf is not None:
+            _pdfs.move_to_end(clave)
+        return pdf
+
+
+def put(clave, pdf):
+    global _bytes_totales
+    if len(pdf) > MAX_BYTES:
+        return
+    with _lock:
+        if clave in _pdfs:
+            _bytes_totales -= len(_pdfs.pop(clave))
+        _pdfs[clave] = pdf
+        _bytes_totales += len(pdf)
+        while _bytes_totales > MAX_BYTES:
+            _, viejo = _pdfs.popitem(last=False)
+            _bytes_totales -= len(viejo)
+
+
+# Devuelve el PDF (bytes) de la cache o lo genera con la funcion dada
+def get_or_build(clave, construir):
+    pdf = get(clave)
+    if pdf is None:
+        pdf = construir()
+        put(clave, pdf)
+    return pdf
+
+
+def stats():
+    with _lock:
+        return {"reportes": len(_pdfs), "bytes": _bytes_totales, "max_bytes": MAX_BYTES}
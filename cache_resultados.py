@@ -0,0 +1,286 @@
+import hashlib
+import marshal
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from conexiones import adjuntables_de, get_connection
+from esquema import get_schema_info
+from importes import importar
+from resultados import MAX_BYTES as MAX_BYTES_RESULTADO, MAX_FILAS, Resultado, leer_resultado
+
+# Cache de resultados de consultas, compartida por sesiones y procesos. La
+# clave es el SQL normalizado (mas la base de datos y los limites de lectura)
+# y cada entrada guarda la version de los datos con la que se leyo: tamano y
+# mtime del archivo (y de su -wal) y PRAGMA data_version. Si la version cambia
+# la entrada se descarta. Los resultados se guardan en un SQLite aparte como
+# Arrow IPC comprimido (o marshal+zlib si alguna columna mezcla tipos) y los
+# mas recientes se mantienen ya deserializados en memoria. Las consultas con
+# funciones no deterministas (random(), date('now'), CURRENT_TIMESTAMP...) no
+# se cachean: su resultado cambia aunque los datos no cambien.
+CACHE_PATH = os.getenv("VOICETOSQL_CACHE_RESULTADOS", ".cache_resultados.sqlite")
+MAX_BYTES_MEMORIA = int(os.getenv("VOICETOSQL_CACHE_RESULTADOS_MEMORIA", str(128 * 1024 * 1024)))
+MAX_BYTES_DISCO = int(os.getenv("VOICETOSQL_CACHE_RESULTADOS_DISCO", str(1024 * 1024 * 1024)))
+
+_RE_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+# Las funciones de fecha solo son no deterministas con 'now' o sin argumentos
+_RE_NO_DETERMINISTA = re.compile(
+    r"\b(?:random|randomblob|changes|total_changes|last_insert_rowid)\s*\("
+    r"|\b(?:date|time|datetime|julianday|strftime|unixepoch|timediff)\s*\(\s*(?:\)|[^)]*'now')"
+    r"|\bcurrent_(?:date|time|timestamp)\b",
+    re.IGNORECASE,
+)
+# marshal cambia de formato entre versiones de Python: cada entrada lo indica
+_FORMATO_MARSHAL = "marshal-%d.%d" % sys.version_info[:2]
+
+_local = threading.local()
+_generaciones = {}
+_generaciones_lock = threading.Lock()
+
+
+# Normaliza el SQL sin tocar los literales: minusculas, espacios simples y sin ';' final
+def normalizar_sql(sql_query):
+    partes = []
+    inicio = 0
+    for literal in _RE_LITERAL.finditer(sql_query):
+        partes.append(" ".join(sql_query[inicio:literal.start()].lower().split()))
+        partes.append(literal.group())
+        inicio = literal.end()
+    partes.append(" ".join(sql_query[inicio:].lower().split()))
+    return " ".join(p for p in partes if p).rstrip("; ")
+
+
+def es_determinista(sql_query):
+    return not _RE_NO_DETERMINISTA.search(sql_query)
+
+
+# Version de los datos de la base. PRAGMA data_version solo es comparable en
+# la misma conexion, asi que cada hilo recuerda el ultimo valor que vio la suya
+# y, si cambia, incrementa un contador de generacion comun a todo el proceso.
+def version_datos(db_path):
+    ruta = os.path.realpath(db_path)
+    info = os.stat(ruta)
+    wal = ruta + "-wal"
+    mtime_wal = os.stat(wal).st_mtime_ns if os.path.exists(wal) else 0
+    data_version = get_connection(ruta).execute("PRAGMA data_version").fetchone()[0]
+    vistas = getattr(_local, "data_version", None)
+    if vistas is None:
+        vistas = _local.data_version = {}
+    anterior = vistas.get(ruta)
+    with _generaciones_lock:
+        if anterior is not None and anterior != data_version:
+            _generaciones[ruta] = _generaciones.get(ruta, 0) + 1
+        generacion = _generaciones.get(ruta, 0)
+    vistas[ruta] = data_version
+    return f"{info.st_mtime_ns}:{info.st_size}:{mtime_wal}:{generacion}"
+
+
+def _serializar(resultado):
+    pa = importar("pyarrow")
+    columnas = list(zip(*resultado.filas)) if resultado.filas else [()] * len(resultado.columnas)
+    # Arrow convertiria 1 a 1.0 en columnas mixtas int/float: solo se usa si cada columna tiene un tipo
+    if all(len({type(v) for v in valores if v is not None}) <= 1 for valores in columnas):
+        try:
+            tabla = pa.Table.from_arrays([pa.array(valores) for valores in columnas], names=resultado.columnas)
+            destino = pa.BufferOutputStream()
+            opciones = pa.ipc.IpcWriteOptions(compression="zstd")
+            with pa.ipc.new_stream(destino, tabla.schema, options=opciones) as writer:
+                writer.write_table(tabla)
+            return "arrow", destino.getvalue().to_pybytes()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return _FORMATO_MARSHAL, zlib.compress(marshal.dumps((resultado.columnas, resultado.filas)), 1)
+
+
+def _deserializar(formato, datos, truncado, bytes_leidos):
+    if formato == "arrow":
+        tabla = importar("pyarrow").ipc.open_stream(datos).read_all()
+        columnas = tabla.column_names
+        filas = list(zip(*(columna.to_pylist() for columna in tabla.columns)))
+    elif formato == _FORMATO_MARSHAL:
+        columnas, filas = marshal.loads(zlib.decompress(datos))
+    else:
+        raise ValueError(f"Formato de cache desconocido: {formato}")
+    return Resultado(list(columnas), filas, truncado, bytes_leidos)
+
+
+class CacheResultados:
+    def __init__(self, path=CACHE_PATH, max_bytes_memoria=MAX_BYTES_MEMORIA, max_bytes_disco=MAX_BYTES_DISCO):
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_resultados (
+                clave TEXT PRIMARY KEY,
+                db TEXT NOT NULL,
+                version TEXT NOT NULL,
+                formato TEXT NOT NULL,
+                datos BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                truncado INTEGER NOT NULL,
+                bytes_leidos INTEGER NOT NULL,
+                usado REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_resultados_usado ON cache_resultados (usado)")
+        self._conn.commit()
+
+    @staticmethod
+    def clave(db_path, sql_query, max_filas, max_bytes):
+        partes = (os.path.realpath(db_path), normalizar_sql(sql_query), str(max_filas), str(max_bytes))
+        return hashlib.sha1("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+    def _guardar_en_memoria(self, clave, version, resultado):
+        tam = resultado.bytes_leidos
+        if tam > self.max_bytes_memoria:
+            return
+        if clave in self._memoria:
+            self._bytes_memoria -= self._memoria.pop(clave)[1].bytes_leidos
+        self._memoria[clave] = (version, resultado)
+        self._bytes_memoria += tam
+        while self._bytes_memoria > self.max_bytes_memoria:
+            _, (_, viejo) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= viejo.bytes_leidos
+
+    def get(self, clave, version):
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None and entrada[0] == version:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                self._conn.execute("UPDATE cache_resultados SET usado = ? WHERE clave = ?", (time.time(), clave))
+                self._conn.commit()
+                return entrada[1]
+            fila = self._conn.execute(
+                "SELECT version, formato, datos, truncado, bytes_leidos FROM cache_resultados WHERE clave = ?",
+                (clave,),
+            ).fetchone()
+            if fila is None or fila[0] != version:
+                if fila is not None or entrada is not None:
+                    # Los datos cambiaron desde que se guardo
+                    self.invalidaciones += 1
+                    self._memoria.pop(clave, None)
+                    self._conn.execute("DELETE FROM cache_resultados WHERE clave = ?", (clave,))
+                    self._conn.commit()
+                self.fallos += 1
+                return None
+            self._conn.execute("UPDATE cache_resultados SET usado = ? WHERE clave = ?", (time.time(), clave))
+            self._conn.commit()
+        try:
+            resultado = _deserializar(fila[1], fila[2], bool(fila[3]), fila[4])
+        except Exception:
+            # Entrada de otra version de Python o danada: cuenta como fallo y se borra
+            with self._lock:
+                self.fallos += 1
+                self.invalidaciones += 1
+                self._conn.execute("DELETE FROM cache_resultados WHERE clave = ?", (clave,))
+                self._conn.commit()
+            return None
+        with self._lock:
+            self.aciertos_disco += 1
+            self._guardar_en_memoria(clave, version, resultado)
+        return resultado
+
+    def put(self, clave, db_path, version, resultado):
+        formato, datos = _serializar(resultado)
+        with self._lock:
+            self._guardar_en_memoria(clave, version, resultado)
+            if len(datos) > self.max_bytes_disco:
+                return
+            # Las entradas de otra version de esta base de datos ya no pueden
+            # coincidir. Solo cuenta la version de la propia base (la primera
+            # parte): las de las bases adjuntas se comprueban al leer, y asi las
+            # consultas con y sin adjuntas de una misma base no se borran entre si
+            db = os.path.realpath(db_path)
+            propia = version.split("|", 1)[0]
+            borradas = self._conn.execute(
+                "DELETE FROM cache_resultados WHERE db = ? AND substr(version || '|', 1, ?) != ?",
+                (db, len(propia) + 1, propia + "|"),
+            ).rowcount
+            self.invalidaciones += borradas
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave, db, version, formato, datos, len(datos), int(resultado.truncado),
+                 resultado.bytes_leidos, time.time()),
+            )
+            # Desalojo LRU por encima del presupuesto de disco
+            self._conn.execute("""
+                DELETE FROM cache_resultados WHERE clave IN (
+                    SELECT clave FROM (
+                        SELECT clave, SUM(bytes) OVER (ORDER BY usado DESC) AS acumulado
+                        FROM cache_resultados
+                    ) WHERE acumulado > ?
+                )
+            """, (self.max_bytes_disco,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+            self._conn.execute("DELETE FROM cache_resultados")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entradas, bytes_disco = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM cache_resultados"
+            ).fetchone()
+            aciertos = self.aciertos_memoria + self.aciertos_disco
+            consultas = aciertos + self.fallos
+            return {
+                "entradas": entradas,
+                "entradas_memoria": len(self._memoria),
+                "bytes_memoria": self._bytes_memoria,
+                "bytes_disco": bytes_disco,
+                "max_bytes_memoria": self.max_bytes_memoria,
+                "max_bytes_disco": self.max_bytes_disco,
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": aciertos / consultas if consultas else 0.0,
+            }
+
+
+_cache_global = None
+_cache_lock = threading.Lock()
+
+
+# Instancia unica por proceso, compartida entre sesiones de Streamlit
+def get_cache_resultados():
+    global _cache_global
+    with _cache_lock:
+        if _cache_global is None:
+            _cache_global = CacheResultados()
+        return _cache_global
+
+
+# Como leer_resultado, pero reutilizando el resultado si el mismo SQL ya se
+# ejecuto sobre la misma version de los datos. Devuelve (resultado, acierto).
+def leer_resultado_cacheado(db_path, sql_query, max_filas=MAX_FILAS, max_bytes=MAX_BYTES_RESULTADO, timeout=None):
+    if not es_determinista(sql_query):
+        return leer_resultado(db_path, sql_query, max_filas, max_bytes, timeout), False
+    cache = get_cache_resultados()
+    clave = cache.clave(db_path, sql_query, max_filas, max_bytes)
+    # Si la consulta cruza bases adjuntas, cuenta tambien la version de cada una
+    adjuntas = adjuntables_de(sql_query, get_schema_info(db_path)["tablas"])
+    version = "|".join([version_datos(db_path)] + [version_datos(r) for r in adjuntas.values()])
+    resultado = cache.get(clave, version)
+    if resultado is not None:
+        return resultado, True
+    resultado = leer_resultado(db_path, sql_query, max_filas, max_bytes, timeout)
+    cache.put(clave, db_path, version, resultado)
+    return resultado, False
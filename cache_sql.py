@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from normalizacion import sin_tildes
+
+# Cache persistente pregunta -> SQL generado, guardada en un SQLite aparte.
+# La clave combina la pregunta, la huella del esquema y el modelo, asi que las
+# entradas dejan de coincidir (y se purgan) cuando cambia el esquema. Cada
+# entrada guarda tambien la base de datos: con varias bases registradas solo
+# se purgan las huellas viejas de la misma base.
+CACHE_PATH = os.getenv("VOICETOSQL_CACHE_SQL", ".cache_sql.sqlite")
+MAX_ENTRADAS = 5000
+TTL_SEGUNDOS = 7 * 24 * 3600
+
+
+# Normaliza la pregunta: minusculas, sin tildes, sin puntuacion y espacios simples
+def normalizar_pregunta(texto):
+    texto = re.sub(r"[^\w\s]", " ", sin_tildes(texto))
+    return " ".join(texto.split())
+
+
+def _hash(*partes):
+    return hashlib.sha1("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+class CacheSQL:
+    def __init__(self, path=CACHE_PATH, max_entradas=MAX_ENTRADAS, ttl=TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.aciertos_exactos = 0
+        self.aciertos_normalizados = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_sql (
+                clave_exacta TEXT PRIMARY KEY,
+                clave_normalizada TEXT NOT NULL,
+                huella_esquema TEXT NOT NULL,
+                db TEXT NOT NULL DEFAULT '',
+                modelo TEXT NOT NULL,
+                pregunta TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL
+            )
+        """)
+        # Caches creadas antes de guardar la base: se anade la columna
+        if "db" not in [c[1] for c in self._conn.execute("PRAGMA table_info(cache_sql)")]:
+            self._conn.execute("ALTER TABLE cache_sql ADD COLUMN db TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_sql_norm ON cache_sql (clave_normalizada)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_sql_usado ON cache_sql (usado)")
+        self._conn.commit()
+
+    # Busca primero la pregunta exacta y despues la normalizada
+    def get(self, pregunta, huella_esquema, modelo):
+        ahora = time.time()
+        exacta = _hash(pregunta.strip(), huella_esquema, modelo)
+        normalizada = _hash(normalizar_pregunta(pregunta), huella_esquema, modelo)
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_sql WHERE creado < ?", (ahora - self.ttl,))
+            fila = self._conn.execute(
+                "SELECT clave_exacta, sql FROM cache_sql WHERE clave_exacta = ?", (exacta,)
+            ).fetchone()
+            if fila:
+                self.aciertos_exactos += 1
+            else:
+                fila = self._conn.execute(
+                    "SELECT clave_exacta, sql FROM cache_sql WHERE clave_normalizada = ? "
+                    "ORDER BY usado DESC LIMIT 1", (normalizada,)
+                ).fetchone()
+                if fila:
+                    self.aciertos_normalizados += 1
+            if not fila:
+                self.fallos += 1
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache_sql SET usado = ? WHERE clave_exacta = ?", (ahora, fila[0]))
+            self._conn.commit()
+            return fila[1]
+
+    def put(self, pregunta, huella_esquema, modelo, sql, db_path):
+        ahora = time.time()
+        exacta = _hash(pregunta.strip(), huella_esquema, modelo)
+        normalizada = _hash(normalizar_pregunta(pregunta), huella_esquema, modelo)
+        db = os.path.realpath(db_path)
+        with self._lock:
+            # Las entradas de otro esquema de esta base ya no pueden coincidir: se eliminan
+            self._conn.execute("DELETE FROM cache_sql WHERE db = ? AND huella_esquema != ?", (db, huella_esquema))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_sql (clave_exacta, clave_normalizada, huella_esquema, db, modelo, "
+                "pregunta, sql, creado, usado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (exacta, normalizada, huella_esquema, db, modelo, pregunta, sql, ahora, ahora),
+            )
+            # Desalojo LRU por encima del maximo de entradas
+            self._conn.execute(
+                "DELETE FROM cache_sql WHERE clave_exacta IN ("
+                "SELECT clave_exacta FROM cache_sql ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_sql")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM cache_sql").fetchone()[0]
+        consultas = self.aciertos_exactos + self.aciertos_normalizados + self.fallos
+        aciertos = self.aciertos_exactos + self.aciertos_normalizados
+        return {
+            "entradas": entradas,
+            "aciertos_exactos": self.aciertos_exactos,
+            "aciertos_normalizados": self.aciertos_normalizados,
+            "fallos": self.fallos,
+            "tasa_aciertos": aciertos / consultas if consultas else 0.0,
+        }
+
+
+_cache_global = None
+_cache_lock = threading.Lock()
+
+
+# Instancia unica por proceso, compartida entre sesiones de Streamlit
+def get_cache_sql():
+    global _cache_global
+    with _cache_lock:
+        if _cache_global is None:
+            _cache_global = CacheSQL()
+        return _cache_global
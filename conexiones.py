@@ -0,0 +1,172 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
+from pathlib import Path
+
+# Pool de conexiones SQLite de solo lectura. Cada hilo reutiliza una conexion
+# por base de datos en lugar de abrir y cerrar una en cada consulta. Streamlit
+# ejecuta cada rerun del script en un hilo nuevo, asi que las conexiones que
+# abre el hilo de la interfaz solo duran ese rerun (se cierran al recogerse el
+# hilo). Las que de verdad se reutilizan son las de los hilos de trabajos.py,
+# que viven mientras el proceso, y las de los hilos del modo por lotes.
+# journal_mode=WAL no se puede activar desde una conexion de solo lectura: si se
+# quiere, debe fijarse una vez sobre el archivo con una conexion de escritura.
+PRAGMAS = {
+    "query_only": 1,
+    "mmap_size": int(os.getenv("VOICETOSQL_SQLITE_MMAP", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("VOICETOSQL_SQLITE_CACHE_KB", "65536")) * -1,
+    "temp_store": "MEMORY",
+}
+TIMEOUT_CONSULTA = float(os.getenv("VOICETOSQL_TIMEOUT_CONSULTA", "30"))
+# Cada cuantas instrucciones de la VM de SQLite se comprueba el tiempo limite
+INSTRUCCIONES_PROGRESO = 10000
+# Conexiones abiertas como maximo por hilo: con decenas de bases se cierran las
+# menos usadas en vez de acumular descriptores
+MAX_CONEXIONES = int(os.getenv("VOICETOSQL_MAX_CONEXIONES", "64"))
+
+_local = threading.local()
+# Bases que se pueden adjuntar (ATTACH) por alias: una consulta que nombra
+# alias.tabla las adjunta a la conexion de la base principal
+_adjuntables = {}
+_RE_CALIFICADO = re.compile(r'["`\[]?(\w+)["`\]]?\s*\.\s*["`\[]?\w')
+_RE_CALIFICADO_TABLA = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)["`\]]?\s*\.\s*["`\[]?\w', re.IGNORECASE)
+_RE_ALIAS_TABLA = re.compile(
+    r'\b(?:FROM|JOIN)\s+(?:["`\[]?\w+["`\]]?\s*\.\s*)?["`\[]?\w+["`\]]?\s+(?:AS\s+)?(\w+)', re.IGNORECASE
+)
+_RE_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def _abrir(db_path, pragmas):
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    for nombre, valor in pragmas.items():
+        conn.execute(f"PRAGMA {nombre} = {valor};")
+    return conn
+
+
+# Devuelve la conexion de solo lectura del hilo actual para la base de datos
+def get_connection(db_path, pragmas=None):
+    conexiones = getattr(_local, "conexiones", None)
+    if conexiones is None:
+        conexiones = _local.conexiones = OrderedDict()
+    clave = os.path.realpath(db_path)
+    conn = conexiones.get(clave)
+    if conn is None:
+        conn = _abrir(clave, PRAGMAS if pragmas is None else pragmas)
+        conexiones[clave] = conn
+        while len(conexiones) > MAX_CONEXIONES:
+            vieja_clave, vieja = conexiones.popitem(last=False)
+            vieja.close()
+            _adjuntas_del_hilo().pop(vieja_clave, None)
+    else:
+        conexiones.move_to_end(clave)
+    return conn
+
+
+# Cierra las conexiones del hilo actual
+def close_connections():
+    for conn in getattr(_local, "conexiones", {}).values():
+        conn.close()
+    _local.conexiones = OrderedDict()
+    _local.adjuntas = {}
+
+
+# Bases adjuntas a cada conexion del hilo, en orden de uso: {principal: {alias: ruta}}
+def _adjuntas_del_hilo():
+    adjuntas = getattr(_local, "adjuntas", None)
+    if adjuntas is None:
+        adjuntas = _local.adjuntas = {}
+    return adjuntas
+
+
+def registrar_adjuntable(alias, db_path):
+    _adjuntables[alias] = os.path.realpath(db_path)
+
+
+# Bases registradas que la consulta nombra como alias.tabla: {alias: ruta}.
+# "x.y" es una base en la posicion de tabla de un FROM/JOIN; en el resto de la
+# consulta solo si x no es una tabla de la base principal (tablas_principal)
+# ni un alias de tabla: "clientes.nombre" es una columna aunque exista una
+# base con alias clientes.
+def adjuntables_de(sql_query, tablas_principal=()):
+    sql_query = _RE_LITERAL.sub("''", sql_query)
+    calificados = [a for a in _RE_CALIFICADO.findall(sql_query) if a in _adjuntables]
+    if not calificados:
+        return {}
+    en_from = set(_RE_CALIFICADO_TABLA.findall(sql_query))
+    locales = {t.lower() for t in tablas_principal} | {a.lower() for a in _RE_ALIAS_TABLA.findall(sql_query)}
+    return {a: _adjuntables[a] for a in calificados if a in en_from or a.lower() not in locales}
+
+
+def _tablas_de(conn):
+    return [fila[0] for fila in conn.execute("SELECT name FROM main.sqlite_master WHERE type IN ('table', 'view')")]
+
+
+# Adjunta a la conexion las bases que nombra la consulta. Las ya adjuntas se
+# mantienen; si se llega al limite de SQLite se sueltan las usadas hace mas tiempo.
+def adjuntar(conn, sql_query):
+    if not adjuntables_de(sql_query):
+        return
+    necesarias = adjuntables_de(sql_query, _tablas_de(conn))
+    if not necesarias:
+        return
+    principal = os.path.realpath(conn.execute("PRAGMA database_list").fetchone()[2])
+    actuales = _adjuntas_del_hilo().setdefault(principal, OrderedDict())
+    limite = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    for alias, ruta in necesarias.items():
+        if ruta == principal:
+            continue
+        if alias in actuales:
+            actuales.move_to_end(alias)
+            continue
+        while len(actuales) >= limite:
+            viejo, _ = actuales.popitem(last=False)
+            conn.execute(f'DETACH DATABASE "{viejo}"')
+        conn.execute(f'ATTACH DATABASE ? AS "{alias}"', (Path(ruta).as_uri() + "?mode=ro",))
+        actuales[alias] = ruta
+
+
+# Asocia un threading.Event a las consultas del hilo actual: si se activa,
+# la consulta en curso se interrumpe y se lanza CancelledError
+@contextmanager
+def cancelable(evento):
+    anterior = getattr(_local, "cancelado", None)
+    _local.cancelado = evento
+    try:
+        yield
+    finally:
+        _local.cancelado = anterior
+
+
+# Entrega una conexion del pool con un tiempo maximo de ejecucion: si la
+# consulta lo supera, SQLite la interrumpe y se lanza TimeoutError. Con
+# sql_query se adjuntan antes las bases que la consulta nombra.
+@contextmanager
+def consulta(db_path, timeout=None, sql_query=None):
+    timeout = TIMEOUT_CONSULTA if timeout is None else timeout
+    conn = get_connection(db_path)
+    if sql_query is not None:
+        adjuntar(conn, sql_query)
+    limite = time.monotonic() + timeout
+    cancelado = getattr(_local, "cancelado", None)
+    if cancelado is None:
+        conn.set_progress_handler(lambda: time.monotonic() > limite, INSTRUCCIONES_PROGRESO)
+    else:
+        conn.set_progress_handler(lambda: cancelado.is_set() or time.monotonic() > limite, INSTRUCCIONES_PROGRESO)
+    try:
+        yield conn
+    except Exception as e:
+        # pandas envuelve el error de sqlite3, por eso se mira el mensaje
+        if "interrupted" in str(e):
+            if cancelado is not None and cancelado.is_set():
+                raise CancelledError("La consulta fue cancelada") from e
+            if time.monotonic() > limite:
+                raise TimeoutError(f"La consulta supero el tiempo maximo de {timeout:g} s y fue cancelada") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
@@ -0,0 +1,93 @@
+import os
+import re
+
+from importes import importar
+
+# Contexto acotado para la conversacion de refinamiento de main.py. En vez de
+# reenviar todo el historial en cada correccion se envia siempre lo mismo:
+#   system     prompt con el esquema
+#   user       pregunta original (+ resumen de las correcciones ya aplicadas)
+#   assistant  ultimo borrador de SQL (los anteriores quedan superados)
+#   user       correccion nueva
+# Si se supera el presupuesto de tokens se descartan las correcciones mas
+# antiguas del resumen, que ya estan incorporadas en el borrador.
+PRESUPUESTO_TOKENS = int(os.getenv("VOICETOSQL_PRESUPUESTO_TOKENS", "3000"))
+# Tokens que OpenAI anade por cada mensaje (rol y separadores)
+TOKENS_POR_MENSAJE = 4
+
+_codificaciones = {}
+
+
+# Cuenta tokens con tiktoken si esta instalado; si no, aproxima (~4 caracteres por token)
+def contar_tokens(texto, modelo="gpt-3.5-turbo"):
+    codificacion = _codificaciones.get(modelo)
+    if codificacion is None:
+        try:
+            tiktoken = importar("tiktoken")
+            try:
+                codificacion = tiktoken.encoding_for_model(modelo)
+            except KeyError:
+                codificacion = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            codificacion = False
+        _codificaciones[modelo] = codificacion
+    if codificacion:
+        return len(codificacion.encode(texto))
+    return max(len(re.findall(r"\w+|[^\w\s]", texto)), -(-len(texto) // 4))
+
+
+def tokens_mensajes(messages, modelo="gpt-3.5-turbo"):
+    return sum(contar_tokens(m["content"], modelo) + TOKENS_POR_MENSAJE for m in messages)
+
+
+class ContextoConversacion:
+    def __init__(self, sistema, modelo="gpt-3.5-turbo", presupuesto=PRESUPUESTO_TOKENS):
+        self.sistema = sistema
+        self.modelo = modelo
+        self.presupuesto = presupuesto
+        self.pregunta = None
+        self.correcciones = []
+        self.borrador = None
+        self.turnos = []
+
+    def primer_turno(self):
+        return self.pregunta is None
+
+    def _pregunta_con_resumen(self, correcciones):
+        if not correcciones:
+            return self.pregunta
+        resumen = "\n".join(f"- {c}" for c in correcciones)
+        return f"{self.pregunta}\n\nCorrecciones ya aplicadas a la consulta:\n{resumen}"
+
+    # Mensajes a enviar para una entrada nueva (la pregunta o una correccion)
+    def mensajes(self, entrada):
+        sistema = {"role": "system", "content": self.sistema}
+        if self.primer_turno():
+            return [sistema, {"role": "user", "content": entrada}]
+        correcciones = list(self.correcciones)
+        while True:
+            messages = [
+                sistema,
+                {"role": "user", "content": self._pregunta_con_resumen(correcciones)},
+                {"role": "assistant", "content": self.borrador},
+                {"role": "user", "content": entrada},
+            ]
+            if not correcciones or tokens_mensajes(messages, self.modelo) <= self.presupuesto:
+                return messages
+            correcciones.pop(0)
+
+    # Anota la respuesta del turno: pasa a ser el unico borrador vigente
+    def registrar(self, entrada, respuesta, tokens_prompt, segundos, tokens_totales=None):
+        if self.primer_turno():
+            self.pregunta = entrada
+        else:
+            self.correcciones.append(entrada)
+        self.borrador = respuesta
+        turno = {
+            "turno": len(self.turnos) + 1,
+            "tokens_prompt": tokens_prompt,
+            "tokens_totales": tokens_totales,
+            "segundos": segundos,
+        }
+        self.turnos.append(turno)
+        return turno
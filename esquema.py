@@ -0,0 +1,76 @@
+import hashlib
+import os
+import threading
+
+from conexiones import get_connection
+
+# Cache del esquema compartido por app.py y main.py.
+# La clave es el archivo de la base de datos; la entrada se reconstruye solo
+# cuando cambia PRAGMA schema_version (es decir, cuando hay cambios de DDL).
+_lock = threading.Lock()
+_cache = {}
+
+
+def _clave(db_path):
+    return os.path.realpath(db_path)
+
+
+# Lee tablas, columnas y claves foraneas de la base de datos
+def _leer_esquema(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    tablas = {}
+    foraneas = {}
+    for (table_name,) in cursor.fetchall():
+        cursor.execute(f'PRAGMA table_info("{table_name}");')
+        tablas[table_name] = [col[1] for col in cursor.fetchall()]
+        cursor.execute(f'PRAGMA foreign_key_list("{table_name}");')
+        foraneas[table_name] = [(fk[3], fk[2], fk[4]) for fk in cursor.fetchall()]
+    return tablas, foraneas
+
+
+def _formatear(tablas):
+    schema = ""
+    for table_name, col_names in tablas.items():
+        schema += f"Tabla: {table_name}\nColumnas: {', '.join(col_names)}\n"
+    return schema
+
+
+# Devuelve la informacion del esquema (version, texto, tablas, foraneas, huella)
+def get_schema_info(db_path):
+    clave = _clave(db_path)
+    with _lock:
+        conn = get_connection(clave)
+        version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        info = _cache.get(clave)
+        if info is None or info["version"] != version:
+            tablas, foraneas = _leer_esquema(conn)
+            texto = _formatear(tablas)
+            info = {
+                "version": version,
+                "texto": texto,
+                "tablas": tablas,
+                "foraneas": foraneas,
+                "huella": hashlib.sha1(texto.encode("utf-8")).hexdigest(),
+            }
+            _cache[clave] = info
+        return info
+
+
+# Funcion para obtener el esquema de la BD (texto usado en los prompts)
+def get_db_schema(db_path):
+    return get_schema_info(db_path)["texto"]
+
+
+# Huella del esquema, util como parte de la clave de otras caches
+def get_schema_fingerprint(db_path):
+    return get_schema_info(db_path)["huella"]
+
+
+# Invalida la cache (de un archivo o completa)
+def clear_schema_cache(db_path=None):
+    with _lock:
+        if db_path is None:
+            _cache.clear()
+        else:
+            _cache.pop(_clave(db_path), None)
@@ -0,0 +1,295 @@
+import argparse
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from conexiones import consulta, get_connection
+from esquema import get_schema_info
+from normalizacion import sin_tildes
+from seleccion_esquema import tokenizar
+
+# Estadisticas por columna e indice de valores de cada base de datos, en
+# memoria y refrescadas por un hilo en segundo plano: filas, no nulos, valores
+# distintos, min/max, los valores mas frecuentes y un indice invertido de
+# token de valor -> (tabla, columna, valor) para las columnas de texto con
+# pocos valores distintos. Sirven para anadir al prompt los valores que la
+# pregunta menciona ("clientes de Madrid" -> ciudad = 'Madrid') y para
+# corregir literales del SQL generado sin lanzar SELECT DISTINCT en cada consulta.
+#
+# El hilo mira PRAGMA data_version cada INTERVALO segundos; si cambio, solo se
+# recalculan las tablas cuya firma (MAX(rowid), COUNT(*)) cambio. Una
+# actualizacion que no cambie la firma se recoge en el refresco completo que se
+# hace cada TTL segundos.
+INTERVALO = float(os.getenv("VOICETOSQL_ESTADISTICAS_INTERVALO", "30"))
+TTL = float(os.getenv("VOICETOSQL_ESTADISTICAS_TTL", "3600"))
+# Filas leidas por tabla; en tablas mayores las estadisticas son aproximadas
+MAX_FILAS = int(os.getenv("VOICETOSQL_ESTADISTICAS_FILAS", "200000"))
+# Columnas de texto con hasta este numero de valores distintos se indexan enteras
+MAX_VALORES = int(os.getenv("VOICETOSQL_ESTADISTICAS_VALORES", "1000"))
+TOP_K = 5
+# Columnas categoricas (pocos valores y repetidos) que se listan en el prompt
+# aunque la pregunta no los mencione
+MAX_CATEGORIAS = 10
+TIMEOUT_TABLA = 30
+
+_RE_COMPARACION = re.compile(
+    r"""(?:["`\[]?\w+["`\]]?\.)?["`\[]?(\w+)["`\]]?\s*(=|!=|<>)\s*'((?:[^']|'')*)'""",
+)
+
+
+def _columna(conn, tabla, columna, limite):
+    origen = f'(SELECT "{columna}" AS v FROM "{tabla}" LIMIT {limite})'
+    no_nulos, distintos, minimo, maximo = conn.execute(
+        f"SELECT COUNT(v), COUNT(DISTINCT v), MIN(v), MAX(v) FROM {origen}"
+    ).fetchone()
+    top = conn.execute(
+        f"SELECT v, COUNT(*) FROM {origen} WHERE v IS NOT NULL AND typeof(v) != 'blob' "
+        f"GROUP BY v ORDER BY 2 DESC LIMIT {TOP_K}"
+    ).fetchall()
+    valores = None
+    if distintos <= MAX_VALORES:
+        textos = [v for (v,) in conn.execute(f"SELECT DISTINCT v FROM {origen} WHERE typeof(v) = 'text'")]
+        if textos:
+            valores = frozenset(textos)
+    return {
+        "no_nulos": no_nulos,
+        "distintos": distintos,
+        "min": None if isinstance(minimo, bytes) else minimo,
+        "max": None if isinstance(maximo, bytes) else maximo,
+        "top": top,
+        "valores": valores,
+    }
+
+
+class EstadisticasBD:
+    def __init__(self, db_path):
+        self.db_path = os.path.realpath(db_path)
+        # (tabla, columna) -> estadisticas; token -> {(tabla, columna, valor)}
+        self.columnas = {}
+        self.invertido = {}
+        self.actualizado = None
+        self.segundos = None
+        self.error = None
+        self.listo = threading.Event()
+        self._tablas = {}
+        self._firmas = {}
+        self._data_version = None
+        self._huella = None
+        self._completo = 0.0
+
+    def _firma(self, conn, tabla):
+        try:
+            return conn.execute(f'SELECT MAX(rowid), COUNT(*) FROM "{tabla}"').fetchone()
+        except sqlite3.Error:
+            # Tablas WITHOUT ROWID: sin firma, se recalculan siempre
+            return None
+
+    def _analizar_tabla(self, tabla, columnas):
+        with consulta(self.db_path, timeout=TIMEOUT_TABLA) as conn:
+            filas = conn.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM "{tabla}" LIMIT {MAX_FILAS + 1})').fetchone()[0]
+            estadisticas = {}
+            for columna in columnas:
+                info = _columna(conn, tabla, columna, MAX_FILAS)
+                info["filas"] = min(filas, MAX_FILAS)
+                info["aproximado"] = filas > MAX_FILAS
+                estadisticas[columna] = info
+        return estadisticas
+
+    # Recalcula las tablas que cambiaron (o todas) y publica el indice nuevo
+    def refrescar(self, completo=False):
+        inicio = time.perf_counter()
+        info = get_schema_info(self.db_path)
+        conn = get_connection(self.db_path)
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        completo = completo or info["huella"] != self._huella or time.time() - self._completo > TTL
+        if not completo and data_version == self._data_version:
+            return False
+        tablas = {}
+        firmas = {}
+        for tabla, columnas in info["tablas"].items():
+            if tabla.startswith("sqlite_"):
+                continue
+            firmas[tabla] = self._firma(conn, tabla)
+            if not completo and firmas[tabla] is not None and firmas[tabla] == self._firmas.get(tabla):
+                tablas[tabla] = self._tablas[tabla]
+            else:
+                tablas[tabla] = self._analizar_tabla(tabla, columnas)
+
+        columnas = {}
+        invertido = {}
+        for tabla, estadisticas in tablas.items():
+            for columna, stats in estadisticas.items():
+                columnas[(tabla, columna)] = stats
+                for valor in stats["valores"] or ():
+                    for token in set(tokenizar(valor)):
+                        if len(token) > 2:
+                            invertido.setdefault(token, set()).add((tabla, columna, valor))
+        # Se publica todo de una vez: los lectores no toman el lock
+        self.columnas, self.invertido = columnas, invertido
+        self._tablas, self._firmas = tablas, firmas
+        self._data_version, self._huella = data_version, info["huella"]
+        if completo:
+            self._completo = time.time()
+        self.actualizado = time.time()
+        self.segundos = time.perf_counter() - inicio
+        self.error = None
+        self.listo.set()
+        return True
+
+    # Valores indexados que aparecen completos en el texto: [(tabla, columna, valor)]
+    def buscar(self, texto):
+        tokens = set(tokenizar(texto))
+        candidatos = set()
+        for token in tokens:
+            candidatos.update(self.invertido.get(token, ()))
+        encontrados = []
+        for tabla, columna, valor in sorted(candidatos):
+            propios = {t for t in tokenizar(valor) if len(t) > 2}
+            if propios and propios <= tokens:
+                encontrados.append((tabla, columna, valor))
+        return encontrados
+
+    # Linea "Valores: ..." para una tabla del prompt: los valores mencionados en
+    # la pregunta y los de las columnas categoricas
+    def linea_valores(self, tabla, pregunta, mencionados=None):
+        mencionados = self.buscar(pregunta) if mencionados is None else mencionados
+        partes = []
+        for (t, columna), stats in self.columnas.items():
+            if t != tabla:
+                continue
+            valores = [v for tt, c, v in mencionados if tt == tabla and c == columna]
+            if stats["valores"] and stats["distintos"] <= MAX_CATEGORIAS and stats["distintos"] * 2 <= stats["filas"]:
+                valores += [v for v, _ in stats["top"] if isinstance(v, str) and v not in valores]
+            if valores:
+                lista = " | ".join("'" + v.replace("'", "''") + "'" for v in valores[:MAX_CATEGORIAS])
+                partes.append(f"{columna} = {lista}")
+        return "Valores: " + "; ".join(partes) if partes else None
+
+    def resumen(self):
+        return {
+            "columnas": len(self.columnas),
+            "valores_indexados": sum(len(s["valores"] or ()) for s in self.columnas.values()),
+            "tokens": len(self.invertido),
+            "actualizado": self.actualizado,
+            "segundos": self.segundos,
+            "error": self.error,
+        }
+
+
+_lock = threading.Lock()
+_bases = {}
+_despertar = threading.Event()
+_hilo = None
+
+
+def _bucle():
+    while True:
+        _despertar.wait(INTERVALO)
+        _despertar.clear()
+        with _lock:
+            bases = list(_bases.values())
+        for estadisticas in bases:
+            try:
+                estadisticas.refrescar()
+            except Exception as e:
+                estadisticas.error = str(e)
+                estadisticas.listo.set()
+
+
+# Estadisticas de la base (registrandola en el hilo de refresco la primera
+# vez). Con esperar > 0 se espera hasta ese tiempo a que este el primer indice.
+def get_estadisticas(db_path, esperar=0):
+    global _hilo
+    clave = os.path.realpath(db_path)
+    with _lock:
+        estadisticas = _bases.get(clave)
+        if estadisticas is None:
+            estadisticas = _bases[clave] = EstadisticasBD(clave)
+            _despertar.set()
+        if _hilo is None:
+            _hilo = threading.Thread(target=_bucle, name="estadisticas", daemon=True)
+            _hilo.start()
+    if esperar:
+        estadisticas.listo.wait(esperar)
+    return estadisticas
+
+
+# Anade a cada tabla del esquema del prompt los valores relevantes para la pregunta
+def enriquecer_esquema(db_path, esquema_texto, pregunta):
+    estadisticas = get_estadisticas(db_path)
+    if not estadisticas.columnas:
+        return esquema_texto
+    mencionados = estadisticas.buscar(pregunta)
+    lineas = []
+    for linea in esquema_texto.splitlines():
+        lineas.append(linea)
+        if linea.startswith("Columnas: ") and len(lineas) > 1 and lineas[-2].startswith("Tabla: "):
+            valores = estadisticas.linea_valores(lineas[-2][len("Tabla: "):], pregunta, mencionados)
+            if valores:
+                lineas.append(valores)
+    return "\n".join(lineas) + ("\n" if esquema_texto.endswith("\n") else "")
+
+
+# Corrige los literales de texto comparados con = / != que no existen en la
+# columna pero si con otras mayusculas o tildes ('madrid' -> 'Madrid'). Un
+# valor solo parecido no se cambia: 'inactivo' no es 'activo', y reescribirlo
+# devolveria justo las filas contrarias. Esos se devuelven como sugerencias.
+# Devuelve (sql, correcciones, sugerencias), ambas listas de
+# (columna, original, valor_conocido).
+def corregir_literales(db_path, sql_query):
+    estadisticas = get_estadisticas(db_path)
+    if not estadisticas.columnas:
+        return sql_query, [], []
+    tablas = {t for t, _ in estadisticas.columnas if re.search(rf"\b{re.escape(t)}\b", sql_query, re.IGNORECASE)}
+    correcciones = []
+    sugerencias = []
+    partes = []
+    inicio = 0
+    for m in _RE_COMPARACION.finditer(sql_query):
+        columna, literal = m.group(1), m.group(3).replace("''", "'")
+        conocidos = set()
+        completos = True
+        for tabla in tablas:
+            stats = estadisticas.columnas.get((tabla, columna))
+            if stats is not None:
+                if stats["valores"] is None or stats["aproximado"]:
+                    completos = False
+                else:
+                    conocidos |= stats["valores"]
+        if not conocidos or not completos or literal in conocidos:
+            continue
+        normalizados = {sin_tildes(v): v for v in conocidos}
+        corregido = normalizados.get(sin_tildes(literal))
+        if corregido is None:
+            parecidos = difflib.get_close_matches(sin_tildes(literal), normalizados, n=1, cutoff=0.8)
+            if parecidos:
+                sugerencias.append((columna, literal, normalizados[parecidos[0]]))
+            continue
+        partes.append(sql_query[inicio:m.start(3)] + corregido.replace("'", "''"))
+        inicio = m.end(3)
+        correcciones.append((columna, literal, corregido))
+    partes.append(sql_query[inicio:])
+    return "".join(partes), correcciones, sugerencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estadisticas de columnas e indice de valores")
+    parser.add_argument("db", nargs="?", default="identifier.sqlite")
+    parser.add_argument("--pregunta", default=None, help="Muestra los valores que reconoce en la pregunta")
+    args = parser.parse_args()
+
+    estadisticas = get_estadisticas(args.db, esperar=TIMEOUT_TABLA * 10)
+    if estadisticas.error:
+        raise SystemExit(f"Error: {estadisticas.error}")
+    for (tabla, columna), stats in estadisticas.columnas.items():
+        top = ", ".join(f"{v!r} ({n})" for v, n in stats["top"][:3])
+        print(f"{tabla}.{columna}: {stats['distintos']} distintos de {stats['filas']} filas"
+              f"{' (aprox.)' if stats['aproximado'] else ''}, min {stats['min']!r}, max {stats['max']!r}, top {top}")
+    resumen = estadisticas.resumen()
+    print(f"{resumen['valores_indexados']} valores indexados en {resumen['tokens']} tokens ({resumen['segundos'] * 1000:.1f} ms)")
+    if args.pregunta:
+        for tabla, columna, valor in estadisticas.buscar(args.pregunta):
+            print(f"{tabla}.{columna} = {valor!r}")
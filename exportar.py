@@ -0,0 +1,155 @@
+import csv
+import io
+import sqlite3
+import tempfile
+
+from resultados import iterar_paginas, leer_resultado, sin_punto_y_coma
+
+# Exportaciones del resultado completo directamente desde el cursor de SQLite,
+# pagina a pagina, sin construir nunca un DataFrame. Los archivos se escriben
+# en un SpooledTemporaryFile: en memoria si son pequenos, en disco si no.
+TAM_LOTE = 10000
+MAX_EN_MEMORIA = 16 * 1024 * 1024
+# Las exportaciones pueden tardar mas que una consulta interactiva
+TIMEOUT_EXPORTACION = 600
+
+FORMATOS = {
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "arrow": ("Arrow IPC", "application/vnd.apache.arrow.file"),
+}
+
+
+def _archivo_temporal():
+    return tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+
+
+def exportar_csv(db_path, sql_query):
+    destino = _archivo_temporal()
+    texto = io.TextIOWrapper(destino, encoding="utf-8", newline="")
+    writer = csv.writer(texto)
+    cabecera = False
+    for columnas, filas in iterar_paginas(db_path, sql_query, TAM_LOTE, TIMEOUT_EXPORTACION):
+        if not cabecera:
+            writer.writerow(columnas)
+            cabecera = True
+        writer.writerows(filas)
+    texto.flush()
+    texto.detach()
+    destino.seek(0)
+    return destino
+
+
+# Enteros a partir de los cuales float64 ya no los representa exactamente
+MAX_ENTERO_EXACTO = 2 ** 53
+
+
+# Tipos de Arrow de las columnas de todo el resultado, no solo del primer lote. SQLite
+# admite tipos mixtos en una columna, asi que se mira con typeof que clases de
+# valores guarda cada una en todas las filas y se elige el tipo mas estrecho
+# que las admite sin perder nada: int64, float64 si hay reales (y ningun
+# entero que no quepa exacto), binario si solo hay blobs y texto en otro caso.
+# Las sentencias que no se pueden envolver (p.ej. PRAGMA) se exportan como texto.
+def _tipos_arrow(pa, db_path, sql_query):
+    consulta = sin_punto_y_coma(sql_query)
+    try:
+        columnas = leer_resultado(db_path, f"SELECT * FROM ({consulta}) LIMIT 0",
+                                  max_filas=0, timeout=TIMEOUT_EXPORTACION).columnas
+    except sqlite3.Error:
+        return None
+    alias = [f"c{i}" for i in range(len(columnas))]
+    expresiones = []
+    for c in alias:
+        expresiones += [
+            f"MAX(typeof({c}) = 'integer')",
+            f"MAX(typeof({c}) = 'real')",
+            f"MAX(typeof({c}) = 'text')",
+            f"MAX(typeof({c}) = 'blob')",
+            f"MAX(typeof({c}) = 'integer' AND abs({c}) > {MAX_ENTERO_EXACTO})",
+        ]
+    tipos = f"WITH v({', '.join(alias)}) AS ({consulta}) SELECT {', '.join(expresiones)} FROM v"
+    fila = leer_resultado(db_path, tipos, timeout=TIMEOUT_EXPORTACION).filas[0]
+    tipos = []
+    for i in range(len(columnas)):
+        entero, real, texto, blob, grande = (bool(v) for v in fila[i * 5:i * 5 + 5])
+        if entero and not (real or texto or blob):
+            tipo = pa.int64()
+        elif real and not (texto or blob or grande):
+            tipo = pa.float64()
+        elif blob and not (entero or real or texto):
+            tipo = pa.binary()
+        else:
+            tipo = pa.string()
+        tipos.append(tipo)
+    return tipos
+
+
+# Convierte una columna a un array de Arrow con el tipo del esquema; en las
+# columnas de texto los valores de otras clases se pasan a texto
+def _a_array(pa, valores, tipo):
+    if tipo == pa.string():
+        valores = [v if v is None or isinstance(v, str) else str(v) for v in valores]
+    return pa.array(valores, type=tipo)
+
+
+# Genera RecordBatches de Arrow por lotes con el esquema de todo el resultado.
+# Un resultado vacio genera un lote sin filas, para que el archivo lleve el esquema.
+def _lotes_arrow(pa, db_path, sql_query):
+    tipos = _tipos_arrow(pa, db_path, sql_query)
+    esquema = None
+    for columnas, filas in iterar_paginas(db_path, sql_query, TAM_LOTE, TIMEOUT_EXPORTACION):
+        if esquema is None:
+            tipos = tipos or [pa.string()] * len(columnas)
+            esquema = pa.schema([pa.field(nombre, tipo) for nombre, tipo in zip(columnas, tipos)])
+        valores = list(zip(*filas)) if filas else [() for _ in columnas]
+        arrays = [_a_array(pa, list(col), campo.type) for col, campo in zip(valores, esquema)]
+        yield esquema, pa.RecordBatch.from_arrays(arrays, schema=esquema)
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow as pa
+        return pa
+    except ImportError:
+        raise RuntimeError("Para exportar a Parquet o Arrow hace falta instalar pyarrow")
+
+
+def exportar_parquet(db_path, sql_query):
+    pa = _importar_pyarrow()
+    import pyarrow.parquet as pq
+    destino = _archivo_temporal()
+    writer = None
+    for esquema, lote in _lotes_arrow(pa, db_path, sql_query):
+        if writer is None:
+            writer = pq.ParquetWriter(destino, esquema)
+        writer.write_batch(lote)
+    if writer is not None:
+        writer.close()
+    destino.seek(0)
+    return destino
+
+
+def exportar_arrow(db_path, sql_query):
+    pa = _importar_pyarrow()
+    destino = _archivo_temporal()
+    writer = None
+    for esquema, lote in _lotes_arrow(pa, db_path, sql_query):
+        if writer is None:
+            writer = pa.ipc.new_file(destino, esquema)
+        writer.write_batch(lote)
+    if writer is not None:
+        writer.close()
+    destino.seek(0)
+    return destino
+
+
+EXPORTADORES = {
+    "csv": exportar_csv,
+    "parquet": exportar_parquet,
+    "arrow": exportar_arrow,
+}
+
+
+# Exporta el resultado completo de la consulta; devuelve un archivo abierto
+def exportar(formato, db_path, sql_query):
+    return EXPORTADORES[formato](db_path, sql_query)
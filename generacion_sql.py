@@ -0,0 +1,46 @@
+import sqlite3
+
+from conexiones import adjuntar
+
+
+# Quita el formateo markdown que a veces devuelve el modelo
+def limpiar_sql(texto):
+    return texto.replace("```sql", "").replace("```", "").strip()
+
+
+# Valida una sentencia compilandola con EXPLAIN, sin ejecutarla.
+# Devuelve None si es valida o el mensaje de error.
+def validar_sql(conn, sql_query):
+    try:
+        adjuntar(conn, sql_query)
+        conn.execute(f"EXPLAIN {sql_query}").fetchall()
+        return None
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        return str(e)
+
+
+# Consume un stream de fragmentos de texto del LLM y genera eventos:
+#   {"tipo": "parcial", "sql"}  a medida que llega texto
+#   {"tipo": "final", "sql", "error"}  al terminar
+# En cuanto llega una sentencia completa (termina en ';') se valida contra la
+# conexion; si es invalida se corta el stream sin esperar al resto. Si despues
+# llega mas texto (otra sentencia), el SQL final se vuelve a validar entero.
+def generar_sql_en_streaming(fragmentos, conn):
+    texto = ""
+    validada = None
+    error = None
+    for fragmento in fragmentos:
+        texto += fragmento
+        sql_query = limpiar_sql(texto)
+        yield {"tipo": "parcial", "sql": sql_query}
+        if validada is None and ";" in fragmento and sqlite3.complete_statement(sql_query):
+            validada = sql_query
+            error = validar_sql(conn, sql_query)
+            if error:
+                if hasattr(fragmentos, "close"):
+                    fragmentos.close()
+                break
+    sql_query = limpiar_sql(texto)
+    if not error and sql_query != validada:
+        error = validar_sql(conn, sql_query)
+    yield {"tipo": "final", "sql": sql_query, "error": error}
@@ -0,0 +1,53 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+# Importacion diferida de los subsistemas pesados (whisper/torch,
+# speech_recognition, pandas, reportlab, openai). Cada modulo se importa en su
+# primer uso y se anota cuanto tardo, de modo que arrancar la app o ejecutar
+# main.py --help no paga importaciones que quiza nunca se usen.
+# VOICETOSQL_PRECARGA=0 desactiva la precarga en segundo plano.
+PRECARGA = os.getenv("VOICETOSQL_PRECARGA", "1") != "0"
+
+_lock = threading.Lock()
+_tiempos = {}
+_precargas = set()
+
+
+# Importa un modulo por nombre y registra el tiempo de la primera importacion
+def importar(nombre):
+    if nombre in sys.modules:
+        return importlib.import_module(nombre)
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nombre)
+    segundos = time.perf_counter() - inicio
+    with _lock:
+        _tiempos.setdefault(nombre, segundos)
+    return modulo
+
+
+# Importa los modulos indicados en un hilo aparte y despues llama a
+# `al_terminar`, si se da. Cada precarga se lanza una sola vez por proceso.
+def precargar(nombres, al_terminar=None):
+    clave = tuple(nombres)
+    with _lock:
+        if not PRECARGA or clave in _precargas:
+            return None
+        _precargas.add(clave)
+
+    def _cargar():
+        for nombre in nombres:
+            importar(nombre)
+        if al_terminar is not None:
+            al_terminar()
+    hilo = threading.Thread(target=_cargar, name="precarga", daemon=True)
+    hilo.start()
+    return hilo
+
+
+# Segundos de importacion de cada modulo diferido, del mas lento al mas rapido
+def tiempos():
+    with _lock:
+        return dict(sorted(_tiempos.items(), key=lambda t: t[1], reverse=True))
@@ -0,0 +1,176 @@
+import os
+import re
+import threading
+import time
+
+import plantillas_sql
+from importes import importar
+
+# Backends de LLM intercambiables. Todos exponen complete(messages, modelo),
+# que devuelve el texto completo, y stream(messages, modelo), que genera los
+# fragmentos de texto a medida que llegan. VOICETOSQL_LLM elige el backend.
+# Los tokens consumidos se acumulan por hilo y se leen con tomar_tokens().
+_uso = threading.local()
+
+
+def _sumar_tokens(tokens):
+    _uso.tokens = getattr(_uso, "tokens", 0) + tokens
+
+
+# Devuelve los tokens usados por el hilo actual desde la ultima lectura
+def tomar_tokens():
+    tokens = getattr(_uso, "tokens", 0)
+    _uso.tokens = 0
+    return tokens
+
+
+class BackendOpenAI:
+    def complete(self, messages, modelo):
+        completion = importar("openai").chat.completions.create(model=modelo, messages=messages)
+        if completion.usage:
+            _sumar_tokens(completion.usage.total_tokens)
+        return completion.choices[0].message.content
+
+    def stream(self, messages, modelo):
+        respuesta = importar("openai").chat.completions.create(
+            model=modelo, messages=messages, stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            for chunk in respuesta:
+                if chunk.usage:
+                    _sumar_tokens(chunk.usage.total_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Si el consumidor corta el stream (p.ej. SQL invalido) se cierra la conexion
+            respuesta.close()
+
+
+# Backend local y determinista para pruebas sin conexion. Usa respuestas fijas
+# por pregunta y, si no hay, una regla simple sobre los nombres de tabla del prompt.
+class BackendFalso:
+    def __init__(self, respuestas=None, retardo_token=0.0):
+        self.respuestas = respuestas or {}
+        self.retardo_token = retardo_token
+
+    def _responder(self, messages):
+        pregunta = messages[-1]["content"]
+        if pregunta in self.respuestas:
+            return self.respuestas[pregunta]
+        tablas = re.findall(r"^Tabla: (\w+)$", messages[0]["content"], flags=re.MULTILINE)
+        for tabla in tablas:
+            if tabla.lower() in pregunta.lower():
+                return f"SELECT * FROM {tabla} LIMIT 10;"
+        return "SELECT name FROM sqlite_master WHERE type='table';"
+
+    # Aproximacion de tokens: una palabra del prompt o de la respuesta
+    def _contar(self, messages, respuesta):
+        palabras = sum(len(m["content"].split()) for m in messages) + len(respuesta.split())
+        _sumar_tokens(palabras)
+
+    def complete(self, messages, modelo):
+        respuesta = self._responder(messages)
+        self._contar(messages, respuesta)
+        return respuesta
+
+    def stream(self, messages, modelo):
+        respuesta = self._responder(messages)
+        self._contar(messages, respuesta)
+        for token in re.findall(r"\S+\s*", respuesta):
+            if self.retardo_token:
+                time.sleep(self.retardo_token)
+            yield token
+
+
+# {tabla: [columnas]} a partir del bloque "Tabla:/Columnas:" del prompt de sistema
+def _tablas_del_prompt(sistema):
+    tablas = {}
+    for tabla, columnas in re.findall(r"^Tabla: (\w+)\nColumnas: (.*)$", sistema, flags=re.MULTILINE):
+        tablas[tabla] = [c.strip() for c in columnas.split(",") if c.strip()]
+    return tablas
+
+
+# Backend local por plantillas (ver plantillas_sql): sin red y sin tokens para
+# las formas de pregunta mas comunes. generar() devuelve (sql, confianza).
+class BackendPlantillas:
+    def generar(self, messages):
+        if len(messages) != 2:
+            # Correcciones sobre un borrador: fuera del alcance de las plantillas
+            return None, 0.0
+        return plantillas_sql.generar(messages[-1]["content"], _tablas_del_prompt(messages[0]["content"]))
+
+    def complete(self, messages, modelo):
+        sql, _ = self.generar(messages)
+        if sql is None:
+            raise ValueError("El generador local no reconoce la pregunta")
+        return sql
+
+    def stream(self, messages, modelo):
+        yield self.complete(messages, modelo)
+
+
+# Enrutado local primero: si el backend local responde con confianza
+# suficiente se usa su SQL; si no, la pregunta va al backend remoto.
+UMBRAL_CONFIANZA = float(os.getenv("VOICETOSQL_CONFIANZA_LOCAL", "0.8"))
+
+
+class BackendEnrutado:
+    def __init__(self, local=None, remoto=None, umbral=UMBRAL_CONFIANZA):
+        self.local = local or BackendPlantillas()
+        self.remoto = remoto or BACKENDS[os.getenv("VOICETOSQL_LLM_REMOTO", "openai")]()
+        self.umbral = umbral
+        self.rutas = {"local": 0, "remoto": 0}
+        self._lock = threading.Lock()
+
+    # SQL local si supera el umbral, o None si hay que ir al remoto
+    def _local(self, messages):
+        sql, confianza = self.local.generar(messages)
+        ruta = "local" if sql is not None and confianza >= self.umbral else "remoto"
+        _uso.ruta = ruta
+        with self._lock:
+            self.rutas[ruta] += 1
+        return sql if ruta == "local" else None
+
+    def complete(self, messages, modelo):
+        sql = self._local(messages)
+        return sql if sql is not None else self.remoto.complete(messages, modelo)
+
+    def stream(self, messages, modelo):
+        sql = self._local(messages)
+        if sql is not None:
+            yield sql
+            return
+        yield from self.remoto.stream(messages, modelo)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.rutas, umbral=self.umbral)
+
+
+# Ruta ("local"/"remoto") de la ultima pregunta enrutada en el hilo actual
+def tomar_ruta():
+    ruta = getattr(_uso, "ruta", None)
+    _uso.ruta = None
+    return ruta
+
+
+BACKENDS = {
+    "openai": BackendOpenAI,
+    "falso": BackendFalso,
+    "plantillas": BackendPlantillas,
+    "enrutado": BackendEnrutado,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[os.getenv("VOICETOSQL_LLM", "openai")]()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
@@ -0,0 +1,176 @@
+import csv
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_resultados import leer_resultado_cacheado
+import bases_datos
+from cache_sql import get_cache_sql
+from conexiones import get_connection
+from generacion_sql import limpiar_sql, validar_sql
+from importes import importar
+from llm import get_backend, tomar_tokens
+import metricas
+from plan_consulta import revisar as revisar_plan
+from estadisticas_columnas import corregir_literales, enriquecer_esquema, get_estadisticas
+
+# Modo por lotes: genera y ejecuta SQL para un archivo de preguntas (o audios)
+# con varias llamadas al LLM en paralelo, reintentos con backoff ante limites
+# de tasa y un JSONL de salida con resultados y tiempos por elemento.
+CAMPOS_ID = ("id", "request_id")
+CAMPOS_PREGUNTA = ("pregunta", "question", "texto", "text", "title")
+CAMPO_AUDIO = "audio"
+
+
+_errores = None
+
+
+# Errores transitorios de OpenAI que merece la pena reintentar. Se resuelven
+# una vez, en la primera llamada; sin openai instalado (backends locales) no
+# hay ninguno y los fallos se propagan sin reintentar.
+def errores_reintentables():
+    global _errores
+    if _errores is None:
+        try:
+            openai = importar("openai")
+            _errores = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+        except ImportError:
+            _errores = ()
+    return _errores
+
+
+PROMPT_SISTEMA = "Eres un cientifico de datos que ayuda a escribir consultas SQL. Solo responde con la consulta SQL, sin explicaciones, sin comentarios, y sin formateo markdown como triple backticks. La base de datos tiene la siguiente estructura: \n{esquema}"
+
+
+# Lee los elementos de un JSONL o CSV como diccionarios con id, pregunta y audio
+def leer_entrada(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            filas = list(csv.DictReader(f))
+        else:
+            filas = [json.loads(linea) for linea in f if linea.strip()]
+    elementos = []
+    for n, fila in enumerate(filas):
+        id_ = next((fila[c] for c in CAMPOS_ID if fila.get(c)), n)
+        pregunta = next((fila[c] for c in CAMPOS_PREGUNTA if fila.get(c)), None)
+        elementos.append({"id": id_, "pregunta": pregunta, "audio": fila.get(CAMPO_AUDIO)})
+    return elementos
+
+
+# Espera antes del siguiente intento: respeta retry-after si la API lo envia
+def _espera(error, intento, base):
+    respuesta = getattr(error, "response", None)
+    if respuesta is not None:
+        retry_after = respuesta.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return base * (2 ** intento) * (0.5 + random.random())
+
+
+def _completar_con_reintentos(messages, modelo, reintentos, espera_base):
+    reintentables = errores_reintentables()
+    for intento in range(reintentos + 1):
+        try:
+            return get_backend().complete(messages, modelo), intento + 1
+        except reintentables as e:
+            if intento == reintentos:
+                raise
+            time.sleep(_espera(e, intento, espera_base))
+
+
+def procesar_elemento(elemento, db_path, modelo_llm, modelo_whisper, reintentos, espera_base):
+    salida = {"id": elemento["id"], "pregunta": elemento["pregunta"], "base": None, "sql": None,
+              "filas": None, "truncado": None, "error": None, "avisos": [], "correcciones": [],
+              "sugerencias": [], "cache": False, "cache_resultado": False,
+              "intentos": 0, "tiempos": {}}
+    tiempos = salida["tiempos"]
+    inicio = time.perf_counter()
+    tomar_tokens()
+    tokens = None
+    try:
+        if elemento["audio"]:
+            # Whisper solo se carga si el lote trae audios
+            import modelos_audio
+            t = time.perf_counter()
+            resultado = modelos_audio.transcribe(modelo_whisper, elemento["audio"])
+            salida["pregunta"] = resultado["text"].strip()
+            tiempos["transcripcion"] = time.perf_counter() - t
+        if not salida["pregunta"]:
+            raise ValueError("El elemento no tiene pregunta ni audio")
+
+        t = time.perf_counter()
+        # db_path es la base por defecto; con varias registradas se elige por pregunta
+        eleccion = bases_datos.elegir(salida["pregunta"], por_defecto=bases_datos.registrar(db_path))
+        db_path = eleccion["ruta"]
+        salida["base"] = eleccion["principal"]
+        cache = get_cache_sql()
+        huella = bases_datos.huella(eleccion)
+        sql_query = cache.get(salida["pregunta"], huella, modelo_llm)
+        # El SQL cacheado se valida igualmente: si no compila se vuelve a generar
+        if sql_query is not None and validar_sql(get_connection(db_path), sql_query) is None:
+            salida["cache"] = True
+        else:
+            esquema_bd, _ = bases_datos.esquema_prompt(eleccion, salida["pregunta"])
+            esquema_bd = enriquecer_esquema(db_path, esquema_bd, salida["pregunta"])
+            messages = [
+                {"role": "system", "content": PROMPT_SISTEMA.format(esquema=esquema_bd)},
+                {"role": "user", "content": salida["pregunta"]},
+            ]
+            respuesta, salida["intentos"] = _completar_con_reintentos(messages, modelo_llm, reintentos, espera_base)
+            tokens = tomar_tokens()
+            sql_query = limpiar_sql(respuesta)
+            # Solo se cachea SQL que compila; si no, el error sale al ejecutarlo
+            if validar_sql(get_connection(db_path), sql_query) is None:
+                cache.put(salida["pregunta"], huella, modelo_llm, sql_query, db_path)
+        salida["sql"] = sql_query
+        tiempos["generacion"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        sql_query, salida["correcciones"], salida["sugerencias"] = corregir_literales(db_path, sql_query)
+        salida["sql"] = sql_query
+        salida["avisos"] = revisar_plan(db_path, sql_query)["avisos"]
+        resultado, salida["cache_resultado"] = leer_resultado_cacheado(db_path, sql_query)
+        salida["filas"] = len(resultado)
+        salida["truncado"] = resultado.truncado
+        tiempos["ejecucion"] = time.perf_counter() - t
+    except Exception as e:
+        salida["error"] = f"{type(e).__name__}: {e}"
+    tiempos["total"] = time.perf_counter() - inicio
+    peticion = metricas.nueva_peticion()
+    for etapa, segundos in tiempos.items():
+        metricas.registrar(
+            peticion, "lote", etapa, segundos,
+            tokens=tokens if etapa == "generacion" else None,
+            filas=salida["filas"] if etapa == "ejecucion" else None,
+            error=etapa == "total" and salida["error"] is not None,
+        )
+    return salida
+
+
+# Procesa todo el archivo y escribe una linea JSON por elemento a medida que terminan
+def ejecutar_lote(entrada, salida, db_path, modelo_llm, modelo_whisper="tiny",
+                  concurrencia=8, reintentos=5, espera_base=1.0):
+    elementos = leer_entrada(entrada)
+    inicio = time.perf_counter()
+    # En un lote compensa esperar al indice de valores antes de la primera pregunta
+    get_estadisticas(db_path, esperar=30)
+    errores = 0
+    with open(salida, "w", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        futuros = [
+            executor.submit(procesar_elemento, elemento, db_path, modelo_llm, modelo_whisper, reintentos, espera_base)
+            for elemento in elementos
+        ]
+        for n, futuro in enumerate(as_completed(futuros), 1):
+            resultado = futuro.result()
+            f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            f.flush()
+            if resultado["error"]:
+                errores += 1
+            print(f"\r[{n}/{len(elementos)}] errores: {errores}", end="", flush=True)
+    print()
+    segundos = time.perf_counter() - inicio
+    print(f"{len(elementos)} elementos en {segundos:.1f} s ({len(elementos) / segundos:.2f} por segundo), {errores} con error")
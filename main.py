@@ -1,56 +1,85 @@
-import speech_recognition as sr
-import whisper
-import numpy as np
-import tempfile
 import os
-import torch
-import openai
 import argparse
-import sqlite3
+import atexit
+import time
 from dotenv import load_dotenv
+import importes
+from cache_resultados import leer_resultado_cacheado
+from plan_consulta import revisar as revisar_plan
+import bases_datos
+from estadisticas_columnas import corregir_literales, enriquecer_esquema, get_estadisticas
+from cache_sql import get_cache_sql
+from conexiones import get_connection
+from generacion_sql import limpiar_sql, validar_sql
+import modelos_audio
+from transcripcion import transcribir_audio
+from llm import get_backend, tomar_ruta, tomar_tokens
+import metricas
+from contexto import ContextoConversacion, tokens_mensajes
+from lote import ejecutar_lote
+from streaming_voz import FuenteMicrofono, FuentePCM, transcribir_en_streaming
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+# Base por defecto; con varias registradas la primera pregunta elige la de la sesion
 db_path = "identifier.sqlite"
+BASE_POR_DEFECTO = bases_datos.registrar(db_path)
+MODELO_LLM = "gpt-3.5-turbo"
 
-# Leer la clave de API de OpenAI desde variable de entorno
+# Captura en streaming (se configuran desde la linea de comandos)
+modo_streaming = False
+archivo_replay = None
+ultimo_fin_habla = None
+
+# Identificador de la peticion para las metricas por etapa
+peticion = metricas.nueva_peticion()
+
+# Leer la clave de API de OpenAI desde variable de entorno (no hace falta con VOICETOSQL_LLM=falso)
 api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
+if not api_key and os.getenv('VOICETOSQL_LLM', 'openai') == 'openai':
     raise ValueError("OPENAI_API_KEY no encontrada. Asegúrate de tener un archivo .env con OPENAI_API_KEY=tu_clave")
-openai.api_key = api_key
-
-def get_db_schema(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    schema = ""
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        col_names = [col[1] for col in columns]
-        schema += f"Tabla: {table_name}\nColumnas: {', '.join(col_names)}\n"
-    conn.close()
-    return schema
 
 def get_voice_command(timeout):
+    sr = importes.importar("speech_recognition")
     r = sr.Recognizer()
     with sr.Microphone(sample_rate=16000) as source:
         r.adjust_for_ambient_noise(source)
         print("Empieza a escuchar...")
         try:
-            audio = r.listen(source, timeout)
+            with metricas.medir(peticion, "main", "grabacion"):
+                audio = r.listen(source, timeout)
         except sr.WaitTimeoutError:
             print("Tiempo agotado: No se detectó voz.")
             return
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-            temp_wav.write(audio.get_wav_data())
-        result = audio_model.transcribe(temp_wav.name, fp16=torch.cuda.is_available())
-        text = result['text'].strip()
-        os.remove(temp_wav.name)
-        return text
+        with metricas.medir(peticion, "main", "whisper") as m:
+            m["bytes"] = len(audio.frame_data)
+            return transcribir_audio(audio, audio_model)
+
+# Variante en streaming: transcribe por segmentos mientras se habla.
+# Si hay archivo de replay, el audio se lee de ahi en lugar del microfono.
+def get_voice_command_streaming(timeout):
+    global ultimo_fin_habla
+    if archivo_replay:
+        fuente = FuentePCM.desde_archivo(archivo_replay, tiempo_real=True)
+    else:
+        fuente = FuenteMicrofono()
+    print("Empieza a escuchar...")
+    final = None
+    with metricas.medir(peticion, "main", "grabacion_streaming"):
+        for evento in transcribir_en_streaming(fuente, audio_model, espera_voz_s=timeout):
+            if evento["tipo"] == "parcial":
+                print(f"\r... {evento['texto']}", end="", flush=True)
+            else:
+                final = evento
+    print()
+    if not final["texto"]:
+        print("Tiempo agotado: No se detectó voz.")
+        return
+    ultimo_fin_habla = final["fin_habla"]
+    print(f"Primer texto parcial: {final['ttft']:.2f} s; "
+          f"transcripción completa {final['latencia_transcripcion']:.2f} s tras el fin del habla")
+    return final["texto"]
 
 def ask_to_continue():
     while True:
@@ -63,36 +92,85 @@ def ask_to_continue():
             print("Entrada inválida. Ingresa 'y' o 'n'.")
 
 def ejecutar_sql(sql_query):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql_query)
-        resultados = cursor.fetchall()
-        for fila in resultados:
+        with metricas.medir(peticion, "main", "ejecutar_sql") as m:
+            sql_query, correcciones, sugerencias = corregir_literales(db_path, sql_query)
+            for columna, original, corregido in correcciones:
+                print(f"Valor corregido en {columna}: '{original}' -> '{corregido}'")
+            for columna, original, parecido in sugerencias:
+                print(f"Aviso: '{original}' no existe en {columna}; quiza querias '{parecido}'")
+            for aviso in revisar_plan(db_path, sql_query)["avisos"]:
+                print(f"Aviso: {aviso}")
+            resultado, _ = leer_resultado_cacheado(db_path, sql_query)
+            m["filas"] = len(resultado)
+            m["bytes"] = resultado.bytes_leidos
+        for fila in resultado.filas:
             print(fila)
+        if resultado.truncado:
+            print(f"(resultado truncado: se muestran las primeras {len(resultado)} filas)")
     except Exception as e:
         print(f"Error al ejecutar la consulta: {e}")
-    finally:
-        conn.close()
 
 def get_SQL_query(timeout):
-    esquema_bd = get_db_schema(db_path)
-    messages = [
-        {"role": "system", "content": f"Eres un científico de datos que ayuda a escribir consultas SQL. Solo responde con la consulta SQL, sin explicaciones, sin comentarios, y sin formateo markdown como triple backticks. La base de datos tiene la siguiente estructura: \n{esquema_bd}"}
-    ]
+    global ultimo_fin_habla, db_path
+    cache = get_cache_sql()
+    huella = None
+    contexto = None
     while True:
-        command = get_voice_command(timeout)
+        if modo_streaming:
+            command = get_voice_command_streaming(timeout)
+        else:
+            command = get_voice_command(timeout)
         if not command:
             print("No se detectó ningún comando de voz.")
             continue
-        messages.append({"role": "user", "content": command})
-        completion = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages
-        )
-        chat_response = completion.choices[0].message.content
+        if contexto is None:
+            # La base y las tablas del prompt se eligen con la primera pregunta
+            eleccion = bases_datos.elegir(command, por_defecto=BASE_POR_DEFECTO)
+            db_path = eleccion["ruta"]
+            huella = bases_datos.huella(eleccion)
+            if len(bases_datos.get_bases()) > 1:
+                adjuntas = f" (con {', '.join(eleccion['adjuntas'])} adjuntas)" if eleccion["adjuntas"] else ""
+                print(f"Base de datos: {eleccion['principal']}{adjuntas}")
+            esquema_bd, seleccion = bases_datos.esquema_prompt(eleccion, command)
+            esquema_bd = enriquecer_esquema(db_path, esquema_bd, command)
+            print(f"Esquema en el prompt: {seleccion['tablas_seleccionadas']} de {seleccion['tablas_total']} tablas "
+                  f"({seleccion['reduccion']:.0%} menos texto, {seleccion['segundos'] * 1000:.1f} ms)")
+            contexto = ContextoConversacion(f"Eres un científico de datos que ayuda a escribir consultas SQL. Solo responde con la consulta SQL, sin explicaciones, sin comentarios, y sin formateo markdown como triple backticks. La base de datos tiene la siguiente estructura: \n{esquema_bd}", MODELO_LLM)
+        # Cada turno envia solo el esquema, la pregunta, el ultimo borrador y la correccion
+        messages = contexto.mensajes(command)
+        tokens_prompt = tokens_mensajes(messages, MODELO_LLM)
+        # Solo la primera pregunta es cacheable; las correcciones dependen del borrador
+        primera_pregunta = contexto.primer_turno()
+        chat_response = None
+        tokens_totales = None
+        inicio = time.perf_counter()
+        if primera_pregunta:
+            chat_response = cache.get(command, huella, MODELO_LLM)
+        if chat_response is None:
+            with metricas.medir(peticion, "main", "generar_sql") as m:
+                tomar_tokens()
+                chat_response = get_backend().complete(messages, MODELO_LLM)
+                m["tokens"] = tokens_totales = tomar_tokens()
+            ruta = tomar_ruta()
+            if ruta:
+                print(f"SQL generado por el backend {ruta}")
+            if primera_pregunta:
+                # La cache se comparte con la app y el modo por lotes: solo se guarda SQL limpio y valido
+                sql_limpio = limpiar_sql(chat_response)
+                error = validar_sql(get_connection(db_path), sql_limpio)
+                if error:
+                    print(f"El SQL generado no es valido y no se guarda en cache: {error}")
+                else:
+                    cache.put(command, huella, MODELO_LLM, sql_limpio, db_path)
+        turno = contexto.registrar(command, chat_response, tokens_prompt, time.perf_counter() - inicio, tokens_totales)
         print(f'ChatGPT: {chat_response}')
-        messages.append({"role": "assistant", "content": chat_response})
+        print(f"Turno {turno['turno']}: {turno['tokens_prompt']} tokens de prompt"
+              + (f" ({turno['tokens_totales']} en total)" if turno['tokens_totales'] else " (cache)")
+              + f", ida y vuelta {turno['segundos']:.2f} s")
+        if ultimo_fin_habla is not None:
+            print(f"Fin del habla a SQL: {time.perf_counter() - ultimo_fin_habla:.2f} s")
+            ultimo_fin_habla = None
         continuar = ask_to_continue()
         if not continuar:
             return command, chat_response
@@ -102,9 +180,35 @@ if __name__ == "__main__":
     parser.add_argument("--model", default="tiny", help="Modelo a usar",
                         choices=["tiny", "base", "small", "medium", "large"])
     parser.add_argument("--timeout", default=3, type=float, help="Tiempo máximo de escucha")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Transcribir por segmentos mientras se habla")
+    parser.add_argument("--replay", default=None,
+                        help="Archivo de audio a reproducir en lugar del micrófono (implica --streaming)")
+    parser.add_argument("--batch", default=None,
+                        help="Archivo JSONL/CSV de preguntas o audios a procesar sin micrófono")
+    parser.add_argument("--salida", default="resultados_lote.jsonl",
+                        help="Archivo JSONL donde se escriben los resultados del modo --batch")
+    parser.add_argument("--concurrencia", default=8, type=int,
+                        help="Llamadas simultáneas al LLM en el modo --batch")
+    parser.add_argument("--reintentos", default=5, type=int,
+                        help="Reintentos ante límites de tasa o errores transitorios en el modo --batch")
+    parser.add_argument("--tiempos-importacion", action="store_true",
+                        help="Muestra al terminar lo que tardó en importarse cada módulo pesado")
     args = parser.parse_args()
-    model = args.model
-    audio_model = whisper.load_model(model)
+    if args.tiempos_importacion:
+        atexit.register(lambda: print("Tiempos de importación: " + ", ".join(
+            f"{nombre} {segundos:.2f} s" for nombre, segundos in importes.tiempos().items())))
+    if args.batch:
+        ejecutar_lote(args.batch, args.salida, db_path, MODELO_LLM, args.model,
+                      concurrencia=args.concurrencia, reintentos=args.reintentos)
+        raise SystemExit(0)
+    modo_streaming = args.streaming or args.replay is not None
+    archivo_replay = args.replay
+    audio_model = args.model
+    # El modelo se carga mientras se escucha; la transcripcion espera a que este listo
+    modelos_audio.warmup([audio_model])
+    # Las estadisticas de columnas tambien se calculan en segundo plano
+    get_estadisticas(db_path)
     mensaje_usuario, sql_query = get_SQL_query(args.timeout)
     sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
 
@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Metricas por etapa de cada peticion (grabacion, whisper, generar_sql,
+# ejecutar_sql, generar_pdf...). Cada etapa registra tiempo de reloj y, si
+# aplica, tokens, filas y bytes en un SQLite local, del que se leen los
+# percentiles p50/p95/p99 y la exportacion en formato de texto de Prometheus.
+METRICAS_PATH = os.getenv("VOICETOSQL_METRICAS", ".metricas.sqlite")
+PERCENTILES = (0.5, 0.95, 0.99)
+# Las metricas mas antiguas se borran al escribir, como mucho una vez por intervalo
+RETENCION_DIAS = float(os.getenv("VOICETOSQL_METRICAS_DIAS", "7"))
+INTERVALO_PURGA = 3600
+
+_lock = threading.Lock()
+_conn = None
+_ultima_purga = 0.0
+
+
+def _conexion():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(METRICAS_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS metricas (
+                ts REAL NOT NULL,
+                peticion TEXT NOT NULL,
+                origen TEXT NOT NULL,
+                etapa TEXT NOT NULL,
+                segundos REAL NOT NULL,
+                tokens INTEGER,
+                filas INTEGER,
+                bytes INTEGER,
+                error INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_metricas_ts ON metricas (ts)")
+        _conn.commit()
+    return _conn
+
+
+def nueva_peticion():
+    return uuid.uuid4().hex[:12]
+
+
+def registrar(peticion, origen, etapa, segundos, tokens=None, filas=None, bytes=None, error=False):
+    global _ultima_purga
+    ahora = time.time()
+    with _lock:
+        conn = _conexion()
+        conn.execute(
+            "INSERT INTO metricas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ahora, peticion, origen, etapa, segundos, tokens, filas, bytes, int(error)),
+        )
+        if ahora - _ultima_purga >= INTERVALO_PURGA:
+            _ultima_purga = ahora
+            conn.execute("DELETE FROM metricas WHERE ts < ?", (ahora - RETENCION_DIAS * 86400,))
+        conn.commit()
+
+
+# Mide una etapa. El diccionario entregado admite tokens, filas y bytes.
+@contextmanager
+def medir(peticion, origen, etapa):
+    extras = {}
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield extras
+    except BaseException:
+        error = True
+        raise
+    finally:
+        registrar(peticion, origen, etapa, time.perf_counter() - inicio, error=error, **extras)
+
+
+# Posicion (desde 1) del percentil p entre n valores ordenados, por el metodo
+# del rango mas cercano: max(1, ceil(p * n)) escrito en SQL
+def _posicion_percentil(p):
+    return f"MAX(1, CAST({p!r} * n AS INTEGER) + ({p!r} * n > CAST({p!r} * n AS INTEGER)))"
+
+
+# Agrega por (origen, etapa) las metricas de los ultimos `ventana` segundos.
+# Percentiles y totales se calculan en SQLite: a Python solo llega una fila por etapa.
+def resumen(ventana=None):
+    filtro = ""
+    parametros = ()
+    if ventana is not None:
+        filtro = "WHERE ts >= ?"
+        parametros = (time.time() - ventana,)
+    percentiles = ", ".join(
+        f"MAX(CASE WHEN posicion = {_posicion_percentil(p)} THEN segundos END)" for p in PERCENTILES
+    )
+    consulta = f"""
+        WITH ordenadas AS (
+            SELECT origen, etapa, segundos, tokens, filas, bytes, error,
+                   ROW_NUMBER() OVER (PARTITION BY origen, etapa ORDER BY segundos) AS posicion,
+                   COUNT(*) OVER (PARTITION BY origen, etapa) AS n
+            FROM metricas {filtro}
+        )
+        SELECT origen, etapa, COUNT(*), SUM(segundos), {percentiles},
+               TOTAL(tokens), TOTAL(filas), TOTAL(bytes), SUM(error)
+        FROM ordenadas GROUP BY origen, etapa ORDER BY origen, etapa
+    """
+    with _lock:
+        filas = _conexion().execute(consulta, parametros).fetchall()
+
+    agregado = []
+    for origen, etapa, n, total_segundos, *valores in filas:
+        fila = {"origen": origen, "etapa": etapa, "n": n, "total_segundos": total_segundos}
+        for p, valor in zip(PERCENTILES, valores):
+            fila[f"p{int(p * 100)}"] = valor
+        tokens, n_filas, n_bytes, errores = valores[len(PERCENTILES):]
+        fila.update(tokens=int(tokens), filas=int(n_filas), bytes=int(n_bytes), errores=errores)
+        agregado.append(fila)
+    return agregado
+
+
+# Exportacion en formato de texto de Prometheus (un summary por etapa)
+def exportar_prometheus(ventana=None):
+    lineas = [
+        "# HELP voicetosql_etapa_segundos Tiempo de reloj por etapa de la peticion",
+        "# TYPE voicetosql_etapa_segundos summary",
+    ]
+    contadores = {"tokens": [], "filas": [], "bytes": [], "errores": []}
+    for fila in resumen(ventana):
+        etiquetas = f'origen="{fila["origen"]}",etapa="{fila["etapa"]}"'
+        for p in PERCENTILES:
+            lineas.append(f'voicetosql_etapa_segundos{{{etiquetas},quantile="{p}"}} {fila[f"p{int(p * 100)}"]:.6f}')
+        lineas.append(f"voicetosql_etapa_segundos_sum{{{etiquetas}}} {fila['total_segundos']:.6f}")
+        lineas.append(f"voicetosql_etapa_segundos_count{{{etiquetas}}} {fila['n']}")
+        for nombre in contadores:
+            contadores[nombre].append(f"voicetosql_{nombre}_total{{{etiquetas}}} {fila[nombre]}")
+    for nombre, valores in contadores.items():
+        lineas.append(f"# TYPE voicetosql_{nombre}_total counter")
+        lineas.extend(valores)
+    return "\n".join(lineas) + "\n"
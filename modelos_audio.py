@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from importes import importar
+
+# Registro de modelos Whisper a nivel de proceso: cada tamano se carga una sola
+# vez y lo comparten todas las sesiones de Streamlit. La inferencia pasa por un
+# pool acotado de workers para no saturar CPU/GPU con usuarios concurrentes.
+# torch y whisper se importan al cargar el primer modelo.
+MODELOS = ["tiny", "base", "small", "medium", "large"]
+WORKERS = int(os.getenv("VOICETOSQL_WHISPER_WORKERS", "1"))
+MAX_PENDIENTES = int(os.getenv("VOICETOSQL_WHISPER_MAX_PENDIENTES", "8"))
+
+_lock = threading.Lock()
+_locks_carga = {nombre: threading.Lock() for nombre in MODELOS}
+_modelos = {}
+_info = {}
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="whisper")
+_pendientes = threading.BoundedSemaphore(MAX_PENDIENTES)
+
+
+# Memoria residente actual del proceso en bytes (None si no se puede medir)
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # En macOS ru_maxrss viene en bytes, en Linux en KiB
+        return rss if os.uname().sysname == "Darwin" else rss * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+def is_loaded(nombre):
+    return nombre in _modelos
+
+
+# Devuelve el modelo, cargandolo la primera vez que se pide
+def get_model(nombre="tiny"):
+    if nombre not in _locks_carga:
+        raise ValueError(f"Modelo Whisper desconocido: {nombre}")
+    modelo = _modelos.get(nombre)
+    if modelo is not None:
+        return modelo
+    with _locks_carga[nombre]:
+        modelo = _modelos.get(nombre)
+        if modelo is None:
+            rss_antes = _rss_bytes()
+            inicio = time.perf_counter()
+            modelo = importar("whisper").load_model(nombre)
+            segundos = time.perf_counter() - inicio
+            rss_despues = _rss_bytes()
+            with _lock:
+                _modelos[nombre] = modelo
+                _info[nombre] = {
+                    "segundos_carga": segundos,
+                    "memoria_bytes": (rss_despues - rss_antes) if rss_antes is not None else None,
+                    "transcripciones": 0,
+                }
+        return modelo
+
+
+# Precarga modelos (por ejemplo al arrancar la app), opcionalmente en segundo plano
+def warmup(nombres=("tiny",), en_segundo_plano=True):
+    pendientes = [nombre for nombre in nombres if not is_loaded(nombre)]
+    if not pendientes:
+        return None
+
+    def _cargar():
+        for nombre in pendientes:
+            get_model(nombre)
+    if en_segundo_plano:
+        hilo = threading.Thread(target=_cargar, name="whisper-warmup", daemon=True)
+        hilo.start()
+        return hilo
+    _cargar()
+    return None
+
+
+def _transcribir(nombre, audio, kwargs):
+    try:
+        modelo = get_model(nombre)
+        kwargs.setdefault("fp16", importar("torch").cuda.is_available())
+        resultado = modelo.transcribe(audio, **kwargs)
+        with _lock:
+            _info[nombre]["transcripciones"] += 1
+        return resultado
+    finally:
+        _pendientes.release()
+
+
+# Encola una transcripcion en el pool y devuelve un Future
+def submit(nombre, audio, **kwargs):
+    _pendientes.acquire()
+    try:
+        return _executor.submit(_transcribir, nombre, audio, kwargs)
+    except Exception:
+        _pendientes.release()
+        raise
+
+
+# Transcribe de forma bloqueante a traves del pool compartido
+def transcribe(nombre, audio, **kwargs):
+    return submit(nombre, audio, **kwargs).result()
+
+
+# Tiempo de carga, memoria residente y uso de cada modelo cargado
+def stats():
+    with _lock:
+        return {nombre: dict(info) for nombre, info in _info.items()}
@@ -0,0 +1,11 @@
+import unicodedata
+
+# Normalizacion comun del texto que se compara sin distinguir mayusculas ni
+# tildes: preguntas (cache de SQL, plantillas, seleccion de esquema) y valores
+# de columnas (correccion de literales).
+
+
+# Minusculas, sin tildes y con los espacios simplificados
+def sin_tildes(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).split())
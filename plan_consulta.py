@@ -0,0 +1,300 @@
+import argparse
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from conexiones import adjuntar, get_connection
+from esquema import get_schema_info
+
+# Revision previa del coste de cada consulta generada. Se compila con
+# EXPLAIN QUERY PLAN (sin ejecutarla) y se estima cuantas filas visitara a partir
+# del plan y del tamano de cada tabla: los bucles anidados y las subconsultas
+# correlacionadas multiplican. Por encima de COSTE_AVISO se avisa y por encima
+# de COSTE_MAXIMO se rechaza. Las columnas usadas en predicados se anotan en un
+# SQLite local para recomendar indices (y, si se pide, crearlos en una copia).
+COSTE_AVISO = float(os.getenv("VOICETOSQL_COSTE_AVISO", "1e6"))
+COSTE_MAXIMO = float(os.getenv("VOICETOSQL_COSTE_MAXIMO", "1e9"))
+FILAS_TABLA_GRANDE = int(os.getenv("VOICETOSQL_FILAS_TABLA_GRANDE", "100000"))
+PLANES_PATH = os.getenv("VOICETOSQL_PLANES", ".planes.sqlite")
+# Filas supuestas para tablas de tamano desconocido (CTE, subconsultas, vistas)
+FILAS_DESCONOCIDAS = 1000
+# Filas que SQLite supone para una busqueda por igualdad sin estadisticas
+FILAS_POR_BUSQUEDA = 10
+MAX_COLUMNAS_INDICE = 6
+
+_PALABRAS_CLAVE = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on",
+    "using", "group", "order", "limit", "having", "union", "except", "intersect", "window",
+}
+_RE_TABLA = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)["`\]]?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_RE_PREDICADO = re.compile(
+    r"(?:(\w+)\.)?(\w+)\s*(?:=|<>|!=|<=|>=|<|>|\s(?:NOT\s+)?(?:LIKE|IN|BETWEEN|IS|GLOB)\b)",
+    re.IGNORECASE,
+)
+_RE_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+_lock = threading.Lock()
+_filas = {}
+_conn_planes = None
+
+
+# Filas aproximadas de cada tabla (MAX(rowid) es O(log n)), por base de datos;
+# se recalcula si el archivo cambia
+def _filas_tablas(db_path):
+    ruta = os.path.realpath(db_path)
+    mtime = os.stat(ruta).st_mtime_ns
+    guardadas = _filas.get(ruta)
+    if guardadas is not None and guardadas[0] == mtime:
+        return guardadas[1]
+    conn = get_connection(db_path)
+    filas = {}
+    for tabla in get_schema_info(db_path)["tablas"]:
+        try:
+            filas[tabla] = conn.execute(f'SELECT MAX(rowid) FROM "{tabla}"').fetchone()[0] or 0
+        except sqlite3.Error:
+            # Tablas WITHOUT ROWID: se deja sin estimar
+            continue
+    with _lock:
+        _filas[ruta] = (mtime, filas)
+    return filas
+
+
+# Relaciona alias y nombres usados en FROM/JOIN con la tabla real
+def _alias(sql_query, tablas):
+    alias = {tabla: tabla for tabla in tablas}
+    for tabla, nombre in _RE_TABLA.findall(sql_query):
+        if tabla in tablas and nombre and nombre.lower() not in _PALABRAS_CLAVE:
+            alias[nombre] = tabla
+    return alias
+
+
+# Coste de los bucles hijos de `padre`: cada SCAN/SEARCH visita filas una vez
+# por cada fila de los bucles exteriores (factor)
+def _coste(hijos, padre, factor, filas, alias, escaneos):
+    total = 0.0
+    bucle = factor
+    for id_, detalle in hijos.get(padre, []):
+        partes = detalle.split()
+        if partes[0] in ("SCAN", "SEARCH"):
+            tabla = alias.get(partes[1])
+            n = filas.get(tabla, FILAS_DESCONOCIDAS) if tabla else FILAS_DESCONOCIDAS
+            if partes[0] == "SCAN":
+                visitadas = salida = n
+                if tabla and n >= FILAS_TABLA_GRANDE:
+                    escaneos.append({"tabla": tabla, "filas": n, "veces": bucle})
+            elif "<" in detalle or ">" in detalle:
+                visitadas = salida = n / 4
+            else:
+                salida = 1 if "PRIMARY KEY" in detalle else FILAS_POR_BUSQUEDA
+                visitadas = math.log2(n + 1) + salida
+            total += bucle * visitadas
+            bucle *= max(salida, 1)
+        elif partes[0] == "CORRELATED":
+            # Se ejecuta una vez por cada fila del bucle exterior
+            total += _coste(hijos, id_, bucle, filas, alias, escaneos)
+        else:
+            total += _coste(hijos, id_, factor, filas, alias, escaneos)
+    return total
+
+
+# Columnas leidas por la consulta, tal como las ve SQLite al compilarla
+def _explicar(conn, sql_query):
+    leidas = set()
+
+    def autorizador(accion, tabla, columna, *_):
+        if accion == sqlite3.SQLITE_READ and tabla and columna:
+            leidas.add((tabla, columna))
+        return sqlite3.SQLITE_OK
+    conn.set_authorizer(autorizador)
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()
+    finally:
+        conn.set_authorizer(None)
+    return plan, leidas
+
+
+# Columnas usadas en predicados (WHERE/ON/HAVING) por tabla
+def _predicados(sql_query, leidas, alias):
+    columnas_tabla = {}
+    for tabla, columna in leidas:
+        columnas_tabla.setdefault(tabla, set()).add(columna)
+    predicados = {}
+    for calificador, columna in _RE_PREDICADO.findall(_RE_LITERAL.sub("''", sql_query)):
+        if calificador:
+            candidatas = [alias.get(calificador)]
+        else:
+            candidatas = list(columnas_tabla)
+        for tabla in candidatas:
+            if tabla and columna in columnas_tabla.get(tabla, ()):
+                predicados.setdefault(tabla, set()).add(columna)
+    return predicados, columnas_tabla
+
+
+def _conexion_planes():
+    global _conn_planes
+    if _conn_planes is None:
+        _conn_planes = sqlite3.connect(PLANES_PATH, check_same_thread=False)
+        _conn_planes.execute("""
+            CREATE TABLE IF NOT EXISTS predicados (
+                db TEXT NOT NULL,
+                tabla TEXT NOT NULL,
+                predicados TEXT NOT NULL,
+                columnas TEXT NOT NULL,
+                usos INTEGER NOT NULL,
+                ultimo_uso REAL NOT NULL,
+                PRIMARY KEY (db, tabla, predicados, columnas)
+            )
+        """)
+        _conn_planes.commit()
+    return _conn_planes
+
+
+def _registrar(db_path, predicados, columnas_tabla):
+    db = os.path.realpath(db_path)
+    with _lock:
+        conn = _conexion_planes()
+        for tabla, columnas in predicados.items():
+            conn.execute("""
+                INSERT INTO predicados VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (db, tabla, predicados, columnas)
+                DO UPDATE SET usos = usos + 1, ultimo_uso = excluded.ultimo_uso
+            """, (db, tabla, ",".join(sorted(columnas)), ",".join(sorted(columnas_tabla[tabla])), time.time()))
+        conn.commit()
+
+
+# Analiza el plan de una consulta sin ejecutarla. Devuelve un diccionario con
+# el plan, el coste estimado (filas visitadas), los escaneos completos de tablas
+# grandes y los avisos. Lanza ValueError si el coste supera `coste_maximo`.
+def revisar(db_path, sql_query, coste_maximo=None, registrar=True):
+    coste_maximo = COSTE_MAXIMO if coste_maximo is None else coste_maximo
+    conn = get_connection(db_path)
+    adjuntar(conn, sql_query)
+    plan, leidas = _explicar(conn, sql_query)
+    tablas = get_schema_info(db_path)["tablas"]
+    filas = _filas_tablas(db_path)
+    alias = _alias(sql_query, tablas)
+
+    hijos = {}
+    for id_, padre, _, detalle in plan:
+        hijos.setdefault(padre, []).append((id_, detalle))
+    escaneos = []
+    coste = _coste(hijos, 0, 1, filas, alias, escaneos)
+
+    avisos = [
+        f"Recorre entera la tabla {e['tabla']} ({e['filas']:,} filas)"
+        + (f" unas {e['veces']:,.0f} veces" if e["veces"] > 1 else "")
+        for e in escaneos
+    ]
+    if coste > COSTE_AVISO:
+        avisos.append(f"Coste estimado alto: unas {coste:,.0f} filas visitadas")
+
+    if registrar:
+        predicados, columnas_tabla = _predicados(sql_query, leidas, alias)
+        if predicados:
+            _registrar(db_path, predicados, columnas_tabla)
+
+    if coste > coste_maximo:
+        raise ValueError(
+            f"Consulta rechazada: coste estimado de {coste:,.0f} filas visitadas "
+            f"(maximo {coste_maximo:,.0f}). " + "; ".join(avisos)
+        )
+    return {"plan": [detalle for _, _, _, detalle in plan], "coste": coste,
+            "escaneos": escaneos, "avisos": avisos}
+
+
+# Columna INTEGER PRIMARY KEY de la tabla (alias del rowid) o None
+def _alias_rowid(conn, tabla):
+    pk = [fila for fila in conn.execute(f'PRAGMA table_info("{tabla}")') if fila[5]]
+    if len(pk) == 1 and pk[0][2].upper() == "INTEGER":
+        return pk[0][1]
+    return None
+
+
+# Indices existentes como tuplas de columnas, incluida la clave primaria entera
+def _indices_existentes(conn, tabla):
+    indices = []
+    for _, nombre, *_ in conn.execute(f'PRAGMA index_list("{tabla}")'):
+        indices.append(tuple(fila[2] for fila in conn.execute(f'PRAGMA index_info("{nombre}")')))
+    rowid = _alias_rowid(conn, tabla)
+    if rowid:
+        indices.append((rowid,))
+    return indices
+
+
+# Indices recomendados para la carga real: combinaciones de columnas de
+# predicado usadas al menos `min_usos` veces y que ningun indice cubre ya.
+# Si las columnas leidas caben, el indice es de cobertura; el alias del rowid
+# no se anade porque todo indice ya lo guarda.
+def recomendar_indices(db_path, min_usos=3):
+    with _lock:
+        filas = _conexion_planes().execute(
+            "SELECT tabla, predicados, columnas, usos FROM predicados WHERE db = ?",
+            (os.path.realpath(db_path),),
+        ).fetchall()
+    grupos = {}
+    for tabla, predicados, columnas, usos in filas:
+        grupo = grupos.setdefault((tabla, predicados), {"usos": 0, "columnas": set()})
+        grupo["usos"] += usos
+        grupo["columnas"].update(columnas.split(","))
+
+    conn = get_connection(db_path)
+    recomendaciones = []
+    for (tabla, predicados), grupo in sorted(grupos.items(), key=lambda g: -g[1]["usos"]):
+        if grupo["usos"] < min_usos:
+            continue
+        claves = predicados.split(",")
+        existentes = _indices_existentes(conn, tabla)
+        if any(sorted(indice[:len(claves)]) == claves for indice in existentes):
+            continue
+        resto = sorted(grupo["columnas"] - set(claves) - {_alias_rowid(conn, tabla)})
+        cobertura = len(claves) + len(resto) <= MAX_COLUMNAS_INDICE
+        columnas = claves + resto if cobertura else claves
+        nombre = f"idx_vts_{tabla}_{'_'.join(claves)}"
+        lista = ", ".join(f'"{columna}"' for columna in columnas)
+        recomendaciones.append({
+            "tabla": tabla,
+            "columnas": columnas,
+            "cobertura": cobertura,
+            "usos": grupo["usos"],
+            "sql": f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" ({lista})',
+        })
+    return recomendaciones
+
+
+# Crea los indices recomendados en una copia gestionada de la base de datos
+# (la original se abre siempre en solo lectura) y devuelve su ruta
+def crear_copia_indexada(db_path, recomendaciones, destino=None):
+    if destino is None:
+        raiz, extension = os.path.splitext(db_path)
+        destino = f"{raiz}.indexada{extension}"
+    origen = sqlite3.connect(f"file:{os.path.realpath(db_path)}?mode=ro", uri=True)
+    copia = sqlite3.connect(destino)
+    try:
+        origen.backup(copia)
+        for recomendacion in recomendaciones:
+            copia.execute(recomendacion["sql"])
+        copia.execute("ANALYZE")
+        copia.commit()
+    finally:
+        origen.close()
+        copia.close()
+    return destino
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db_path", nargs="?", default="identifier.sqlite")
+    parser.add_argument("--min-usos", default=3, type=int, help="Usos minimos para recomendar un indice")
+    parser.add_argument("--crear-copia", action="store_true",
+                        help="Crea los indices recomendados en una copia de la base de datos")
+    args = parser.parse_args()
+    recomendaciones = recomendar_indices(args.db_path, args.min_usos)
+    if not recomendaciones:
+        print("Sin recomendaciones todavia")
+    for r in recomendaciones:
+        print(f"{r['sql']};  -- {r['usos']} usos" + (" (cobertura)" if r["cobertura"] else ""))
+    if args.crear_copia and recomendaciones:
+        print(f"Copia con indices en {crear_copia_indexada(args.db_path, recomendaciones)}")
@@ -0,0 +1,216 @@
+import re
+
+from normalizacion import sin_tildes
+
+# Generador local de SQL por plantillas para las formas de pregunta mas
+# comunes en espanol (listar, contar, agregar, top N, filtros simples, agrupar
+# y ordenar) sobre una sola tabla. No usa red ni modelo: reconoce la tabla y
+# las columnas por nombre y va consumiendo los fragmentos que entiende. La
+# confianza es la fraccion de palabras con contenido que quedaron explicadas;
+# lo que no se reconoce baja la confianza y el enrutador lo manda al LLM remoto.
+
+_VACIAS = {
+    "a", "al", "con", "cual", "cuales", "cada", "de", "del", "e", "el", "en", "es", "esta", "estan",
+    "hay", "la", "las", "lo", "los", "me", "mi", "o", "para", "por", "que", "se", "sea", "son", "su",
+    "sus", "tabla", "tablas", "toda", "todas", "todo", "todos", "un", "una", "unas", "uno", "unos", "y",
+    "registro", "registros", "dato", "datos", "favor", "base", "informacion", "cuyo", "cuya", "donde",
+    # Verbos de peticion: no cambian la consulta
+    "muestra", "muestrame", "mostrar", "lista", "listar", "listado", "dame", "dime", "ver", "quiero",
+    "obtener", "obten", "busca", "buscar", "selecciona", "trae", "ensename", "devuelve", "necesito",
+}
+_NUMEROS = {"un": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7,
+            "ocho": 8, "nueve": 9, "diez": 10, "veinte": 20, "cincuenta": 50, "cien": 100}
+_AGREGADOS = {"media": "AVG", "medio": "AVG", "promedio": "AVG", "suma": "SUM", "total": "SUM",
+              "maximo": "MAX", "maxima": "MAX", "minimo": "MIN", "minima": "MIN"}
+# Adjetivos que implican una columna y un orden ("los 5 productos mas caros")
+_ADJETIVOS = {"car": ("precio", "DESC"), "barat": ("precio", "ASC"), "joven": ("edad", "ASC"),
+              "viej": ("edad", "DESC"), "recient": ("fecha", "DESC"), "antigu": ("fecha", "ASC")}
+_NUM = r"\d+(?:\.\d+)?"
+# Negaciones y exclusiones ("estado no es activo", "precio distinto de 10",
+# "sin email", "todos excepto..."): las plantillas no saben expresarlas y leerlas
+# como filtro daria justo lo contrario de lo pedido. "menos de/que N" es una
+# comparacion, no una exclusion.
+_NEGACION = re.compile(
+    r"\b(?:no|ni|nunca|jamas|distint[oa]s?|diferentes?|sin|excepto|salvo|menos(?!\s+(?:que|de|a)\s+\d))\b"
+)
+# Disyunciones ("menores de 18 o mayores de 65"): las condiciones se unen con
+# AND, asi que leer la "o" como palabra vacia daria una consulta sin filas
+_DISYUNCION = re.compile(r"\b(?:o|u)\b")
+# Palabras de filtro o agregado que, si quedan sin consumir, significan que
+# una condicion o un agregado no se entendio: no se convierten en proyeccion
+_SIN_CONSUMIR = re.compile(
+    r"\b(?:" + "|".join(_AGREGADOS) + r"|cuant[oa]s|contar|cuenta|mayor(?:es)?|menor(?:es)?|"
+    r"superior(?:es)?|inferior(?:es)?|entre|igual)\b"
+)
+_VALOR = r"'[^']*'|\d+(?:\.\d+)?|[a-z0-9@._\-]+"
+
+
+def normalizar(texto):
+    texto = re.sub(r"[¿?¡!,;:()\"]", " ", sin_tildes(texto))
+    return " ".join(t.strip(".") for t in texto.split())
+
+
+# Patron de un nombre de tabla o columna tal como se escribe o se diria:
+# guiones bajos como espacios (opcionalmente con "de") y plurales
+def _patron_nombre(nombre):
+    palabras = [re.escape(p) + r"(?:e?s)?" for p in nombre.lower().split("_") if p]
+    return r"\b" + r"(?:\s+del?)?[\s_]+".join(palabras) + r"\b"
+
+
+# Recupera el valor con sus mayusculas y tildes originales
+def _valor_original(valor, pregunta):
+    if valor.startswith("'"):
+        valor = valor[1:-1]
+        for literal in re.findall(r"'([^']*)'|\"([^\"]*)\"", pregunta):
+            original = literal[0] or literal[1]
+            if normalizar(original) == valor:
+                return original
+        return valor
+    for palabra in pregunta.split():
+        palabra = palabra.strip("¿?¡!,;:()\"'")
+        if normalizar(palabra) == valor:
+            return palabra
+    return valor
+
+
+def _literal(valor, pregunta):
+    if re.fullmatch(_NUM, valor):
+        return valor
+    return "'" + _valor_original(valor, pregunta).replace("'", "''") + "'"
+
+
+class _Analisis:
+    def __init__(self, pregunta, tabla, columnas):
+        self.pregunta = pregunta
+        self.resto = " " + normalizar(pregunta) + " "
+        self.columnas = {c: _patron_nombre(c) for c in columnas}
+        self.alternativa_col = "|".join(f"(?:{p[2:-2]})" for p in sorted(self.columnas.values(), key=len, reverse=True))
+        self.tabla_patron = _patron_nombre(tabla)
+
+    def columna(self, texto):
+        for columna, patron in self.columnas.items():
+            if re.fullmatch(patron, texto.strip()):
+                return columna
+        return None
+
+    # Busca el patron en lo que queda sin explicar y, si aparece, lo consume
+    def consumir(self, patron):
+        patron = patron.replace("COL", f"(?P<col>{self.alternativa_col})") if self.alternativa_col else patron
+        patron = patron.replace("TABLA", self.tabla_patron[2:-2])
+        m = re.search(patron, self.resto)
+        if m:
+            self.resto = self.resto[:m.start()] + " " + self.resto[m.end():]
+        return m
+
+    def sin_explicar(self):
+        return [t for t in self.resto.split() if t not in _VACIAS]
+
+
+# Devuelve (sql, confianza) para la pregunta sobre `tablas` ({tabla: [columnas]}),
+# o (None, 0.0) si no encaja en ninguna plantilla
+def generar(pregunta, tablas):
+    texto = " " + normalizar(pregunta) + " "
+    if _NEGACION.search(texto) or _DISYUNCION.search(texto):
+        return None, 0.0
+    apariciones = {}
+    for t in tablas:
+        if not t.startswith("sqlite_"):
+            apariciones[t] = [m.span() for m in re.finditer(_patron_nombre(t), texto)]
+    # "detalle de pedidos" nombra detalle_pedido, no tambien pedidos
+    candidatas = [
+        t for t, spans in apariciones.items()
+        if any(not any(o != t and a <= i and f <= b and (a, b) != (i, f) for o in apariciones for a, b in apariciones[o])
+               for i, f in spans)
+    ]
+    if len(candidatas) != 1:
+        # Ninguna tabla o varias (haria falta un JOIN): fuera del alcance local
+        return None, 0.0
+    tabla = candidatas[0]
+    a = _Analisis(pregunta, tabla, tablas[tabla])
+    total = len([t for t in texto.split() if t not in _VACIAS])
+
+    condiciones = []
+    orden = None
+    limite = None
+    agregado = None
+    contar = False
+    grupo = None
+
+    # Filtros
+    while m := a.consumir(rf"\bCOL\s+entre\s+(?P<a>{_NUM})\s+y\s+(?P<b>{_NUM})"):
+        condiciones.append(f"{a.columna(m['col'])} BETWEEN {m['a']} AND {m['b']}")
+    while m := a.consumir(
+        rf"\b(?:con\s+)?(?:(?:un|una|el|la)\s+)?COL\s+(?:es\s+|sea\s+)?"
+        rf"(?P<op>mayor(?:es)?|superior(?:es)?|mas|menor(?:es)?|inferior(?:es)?|menos)\s+(?:que|de|a)\s+(?P<v>{_NUM})"
+    ):
+        op = "<" if m["op"].startswith(("menor", "inferior", "menos")) else ">"
+        condiciones.append(f"{a.columna(m['col'])} {op} {m['v']}")
+    if "edad" in a.columnas:
+        while m := a.consumir(r"\b(?P<op>mayores|menores)\s+de\s+(?P<v>\d+)(?:\s+anos)?\b"):
+            condiciones.append(f"edad {'>' if m['op'] == 'mayores' else '<'} {m['v']}")
+    while m := (a.consumir(rf"\b(?:con|cuyo|cuya|donde)\s+(?:el\s+|la\s+)?COL\s+(?:es\s+|sea\s+|igual\s+a\s+|=\s*)?(?P<v>{_VALOR})")
+                or a.consumir(rf"\bCOL\s+(?:es|sea|igual\s+a|=)\s+(?P<v>{_VALOR})")):
+        if m["v"] in _VACIAS or a.columna(m["v"]) or _SIN_CONSUMIR.fullmatch(m["v"]):
+            return None, 0.0
+        condiciones.append(f"{a.columna(m['col'])} = {_literal(m['v'], pregunta)}")
+
+    # Orden y limite
+    if m := a.consumir(r"\b(?:ordenad[oa]s?|ordena|ordenar)\s+por\s+COL(?:\s+(?P<dir>descendente|desc|de\s+mayor\s+a\s+menor|ascendente|asc|de\s+menor\s+a\s+mayor))?"):
+        descendente = bool(m["dir"]) and m["dir"].startswith(("desc", "de mayor"))
+        orden = f"{a.columna(m['col'])}{' DESC' if descendente else ''}"
+    if m := a.consumir(rf"\b(?:top\s+|primer[oa]s\s+|(?:los|las)\s+)?(?P<n>\d+|{'|'.join(_NUMEROS)})\s+(?=TABLA)"):
+        limite = int(_NUMEROS.get(m["n"], m["n"]))
+    if m := a.consumir(r"\b(?:con|de|por)?\s*(?:(?:el|la|los|las)\s+)?(?P<dir>mayor(?:es)?|mas\s+alt[oa]s?|menor(?:es)?|mas\s+baj[oa]s?)\s+COL"):
+        orden = f"{a.columna(m['col'])} {'DESC' if m['dir'].startswith(('mayor', 'mas alt')) else 'ASC'}"
+    if m := a.consumir(r"\bmas\s+(?P<adj>car|barat|joven|viej|recient|antigu)\w*"):
+        columna, direccion = _ADJETIVOS[m["adj"]]
+        if columna not in a.columnas:
+            return None, 0.0
+        orden = f"{columna} {direccion}"
+
+    # Agregados, conteos y agrupacion
+    if m := a.consumir(rf"\b(?P<f>{'|'.join(_AGREGADOS)})\s+(?:(?:del|de\s+(?:la\s+|el\s+|los\s+|las\s+)?)\s*)?COL"):
+        agregado = f"{_AGREGADOS[m['f']]}({a.columna(m['col'])})"
+    elif m := a.consumir(rf"\bCOL\s+(?P<f>{'|'.join(_AGREGADOS)})\b"):
+        agregado = f"{_AGREGADOS[m['f']]}({a.columna(m['col'])})"
+    if a.consumir(r"\b(?:cuant[oa]s|numero\s+(?:total\s+)?de|total\s+de|cantidad\s+de(?=\s+TABLA)|contar|cuenta)\b"):
+        contar = True
+    if (agregado or contar) and (m := a.consumir(r"\b(?:por|segun|para\s+cada|por\s+cada)\s+COL")):
+        grupo = a.columna(m["col"])
+    a.consumir(r"\bTABLA")
+
+    if _SIN_CONSUMIR.search(a.resto):
+        return None, 0.0
+
+    # Columnas pedidas explicitamente ("nombre y email de los clientes"). Una
+    # columna seguida de un valor ("estado activo") es un filtro no reconocido
+    proyeccion = []
+    while m := a.consumir(r"\bCOL"):
+        siguiente = a.resto[m.start():].split()[:1]
+        if siguiente and siguiente[0] not in _VACIAS and not a.columna(siguiente[0]):
+            return None, 0.0
+        columna = a.columna(m["col"])
+        if columna not in proyeccion:
+            proyeccion.append(columna)
+
+    if agregado or contar:
+        if proyeccion:
+            return None, 0.0
+        seleccion = agregado if agregado else "COUNT(*)"
+        if grupo:
+            seleccion = f"{grupo}, {seleccion}"
+    else:
+        seleccion = ", ".join(proyeccion) if proyeccion else "*"
+
+    sql = f"SELECT {seleccion} FROM {tabla}"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    if grupo:
+        sql += f" GROUP BY {grupo}"
+    if orden:
+        sql += f" ORDER BY {orden}"
+    if limite:
+        sql += f" LIMIT {limite}"
+    sin_explicar = a.sin_explicar()
+    confianza = 1.0 - len(sin_explicar) / total if total else 0.0
+    return sql + ";", max(confianza, 0.0)
@@ -0,0 +1,138 @@
+from datetime import datetime
+from html import escape
+from io import BytesIO
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+# Motor de reportes PDF para resultados grandes. Las filas se procesan por
+# bloques: cada bloque se formatea de forma vectorizada y se convierte en una
+# tabla con la cabecera repetida en cada pagina. Los flowables se generan bajo
+# demanda mientras reportlab maqueta, asi que nunca estan todos en memoria.
+FILAS_POR_TABLA = 200
+MAX_CARACTERES = 50
+
+ESTILO_TABLA = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a1a2e')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f0f0')])
+])
+
+
+# Lista que reportlab consume por el principio y que se rellena desde un
+# generador cuando se queda corta
+class _FlowablesPerezosos(list):
+    def __init__(self, generador):
+        super().__init__()
+        self._generador = generador
+
+    def __len__(self):
+        while list.__len__(self) < 2 and self._generador is not None:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                self._generador = None
+        return list.__len__(self)
+
+
+# Convierte un bloque a texto y recorta las celdas largas, columna a columna
+def formatear_bloque(df):
+    texto = df.astype(str)
+    for columna in texto.columns:
+        serie = texto[columna]
+        largas = serie.str.len() > MAX_CARACTERES
+        if largas.any():
+            texto[columna] = serie.where(~largas, serie.str.slice(0, MAX_CARACTERES - 3) + "...")
+    return texto.values.tolist()
+
+
+# Divide un DataFrame o un iterable de DataFrames en bloques de FILAS_POR_TABLA
+def _bloques(datos):
+    if isinstance(datos, pd.DataFrame):
+        datos = [datos]
+    for df in datos:
+        for inicio in range(0, len(df), FILAS_POR_TABLA):
+            yield df.iloc[inicio:inicio + FILAS_POR_TABLA]
+
+
+def _estilos():
+    styles = getSampleStyleSheet()
+    titulo_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a1a2e'),
+        spaceAfter=30,
+        alignment=1
+    )
+    subtitulo_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#333333'),
+        spaceAfter=12
+    )
+    return styles, titulo_style, subtitulo_style
+
+
+def _elementos(consulta_usuario, sql_query, datos, truncado, conteo):
+    styles, titulo_style, subtitulo_style = _estilos()
+
+    yield Paragraph("Reporte de Consulta SQL", titulo_style)
+    yield Spacer(1, 0.3*inch)
+
+    fecha_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    yield Paragraph(f"<b>Fecha de generacion:</b> {fecha_actual}", styles['Normal'])
+    yield Spacer(1, 0.2*inch)
+
+    yield Paragraph("Consulta del Usuario", subtitulo_style)
+    yield Paragraph(f"<i>{escape(consulta_usuario)}</i>", styles['Normal'])
+    yield Spacer(1, 0.2*inch)
+
+    yield Paragraph("Consulta SQL Generada", subtitulo_style)
+    yield Paragraph(f"<font name='Courier'>{escape(sql_query)}</font>", styles['Code'])
+    yield Spacer(1, 0.3*inch)
+
+    yield Paragraph("Resultados", subtitulo_style)
+    for bloque in _bloques(datos):
+        conteo["filas"] += len(bloque)
+        tabla = Table([bloque.columns.tolist()] + formatear_bloque(bloque), repeatRows=1)
+        tabla.setStyle(ESTILO_TABLA)
+        yield tabla
+
+    if conteo["filas"] == 0:
+        yield Paragraph("No se encontraron resultados", styles['Normal'])
+    else:
+        yield Spacer(1, 0.2*inch)
+        total = f"<b>Total de filas:</b> {conteo['filas']}"
+        if truncado:
+            total += " (resultado truncado)"
+        yield Paragraph(total, styles['Normal'])
+
+
+# Genera el PDF y devuelve (buffer, numero_de_paginas).
+# datos puede ser un DataFrame o un iterable de DataFrames (p.ej. por paginas).
+def construir_pdf(consulta_usuario, sql_query, datos, truncado=False):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    conteo = {"filas": 0}
+    doc.build(_FlowablesPerezosos(_elementos(consulta_usuario, sql_query, datos, truncado, conteo)))
+    buffer.seek(0)
+    return buffer, doc.page
+
+
+# Funcion para generar PDF
+def generar_pdf(consulta_usuario, sql_query, datos, truncado=False):
+    return construir_pdf(consulta_usuario, sql_query, datos, truncado)[0]
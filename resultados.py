@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import CancelledError
+
+from conexiones import consulta
+from importes import importar
+
+# Lectura acotada de resultados: las filas se traen con fetchmany por paginas
+# y se corta al superar un maximo de filas o de bytes, en lugar de cargar el
+# resultado completo en memoria.
+MAX_FILAS = int(os.getenv("VOICETOSQL_MAX_FILAS", "10000"))
+MAX_BYTES = int(os.getenv("VOICETOSQL_MAX_BYTES", str(64 * 1024 * 1024)))
+TAM_PAGINA = 1000
+
+
+class Resultado:
+    def __init__(self, columnas, filas, truncado=False, bytes_leidos=0):
+        self.columnas = columnas
+        self.filas = filas
+        self.truncado = truncado
+        self.bytes_leidos = bytes_leidos
+        self._df = None
+
+    def __len__(self):
+        return len(self.filas)
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = importar("pandas").DataFrame.from_records(self.filas, columns=self.columnas)
+        return self._df
+
+
+# Tamano aproximado de una fila en bytes (texto/blob por longitud, resto 8)
+def _tam_fila(fila):
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in fila)
+
+
+# Genera (columnas, filas) pagina a pagina desde el cursor. Las columnas se
+# toman del cursor antes de la primera lectura: un resultado vacio genera una
+# sola pagina sin filas, sin repetir la consulta. El tiempo maximo de la
+# consulta cubre toda la iteracion.
+def iterar_paginas(db_path, sql_query, tam_pagina=TAM_PAGINA, timeout=None):
+    with consulta(db_path, timeout, sql_query) as conn:
+        cursor = conn.execute(sql_query)
+        try:
+            columnas = [d[0] for d in cursor.description] if cursor.description else []
+            vacio = True
+            while True:
+                filas = cursor.fetchmany(tam_pagina)
+                if not filas:
+                    break
+                vacio = False
+                yield columnas, filas
+            if vacio:
+                yield columnas, []
+        finally:
+            cursor.close()
+
+
+# Lee el resultado hasta max_filas / max_bytes e indica si quedo truncado
+def leer_resultado(db_path, sql_query, max_filas=MAX_FILAS, max_bytes=MAX_BYTES, timeout=None):
+    columnas = []
+    filas = []
+    bytes_leidos = 0
+    truncado = False
+    paginas = iterar_paginas(db_path, sql_query, timeout=timeout)
+    try:
+        for columnas, pagina in paginas:
+            for fila in pagina:
+                if len(filas) >= max_filas or bytes_leidos >= max_bytes:
+                    truncado = True
+                    break
+                filas.append(fila)
+                bytes_leidos += _tam_fila(fila)
+            if truncado:
+                break
+    finally:
+        paginas.close()
+    return Resultado(columnas, filas, truncado, bytes_leidos)
+
+
+# Sentencia sin el ';' final, para envolverla en una subconsulta
+def sin_punto_y_coma(sql_query):
+    return sql_query.strip().rstrip(";").strip()
+
+
+# Lee una pagina concreta (empezando en 0) del resultado
+def leer_pagina(db_path, sql_query, pagina, tam_pagina=TAM_PAGINA, timeout=None):
+    envuelta = f"SELECT * FROM ({sin_punto_y_coma(sql_query)}) LIMIT ? OFFSET ?"
+    try:
+        with consulta(db_path, timeout, sql_query) as conn:
+            cursor = conn.execute(envuelta, (tam_pagina, pagina * tam_pagina))
+            columnas = [d[0] for d in cursor.description]
+            return Resultado(columnas, cursor.fetchall())
+    except (TimeoutError, CancelledError):
+        raise
+    except Exception:
+        # Sentencias que no admiten subconsulta (p.ej. PRAGMA): se salta por cursor
+        saltar = pagina * tam_pagina
+        filas = []
+        columnas = []
+        for columnas, bloque in iterar_paginas(db_path, sql_query, tam_pagina, timeout):
+            if saltar >= len(bloque):
+                saltar -= len(bloque)
+                continue
+            filas.extend(bloque[saltar:])
+            saltar = 0
+            if len(filas) >= tam_pagina:
+                break
+        return Resultado(columnas, filas[:tam_pagina])
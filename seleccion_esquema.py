@@ -0,0 +1,121 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from conexiones import consulta
+from esquema import get_schema_info
+from normalizacion import sin_tildes
+
+# Seleccion de las tablas relevantes para una pregunta. Se indexan nombres de
+# tabla y columna (y opcionalmente valores de muestra) con BM25, y al prompt
+# solo van las top-k tablas mas sus vecinas por claves foraneas.
+TOP_K = int(os.getenv("VOICETOSQL_TOP_K_TABLAS", "5"))
+FILAS_MUESTRA = 20
+K1 = 1.5
+B = 0.75
+
+_lock = threading.Lock()
+_indices = {}
+
+
+# Tokeniza: separa camelCase y guiones bajos, quita tildes, numeros y plurales simples
+def tokenizar(texto):
+    texto = re.sub(r"([a-z])([A-Z])", r"\1 \2", texto)
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", sin_tildes(texto)):
+        # Los numeros sueltos ("top 10") no ayudan a elegir tablas
+        if token.isdigit():
+            continue
+        if len(token) > 4 and token.endswith("es"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _muestras(db_path, tabla):
+    with consulta(db_path, timeout=5) as conn:
+        filas = conn.execute(f'SELECT * FROM "{tabla}" LIMIT {FILAS_MUESTRA}').fetchall()
+    return " ".join(str(v) for fila in filas for v in fila if isinstance(v, str))
+
+
+class IndiceBM25:
+    def __init__(self, documentos):
+        self.documentos = {nombre: Counter(tokens) for nombre, tokens in documentos.items()}
+        self.longitudes = {nombre: len(tokens) for nombre, tokens in documentos.items()}
+        self.media = sum(self.longitudes.values()) / max(len(documentos), 1)
+        frecuencia = Counter()
+        for tokens in self.documentos.values():
+            frecuencia.update(tokens.keys())
+        n = len(documentos)
+        self.idf = {t: math.log(1 + (n - df + 0.5) / (df + 0.5)) for t, df in frecuencia.items()}
+
+    def puntuar(self, tokens):
+        puntuaciones = {}
+        for nombre, tf in self.documentos.items():
+            norma = K1 * (1 - B + B * self.longitudes[nombre] / (self.media or 1))
+            puntuacion = 0.0
+            for token in set(tokens):
+                if token in tf:
+                    puntuacion += self.idf[token] * tf[token] * (K1 + 1) / (tf[token] + norma)
+            puntuaciones[nombre] = puntuacion
+        return puntuaciones
+
+
+# Indice por base de datos, reconstruido solo cuando cambia el esquema
+def get_indice(db_path, muestras=False):
+    info = get_schema_info(db_path)
+    clave = (os.path.realpath(db_path), info["huella"], muestras)
+    with _lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            documentos = {}
+            for tabla, columnas in info["tablas"].items():
+                # El nombre de la tabla pesa mas que el de las columnas
+                texto = f"{tabla} {tabla} {' '.join(columnas)}"
+                if muestras:
+                    texto += " " + _muestras(db_path, tabla)
+                documentos[tabla] = tokenizar(texto)
+            indice = IndiceBM25(documentos)
+            _indices[clave] = indice
+        return indice
+
+
+# Devuelve (texto_esquema, estadisticas) con solo las tablas relevantes
+def seleccionar_esquema(db_path, pregunta, k=TOP_K, muestras=False):
+    inicio = time.perf_counter()
+    info = get_schema_info(db_path)
+    tablas = info["tablas"]
+    seleccion = list(tablas)
+    if len(tablas) > k:
+        puntuaciones = get_indice(db_path, muestras).puntuar(tokenizar(pregunta))
+        relevantes = [t for t in sorted(puntuaciones, key=puntuaciones.get, reverse=True)[:k]
+                      if puntuaciones[t] > 0]
+        if relevantes:
+            seleccion = set(relevantes)
+            # Vecinas por clave foranea, en ambos sentidos
+            for tabla, foraneas in info["foraneas"].items():
+                for _, referida, _ in foraneas:
+                    if tabla in relevantes and referida in tablas:
+                        seleccion.add(referida)
+                    elif referida in relevantes:
+                        seleccion.add(tabla)
+            seleccion = [t for t in tablas if t in seleccion]
+
+    texto = ""
+    for tabla in seleccion:
+        texto += f"Tabla: {tabla}\nColumnas: {', '.join(tablas[tabla])}\n"
+    total = len(info["texto"])
+    estadisticas = {
+        "tablas_total": len(tablas),
+        "tablas_seleccionadas": len(seleccion),
+        "caracteres_total": total,
+        "caracteres_seleccion": len(texto),
+        "reduccion": 1 - len(texto) / total if total else 0.0,
+        "segundos": time.perf_counter() - inicio,
+    }
+    return texto, estadisticas
@@ -0,0 +1,152 @@
+import time
+
+import numpy as np
+
+import modelos_audio
+from importes import importar
+from transcripcion import SAMPLE_RATE, pcm16_a_numpy
+
+# Captura de voz en streaming: el audio se divide en frames de 30 ms, un
+# detector de actividad de voz (VAD) por energia corta segmentos en cada pausa
+# y cada segmento se transcribe mientras el usuario sigue hablando.
+FRAME_MS = 30
+FRAME_MUESTRAS = SAMPLE_RATE * FRAME_MS // 1000
+FRAME_BYTES = FRAME_MUESTRAS * 2
+
+
+# Fuente de audio desde el microfono, en frames de PCM 16 bits mono a 16 kHz
+class FuenteMicrofono:
+    def __init__(self, max_segundos=30):
+        self.max_segundos = max_segundos
+
+    def frames(self):
+        sr = importar("speech_recognition")
+        with sr.Microphone(sample_rate=SAMPLE_RATE, chunk_size=FRAME_MUESTRAS) as source:
+            for _ in range(int(self.max_segundos * 1000 / FRAME_MS)):
+                yield source.stream.read(FRAME_MUESTRAS)
+
+
+# Fuente que reproduce PCM ya grabado (archivo o bytes); permite probar sin microfono
+class FuentePCM:
+    def __init__(self, pcm, tiempo_real=False):
+        self.pcm = pcm
+        self.tiempo_real = tiempo_real
+
+    @classmethod
+    def desde_archivo(cls, path, tiempo_real=False):
+        sr = importar("speech_recognition")
+        r = sr.Recognizer()
+        with sr.AudioFile(path) as source:
+            audio = r.record(source)
+        return cls(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2), tiempo_real)
+
+    def frames(self):
+        for inicio in range(0, len(self.pcm) - FRAME_BYTES + 1, FRAME_BYTES):
+            if self.tiempo_real:
+                time.sleep(FRAME_MS / 1000)
+            yield self.pcm[inicio:inicio + FRAME_BYTES]
+
+
+# VAD por energia: calibra el ruido de fondo con los primeros frames y marca
+# como voz los frames cuya energia supera ese piso por un factor. Solo
+# calibran los frames por debajo de umbral_minimo * factor (si el usuario
+# empieza a hablar enseguida, su voz no se toma por ruido) y el piso nunca
+# pasa de piso_maximo, ni al calibrar ni al adaptarse en los silencios.
+class DetectorVoz:
+    def __init__(self, factor=3.0, umbral_minimo=300.0, frames_calibracion=10, piso_maximo=600.0):
+        self.factor = factor
+        self.umbral_minimo = umbral_minimo
+        self.frames_calibracion = frames_calibracion
+        self.piso_maximo = piso_maximo
+        self._energias = []
+        self.piso = None
+
+    def es_voz(self, frame):
+        muestras = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        energia = float(np.sqrt(np.mean(muestras ** 2))) if len(muestras) else 0.0
+        if self.piso is None:
+            voz = energia > self.umbral_minimo * self.factor
+            if not voz:
+                self._energias.append(energia)
+                if len(self._energias) >= self.frames_calibracion:
+                    self.piso = min(float(np.median(self._energias)), self.piso_maximo)
+            return voz
+        voz = energia > max(self.umbral_minimo, self.piso * self.factor)
+        if not voz:
+            # El piso de ruido se adapta lentamente en los silencios
+            self.piso = min(0.95 * self.piso + 0.05 * energia, self.piso_maximo)
+        return voz
+
+
+# Transcribe la voz de una fuente en streaming. Genera eventos
+# {"tipo": "parcial", "texto"} a medida que llegan segmentos y un evento final
+# {"tipo": "final", "texto", "ttft", "fin_habla", "latencia_transcripcion"}.
+# ttft: segundos desde el inicio del habla hasta el primer texto parcial.
+# fin_habla: instante (time.perf_counter) en que se detecto el final del habla.
+def transcribir_en_streaming(fuente, modelo="tiny", pausa_ms=300, fin_ms=800,
+                             max_segmento_s=10, espera_voz_s=5, detector=None):
+    detector = detector or DetectorVoz()
+    frames_pausa = pausa_ms // FRAME_MS
+    frames_fin = fin_ms // FRAME_MS
+    frames_max_segmento = int(max_segmento_s * 1000 / FRAME_MS)
+    frames_espera = int(espera_voz_s * 1000 / FRAME_MS)
+
+    segmento = []
+    silencio = 0
+    inicio_habla = None
+    fin_habla = None
+    futuros = []
+    textos = []
+    ttft = None
+
+    def enviar_segmento():
+        pcm = b"".join(segmento)
+        segmento.clear()
+        prompt = " ".join(textos) or None
+        futuros.append(modelos_audio.submit(modelo, pcm16_a_numpy(pcm), initial_prompt=prompt))
+
+    def recoger(bloquear=False):
+        nonlocal ttft
+        nuevos = False
+        while futuros and (bloquear or futuros[0].done()):
+            texto = futuros.pop(0).result()['text'].strip()
+            if texto:
+                textos.append(texto)
+                nuevos = True
+                if ttft is None:
+                    ttft = time.perf_counter() - inicio_habla
+        return nuevos
+
+    for n, frame in enumerate(fuente.frames()):
+        voz = detector.es_voz(frame)
+        if inicio_habla is None:
+            if not voz:
+                if n >= frames_espera:
+                    break
+                continue
+            inicio_habla = time.perf_counter()
+        segmento.append(frame)
+        silencio = 0 if voz else silencio + 1
+        if silencio >= frames_fin:
+            fin_habla = time.perf_counter()
+            break
+        if silencio == frames_pausa or len(segmento) >= frames_max_segmento:
+            enviar_segmento()
+        if recoger():
+            yield {"tipo": "parcial", "texto": " ".join(textos)}
+
+    if fin_habla is None:
+        fin_habla = time.perf_counter()
+    # El ultimo segmento solo se transcribe si contiene algo mas que silencio
+    if segmento and silencio < len(segmento):
+        enviar_segmento()
+    if inicio_habla is not None and recoger(bloquear=True):
+        yield {"tipo": "parcial", "texto": " ".join(textos)}
+
+    yield {
+        "tipo": "final",
+        "texto": " ".join(textos),
+        "ttft": ttft,
+        "fin_habla": fin_habla,
+        "latencia_transcripcion": time.perf_counter() - fin_habla,
+    }
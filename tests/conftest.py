@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Los modulos de la aplicacion estan en la raiz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches y metricas de las pruebas en un directorio temporal, no en el del proyecto
+_temporal = tempfile.mkdtemp(prefix="voicetosql_pruebas_")
+for variable, archivo in [
+    ("VOICETOSQL_CACHE_RESULTADOS", "cache_resultados.sqlite"),
+    ("VOICETOSQL_CACHE_SQL", "cache_sql.sqlite"),
+    ("VOICETOSQL_METRICAS", "metricas.sqlite"),
+    ("VOICETOSQL_PLANES", "planes.sqlite"),
+]:
+    os.environ.setdefault(variable, os.path.join(_temporal, archivo))
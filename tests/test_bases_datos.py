@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import bases_datos
+from cache_resultados import leer_resultado_cacheado
+from conexiones import adjuntables_de, consulta
+
+
+def _crear(path, sql):
+    conn = sqlite3.connect(path)
+    conn.executescript(sql)
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture
+def bases(tmp_path):
+    tienda = _crear(tmp_path / "tienda_norte.sqlite", """
+        CREATE TABLE ventas_tienda (id INTEGER PRIMARY KEY, sucursal_id INTEGER, importe REAL);
+        INSERT INTO ventas_tienda VALUES (1, 1, 10.0), (2, 2, 5.0), (3, 1, 2.5);
+    """)
+    sucursales = _crear(tmp_path / "sucursales.sqlite", """
+        CREATE TABLE sucursales (id INTEGER PRIMARY KEY, ciudad TEXT);
+        INSERT INTO sucursales VALUES (1, 'Bilbao'), (2, 'Vigo');
+    """)
+    return bases_datos.registrar(tienda), bases_datos.registrar(sucursales)
+
+
+def test_registrar_es_idempotente(bases):
+    tienda, _ = bases
+    assert bases_datos.registrar(bases_datos.ruta(tienda)) == tienda
+    assert list(bases_datos.get_bases()).count(tienda) == 1
+
+
+def test_elegir_por_tablas(bases):
+    tienda, sucursales = bases
+    eleccion = bases_datos.elegir("importe de las ventas de tienda")
+    assert eleccion["principal"] == tienda
+    eleccion = bases_datos.elegir("ciudad de cada sucursal")
+    assert eleccion["principal"] == sucursales
+
+
+def test_elegir_base_fija(bases):
+    tienda, sucursales = bases
+    eleccion = bases_datos.elegir("ciudad de cada sucursal", fija=tienda)
+    assert (eleccion["principal"], eleccion["adjuntas"]) == (tienda, [])
+
+
+def test_adjuntables_solo_en_posicion_de_tabla(bases):
+    _, sucursales = bases
+    # Tabla del mismo nombre que la base: "sucursales.ciudad" es una columna
+    assert adjuntables_de("SELECT sucursales.ciudad FROM sucursales", ["sucursales"]) == {}
+    assert adjuntables_de("SELECT s.ciudad FROM sucursales.sucursales s", ["ventas_tienda"]) == {
+        sucursales: bases_datos.ruta(sucursales)}
+    assert adjuntables_de("SELECT * FROM t WHERE email = 'a@sucursales.com'", ["t"]) == {}
+
+
+def test_join_entre_bases(bases):
+    tienda, sucursales = bases
+    sql = (f"SELECT s.ciudad, SUM(v.importe) FROM ventas_tienda v JOIN {sucursales}.sucursales s "
+           f"ON s.id = v.sucursal_id GROUP BY s.ciudad ORDER BY s.ciudad")
+    with consulta(bases_datos.ruta(tienda), sql_query=sql) as conn:
+        assert conn.execute(sql).fetchall() == [("Bilbao", 12.5), ("Vigo", 5.0)]
+    resultado, _ = leer_resultado_cacheado(bases_datos.ruta(tienda), sql)
+    assert resultado.filas == [("Bilbao", 12.5), ("Vigo", 5.0)]
+
+
+def test_columna_calificada_no_adjunta(bases):
+    _, sucursales = bases
+    sql = "SELECT sucursales.ciudad FROM sucursales"
+    with consulta(bases_datos.ruta(sucursales), sql_query=sql) as conn:
+        assert conn.execute(sql).fetchall() == [("Bilbao",), ("Vigo",)]
+        assert [fila[1] for fila in conn.execute("PRAGMA database_list")] == ["main"]
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+import pytest
+
+import cache_reportes
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(cache_reportes, "_pdfs", OrderedDict())
+    monkeypatch.setattr(cache_reportes, "_bytes_totales", 0)
+    monkeypatch.setattr(cache_reportes, "MAX_BYTES", 10)
+
+
+def test_get_or_build_construye_una_vez():
+    llamadas = []
+
+    def construir():
+        llamadas.append(1)
+        return b"pdf"
+    assert cache_reportes.get_or_build("a", construir) == b"pdf"
+    assert cache_reportes.get_or_build("a", construir) == b"pdf"
+    assert llamadas == [1]
+
+
+def test_desalojo_lru_por_bytes():
+    cache_reportes.put("a", b"1234")
+    cache_reportes.put("b", b"1234")
+    cache_reportes.get("a")
+    cache_reportes.put("c", b"1234")
+    assert (cache_reportes.get("a"), cache_reportes.get("b")) == (b"1234", None)
+    assert cache_reportes.stats() == {"reportes": 2, "bytes": 8, "max_bytes": 10}
+
+
+def test_no_guarda_pdfs_mayores_que_el_limite():
+    cache_reportes.put("a", b"x" * 11)
+    cache_reportes.put("b", b"1")
+    cache_reportes.put("b", b"12")
+    assert cache_reportes.get("a") is None
+    assert cache_reportes.stats()["bytes"] == 2
+
+
+def test_huella_resultado():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"a": [1, 2]})
+    assert cache_reportes.huella_resultado(df) == cache_reportes.huella_resultado(df.copy())
+    assert cache_reportes.huella_resultado(df) != cache_reportes.huella_resultado(df, truncado=True)
+    assert cache_reportes.huella_resultado(df) != cache_reportes.huella_resultado(pd.DataFrame({"a": [1, 3]}))
+    assert cache_reportes.clave_reporte("p", "SELECT 1", "h") != cache_reportes.clave_reporte("p", "SELECT 2", "h")
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import cache_resultados
+from cache_resultados import CacheResultados, es_determinista, leer_resultado_cacheado, normalizar_sql
+from resultados import Resultado
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, nombre TEXT)")
+    conn.executemany("INSERT INTO t (nombre) VALUES (?)", [("a",), ("b",)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(cache_resultados, "_cache_global", cache)
+    return cache
+
+
+def test_normalizar_sql_respeta_literales():
+    assert normalizar_sql("SELECT  *\nFROM t WHERE nombre = 'Ana  B';") == "select * from t where nombre = 'Ana  B'"
+
+
+def test_acierto_con_sql_equivalente(db, cache):
+    resultado, acierto = leer_resultado_cacheado(db, "SELECT nombre FROM t ORDER BY id")
+    assert (resultado.filas, acierto) == ([("a",), ("b",)], False)
+    resultado, acierto = leer_resultado_cacheado(db, "select nombre\n  from t order by id;")
+    assert (resultado.filas, acierto) == ([("a",), ("b",)], True)
+
+
+def test_invalidacion_al_cambiar_los_datos(db, cache):
+    leer_resultado_cacheado(db, "SELECT COUNT(*) FROM t")
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO t (nombre) VALUES ('c')")
+    conn.commit()
+    conn.close()
+    resultado, acierto = leer_resultado_cacheado(db, "SELECT COUNT(*) FROM t")
+    assert (resultado.filas, acierto) == ([(3,)], False)
+    assert cache.stats()["invalidaciones"] == 1
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT random() FROM t",
+    "SELECT date('now')",
+    "SELECT nombre FROM t WHERE datetime( 'NOW', '-1 day') > '2000'",
+    "SELECT CURRENT_TIMESTAMP",
+])
+def test_no_deterministas_no_se_cachean(db, cache, sql):
+    assert not es_determinista(sql)
+    leer_resultado_cacheado(db, sql)
+    assert leer_resultado_cacheado(db, sql)[1] is False
+    assert cache.stats()["entradas"] == 0
+
+
+def test_fechas_deterministas_si_se_cachean():
+    assert es_determinista("SELECT date(fecha) FROM pedidos WHERE fecha > date('2024-01-01')")
+
+
+def test_formato_desconocido_o_danado_es_un_fallo(db, cache):
+    clave = cache.clave(db, "SELECT 1", 10, 1000)
+    resultado = Resultado(["a", "b"], [(1, "x"), (2.5, None)])
+    cache.put(clave, db, "v1", resultado)
+    cache._memoria.clear()
+    cache._conn.execute("UPDATE cache_resultados SET formato = 'marshal-2.7'")
+    assert cache.get(clave, "v1") is None
+    assert cache.stats()["entradas"] == 0
+    cache.put(clave, db, "v1", resultado)
+    cache._memoria.clear()
+    cache._conn.execute("UPDATE cache_resultados SET datos = x'00'")
+    assert cache.get(clave, "v1") is None
+
+
+def test_tipos_mixtos_ida_y_vuelta(db, cache):
+    clave = cache.clave(db, "SELECT 1", 10, 1000)
+    cache.put(clave, db, "v1", Resultado(["a"], [(1,), (2.5,), ("x",)]))
+    cache._memoria.clear()
+    assert cache.get(clave, "v1").filas == [(1,), (2.5,), ("x",)]
+
+
+def test_desalojo_por_presupuesto_de_disco(db, tmp_path):
+    filas = [(i, "x" * 50) for i in range(100)]
+    cache = CacheResultados(str(tmp_path / "cache.sqlite"), max_bytes_disco=10_000)
+    tam = len(cache_resultados._serializar(Resultado(["id", "texto"], filas))[1])
+    cache.max_bytes_disco = tam * 2 + 1
+    for i in range(4):
+        cache.put(f"clave{i}", db, "v1", Resultado(["id", "texto"], filas))
+    claves = [fila[0] for fila in cache._conn.execute("SELECT clave FROM cache_resultados ORDER BY usado")]
+    assert claves == ["clave2", "clave3"]
+
+
+def test_desalojo_en_memoria(db, tmp_path):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite"), max_bytes_memoria=250)
+    for i in range(3):
+        cache.put(f"clave{i}", db, "v1", Resultado(["a"], [(i,)], bytes_leidos=100))
+    assert list(cache._memoria) == ["clave1", "clave2"]
+    assert cache.stats()["bytes_memoria"] == 200
@@ -0,0 +1,51 @@
+import pytest
+
+from cache_sql import CacheSQL, normalizar_pregunta
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheSQL(str(tmp_path / "cache_sql.sqlite"))
+
+
+def test_normalizar_pregunta():
+    assert normalizar_pregunta("  ¿Cuántos   CLIENTES hay? ") == "cuantos clientes hay"
+
+
+def test_acierto_exacto_y_normalizado(cache):
+    cache.put("¿Cuántos clientes hay?", "h1", "modelo", "SELECT COUNT(*) FROM clientes;", "a.sqlite")
+    assert cache.get("¿Cuántos clientes hay?", "h1", "modelo") == "SELECT COUNT(*) FROM clientes;"
+    assert cache.get("cuantos clientes hay", "h1", "modelo") == "SELECT COUNT(*) FROM clientes;"
+    stats = cache.stats()
+    assert (stats["aciertos_exactos"], stats["aciertos_normalizados"], stats["fallos"]) == (1, 1, 0)
+
+
+def test_clave_incluye_esquema_y_modelo(cache):
+    cache.put("clientes", "h1", "modelo", "SELECT * FROM clientes;", "a.sqlite")
+    assert cache.get("clientes", "h2", "modelo") is None
+    assert cache.get("clientes", "h1", "otro") is None
+
+
+def test_purga_solo_la_misma_base(cache):
+    cache.put("clientes", "h1", "modelo", "SELECT 1;", "a.sqlite")
+    cache.put("pedidos", "h2", "modelo", "SELECT 2;", "b.sqlite")
+    assert cache.get("clientes", "h1", "modelo") == "SELECT 1;"
+    # Nuevo esquema de a: se purgan sus entradas viejas, no las de b
+    cache.put("productos", "h1b", "modelo", "SELECT 3;", "a.sqlite")
+    assert cache.get("clientes", "h1", "modelo") is None
+    assert cache.get("pedidos", "h2", "modelo") == "SELECT 2;"
+    assert cache.stats()["entradas"] == 2
+
+
+def test_caducidad(tmp_path):
+    cache = CacheSQL(str(tmp_path / "cache_sql.sqlite"), ttl=-1)
+    cache.put("clientes", "h1", "modelo", "SELECT 1;", "a.sqlite")
+    assert cache.get("clientes", "h1", "modelo") is None
+
+
+def test_desalojo_lru(tmp_path):
+    cache = CacheSQL(str(tmp_path / "cache_sql.sqlite"), max_entradas=2)
+    for i in range(3):
+        cache.put(f"pregunta {i}", "h", "modelo", f"SELECT {i};", "a.sqlite")
+    assert cache.stats()["entradas"] == 2
+    assert cache.get("pregunta 0", "h", "modelo") is None
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+
+import pytest
+
+import conexiones
+from conexiones import close_connections, consulta, get_connection
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    yield path
+    close_connections()
+
+
+def test_una_conexion_por_hilo_y_base(db):
+    conn = get_connection(db)
+    assert get_connection(db) is conn
+    otra = []
+    hilo = threading.Thread(target=lambda: otra.append(get_connection(db)))
+    hilo.start()
+    hilo.join()
+    assert otra[0] is not conn
+
+
+def test_solo_lectura(db):
+    with pytest.raises(sqlite3.OperationalError):
+        get_connection(db).execute("INSERT INTO t VALUES (1)")
+
+
+def test_cierra_las_menos_usadas(tmp_path, monkeypatch):
+    monkeypatch.setattr(conexiones, "MAX_CONEXIONES", 2)
+    rutas = []
+    for nombre in "abc":
+        rutas.append(str(tmp_path / f"{nombre}.sqlite"))
+        sqlite3.connect(rutas[-1]).close()
+    primera = get_connection(rutas[0])
+    get_connection(rutas[1])
+    get_connection(rutas[0])
+    get_connection(rutas[2])
+    assert get_connection(rutas[0]) is primera
+    assert list(conexiones._local.conexiones) == [str(tmp_path / f"{n}.sqlite") for n in "ca"]
+    close_connections()
+
+
+def test_consulta_con_tiempo_maximo(db):
+    infinita = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(TimeoutError):
+        with consulta(db, timeout=0.05) as conn:
+            conn.execute(infinita).fetchall()
+    # La conexion sigue sirviendo y sin el limite anterior
+    with consulta(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
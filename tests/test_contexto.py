@@ -0,0 +1,52 @@
+import pytest
+
+import contexto
+from contexto import ContextoConversacion, contar_tokens, tokens_mensajes
+
+
+@pytest.fixture(autouse=True)
+def sin_tiktoken(monkeypatch):
+    # Conteo aproximado, igual haya o no tiktoken instalado
+    monkeypatch.setattr(contexto, "_codificaciones", {"modelo": False})
+
+
+def test_contar_tokens_aproximado():
+    assert contar_tokens("SELECT * FROM clientes;", "modelo") == 6
+    assert contar_tokens("a" * 40, "modelo") == 10
+    assert tokens_mensajes([{"content": "hola"}, {"content": ""}], "modelo") == 1 + 2 * contexto.TOKENS_POR_MENSAJE
+
+
+def test_primer_turno():
+    ctx = ContextoConversacion("esquema", modelo="modelo")
+    assert ctx.mensajes("cuantos clientes hay") == [
+        {"role": "system", "content": "esquema"},
+        {"role": "user", "content": "cuantos clientes hay"},
+    ]
+
+
+def test_solo_el_ultimo_borrador_y_resumen_de_correcciones():
+    ctx = ContextoConversacion("esquema", modelo="modelo")
+    ctx.registrar("lista de clientes", "SELECT * FROM clientes;", 10, 0.1)
+    ctx.registrar("solo los activos", "SELECT * FROM clientes WHERE estado = 'activo';", 20, 0.1)
+    turno = ctx.registrar("ordenados por nombre", "SELECT 3;", 30, 0.2, tokens_totales=40)
+    assert turno == {"turno": 3, "tokens_prompt": 30, "tokens_totales": 40, "segundos": 0.2}
+    messages = ctx.mensajes("solo 10")
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+    assert messages[1]["content"] == ("lista de clientes\n\nCorrecciones ya aplicadas a la consulta:\n"
+                                      "- solo los activos\n- ordenados por nombre")
+    assert messages[2]["content"] == "SELECT 3;"
+    assert messages[3]["content"] == "solo 10"
+
+
+def test_presupuesto_descarta_las_correcciones_antiguas():
+    ctx = ContextoConversacion("esquema", modelo="modelo", presupuesto=50)
+    ctx.registrar("lista de clientes", "SELECT 1;", 0, 0)
+    for n in range(5):
+        ctx.registrar(f"correccion numero {n}", "SELECT 1;", 0, 0)
+    messages = ctx.mensajes("otra")
+    assert tokens_mensajes(messages, "modelo") <= 50
+    assert messages[1]["content"].endswith("- correccion numero 3\n- correccion numero 4")
+    assert "correccion numero 2" not in messages[1]["content"]
+    # Sin correcciones que descartar se envia igualmente, aunque no quepa
+    ctx.presupuesto = 1
+    assert ctx.mensajes("otra")[1]["content"] == "lista de clientes"
@@ -0,0 +1,32 @@
+from llm import BackendEnrutado, BackendFalso, BackendPlantillas, tomar_ruta
+
+SISTEMA = "Esquema:\nTabla: clientes\nColumnas: id, nombre, estado\nTabla: productos\nColumnas: id, nombre, precio\n"
+
+
+def _mensajes(pregunta):
+    return [{"role": "system", "content": SISTEMA}, {"role": "user", "content": pregunta}]
+
+
+def test_plantillas_lee_el_esquema_del_prompt():
+    assert BackendPlantillas().generar(_mensajes("cuantos productos hay")) == ("SELECT COUNT(*) FROM productos;", 1.0)
+
+
+def test_plantillas_no_atiende_correcciones():
+    mensajes = _mensajes("cuantos clientes hay") + [{"role": "assistant", "content": "SELECT 1;"},
+                                                     {"role": "user", "content": "solo los activos"}]
+    assert BackendPlantillas().generar(mensajes) == (None, 0.0)
+
+
+def test_enrutado_local_y_remoto():
+    backend = BackendEnrutado(remoto=BackendFalso({"clientes y sus pedidos": "SELECT 2;"}))
+    assert backend.complete(_mensajes("cuantos clientes hay"), "modelo") == "SELECT COUNT(*) FROM clientes;"
+    assert tomar_ruta() == "local"
+    assert "".join(backend.stream(_mensajes("clientes y sus pedidos"), "modelo")) == "SELECT 2;"
+    assert tomar_ruta() == "remoto"
+    assert backend.stats() == {"local": 1, "remoto": 1, "umbral": backend.umbral}
+
+
+def test_enrutado_negacion_va_al_remoto():
+    backend = BackendEnrutado(remoto=BackendFalso({"clientes cuyo estado no es activo": "SELECT 3;"}))
+    assert backend.complete(_mensajes("clientes cuyo estado no es activo"), "modelo") == "SELECT 3;"
+    assert tomar_ruta() == "remoto"
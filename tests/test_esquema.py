@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from esquema import clear_schema_cache, get_db_schema, get_schema_fingerprint, get_schema_info
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT)")
+    conn.execute("CREATE TABLE pedidos (id INTEGER PRIMARY KEY, cliente_id INTEGER REFERENCES clientes (id))")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_esquema(db):
+    assert get_db_schema(db) == ("Tabla: clientes\nColumnas: id, nombre\n"
+                                 "Tabla: pedidos\nColumnas: id, cliente_id\n")
+    assert get_schema_info(db)["foraneas"] == {"clientes": [], "pedidos": [("cliente_id", "clientes", "id")]}
+
+
+def test_cache_hasta_cambio_de_ddl(db):
+    info = get_schema_info(db)
+    huella = get_schema_fingerprint(db)
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO clientes (nombre) VALUES ('Ana')")
+    conn.commit()
+    assert get_schema_info(db) is info
+    conn.execute("ALTER TABLE clientes ADD COLUMN email TEXT")
+    conn.commit()
+    conn.close()
+    assert get_schema_info(db)["tablas"]["clientes"] == ["id", "nombre", "email"]
+    assert get_schema_fingerprint(db) != huella
+
+
+def test_clear_schema_cache(db):
+    info = get_schema_info(db)
+    clear_schema_cache(db)
+    assert get_schema_info(db) is not info
+    info = get_schema_info(db)
+    clear_schema_cache()
+    assert get_schema_info(db) is not info
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from estadisticas_columnas import EstadisticasBD, corregir_literales, get_estadisticas
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "clientes.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT, estado TEXT, ciudad TEXT)")
+    conn.executemany(
+        "INSERT INTO clientes (nombre, estado, ciudad) VALUES (?, ?, ?)",
+        [(f"Cliente {i}", "activo" if i % 3 else "pendiente", "Málaga" if i % 2 else "Sevilla") for i in range(30)],
+    )
+    conn.commit()
+    conn.close()
+    assert get_estadisticas(path, esperar=10).listo.is_set()
+    return path
+
+
+def test_corrige_mayusculas_y_tildes(db):
+    sql, correcciones, sugerencias = corregir_literales(db, "SELECT * FROM clientes WHERE ciudad = 'malaga'")
+    assert sql == "SELECT * FROM clientes WHERE ciudad = 'Málaga'"
+    assert correcciones == [("ciudad", "malaga", "Málaga")]
+    assert sugerencias == []
+
+
+def test_valor_existente_no_cambia(db):
+    sql = "SELECT * FROM clientes WHERE estado = 'activo'"
+    assert corregir_literales(db, sql) == (sql, [], [])
+
+
+@pytest.mark.parametrize("operador", ["=", "!="])
+def test_valor_parecido_solo_se_sugiere(db, operador):
+    # 'inactivo' no existe: cambiarlo por 'activo' devolveria las filas contrarias
+    sql = f"SELECT * FROM clientes WHERE estado {operador} 'inactivo'"
+    nuevo, correcciones, sugerencias = corregir_literales(db, sql)
+    assert nuevo == sql
+    assert correcciones == []
+    assert sugerencias == [("estado", "inactivo", "activo")]
+
+
+def test_valor_sin_parecido(db):
+    sql = "SELECT * FROM clientes WHERE estado = 'baja'"
+    assert corregir_literales(db, sql) == (sql, [], [])
+
+
+def test_indice_y_refresco_incremental(db):
+    estadisticas = EstadisticasBD(db)
+    assert estadisticas.refrescar()
+    assert ("clientes", "ciudad", "Sevilla") in estadisticas.buscar("clientes de sevilla")
+    assert "estado = 'activo' | 'pendiente'" in estadisticas.linea_valores("clientes", "clientes")
+    # Sin cambios en los datos no se recalcula nada
+    assert not estadisticas.refrescar()
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO clientes (nombre, estado, ciudad) VALUES ('Nuevo', 'baja', 'Cádiz')")
+    conn.commit()
+    conn.close()
+    assert estadisticas.refrescar()
+    assert "baja" in estadisticas.columnas[("clientes", "estado")]["valores"]
@@ -0,0 +1,69 @@
+import csv
+import io
+import sqlite3
+
+import pytest
+
+import exportar
+from exportar import exportar as exportar_formato
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, precio, nombre TEXT, dato)")
+    conn.executemany("INSERT INTO t (precio, nombre, dato) VALUES (?, ?, ?)",
+                     [(1, "a", b"\x00"), (2.5, None, "x"), (3, "c", 2 ** 60)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _leer_arrow(archivo):
+    return pa.ipc.open_file(pa.BufferReader(archivo.read())).read_all()
+
+
+def test_csv_pagina_a_pagina(db, monkeypatch):
+    monkeypatch.setattr(exportar, "TAM_LOTE", 2)
+    archivo = exportar_formato("csv", db, "SELECT id, nombre FROM t ORDER BY id")
+    filas = list(csv.reader(io.TextIOWrapper(archivo, encoding="utf-8", newline="")))
+    assert filas == [["id", "nombre"], ["1", "a"], ["2", ""], ["3", "c"]]
+
+
+def test_csv_vacio_lleva_cabecera(db):
+    archivo = exportar_formato("csv", db, "SELECT id, nombre FROM t WHERE id < 0")
+    assert archivo.read().decode("utf-8").splitlines() == ["id,nombre"]
+
+
+def test_arrow_tipos_de_todo_el_resultado(db, monkeypatch):
+    # El primer lote solo trae enteros en precio; el segundo trae un real
+    monkeypatch.setattr(exportar, "TAM_LOTE", 1)
+    tabla = _leer_arrow(exportar_formato("arrow", db, "SELECT * FROM t ORDER BY id;"))
+    assert [str(campo.type) for campo in tabla.schema] == ["int64", "double", "string", "string"]
+    assert tabla.column("precio").to_pylist() == [1.0, 2.5, 3.0]
+    assert tabla.column("dato").to_pylist() == ["b'\\x00'", "x", str(2 ** 60)]
+
+
+def test_enteros_grandes_no_pasan_a_real(db):
+    tabla = _leer_arrow(exportar_formato("arrow", db, "SELECT 0.5 AS a UNION ALL SELECT 9007199254740993"))
+    assert tabla.schema.field("a").type == pa.string()
+
+
+def test_arrow_vacio_lleva_esquema(db):
+    tabla = _leer_arrow(exportar_formato("arrow", db, "SELECT id, nombre FROM t WHERE id < 0"))
+    assert tabla.num_rows == 0 and tabla.column_names == ["id", "nombre"]
+
+
+def test_pragma_se_exporta_como_texto(db):
+    tabla = _leer_arrow(exportar_formato("arrow", db, "PRAGMA table_info(t)"))
+    assert set(str(campo.type) for campo in tabla.schema) == {"string"}
+    assert tabla.column("name").to_pylist() == ["id", "precio", "nombre", "dato"]
+
+
+def test_parquet(db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    tabla = pq.read_table(exportar_formato("parquet", db, "SELECT id, nombre FROM t ORDER BY id"))
+    assert tabla.to_pylist() == [{"id": 1, "nombre": "a"}, {"id": 2, "nombre": None}, {"id": 3, "nombre": "c"}]
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from generacion_sql import generar_sql_en_streaming, limpiar_sql, validar_sql
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT)")
+    yield conn
+    conn.close()
+
+
+def test_limpiar_sql_quita_markdown():
+    assert limpiar_sql("```sql\nSELECT * FROM clientes;\n```") == "SELECT * FROM clientes;"
+    assert limpiar_sql("  SELECT 1;  ") == "SELECT 1;"
+
+
+def test_validar_sql(conn):
+    assert validar_sql(conn, "SELECT nombre FROM clientes;") is None
+    assert "no such table" in validar_sql(conn, "SELECT * FROM pedidos;")
+    assert "syntax error" in validar_sql(conn, "SELEC * FROM clientes;")
+
+
+def test_validar_sql_no_ejecuta(conn):
+    assert validar_sql(conn, "DELETE FROM clientes;") is None
+    conn.execute("INSERT INTO clientes (nombre) VALUES ('Ana')")
+    validar_sql(conn, "DELETE FROM clientes;")
+    assert conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0] == 1
+
+
+def test_streaming_valido(conn):
+    eventos = list(generar_sql_en_streaming(iter(["SELECT nombre ", "FROM clientes;"]), conn))
+    assert [e["tipo"] for e in eventos] == ["parcial", "parcial", "final"]
+    assert eventos[-1] == {"tipo": "final", "sql": "SELECT nombre FROM clientes;", "error": None}
+
+
+def test_streaming_invalido_corta_el_stream(conn):
+    leidos = []
+
+    def fragmentos():
+        for f in ["SELECT * FROM pedidos;", " -- resto", " que no llega"]:
+            leidos.append(f)
+            yield f
+
+    eventos = list(generar_sql_en_streaming(fragmentos(), conn))
+    assert leidos == ["SELECT * FROM pedidos;"]
+    assert eventos[-1]["tipo"] == "final"
+    assert "no such table" in eventos[-1]["error"]
+
+
+def test_streaming_revalida_sentencias_posteriores(conn):
+    fragmentos = iter(["SELECT nombre FROM clientes;", " DELETE FROM clientes;"])
+    eventos = list(generar_sql_en_streaming(fragmentos, conn))
+    assert eventos[-1]["sql"] == "SELECT nombre FROM clientes; DELETE FROM clientes;"
+    assert eventos[-1]["error"]
+    assert conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0] == 0
+
+
+def test_streaming_admite_comentario_final(conn):
+    eventos = list(generar_sql_en_streaming(iter(["SELECT nombre FROM clientes;", " -- fin"]), conn))
+    assert eventos[-1]["error"] is None
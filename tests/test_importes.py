@@ -0,0 +1,34 @@
+import sys
+
+import pytest
+
+import importes
+
+
+def test_importar_anota_la_primera_importacion(monkeypatch):
+    monkeypatch.setattr(importes, "_tiempos", {})
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    modulo = importes.importar("colorsys")
+    assert importes.importar("colorsys") is modulo
+    assert list(importes.tiempos()) == ["colorsys"]
+
+
+def test_importar_modulo_inexistente():
+    with pytest.raises(ImportError):
+        importes.importar("modulo_que_no_existe")
+
+
+def test_precarga_una_sola_vez(monkeypatch):
+    monkeypatch.setattr(importes, "PRECARGA", True)
+    monkeypatch.setattr(importes, "_precargas", set())
+    avisos = []
+    hilo = importes.precargar(["json"], al_terminar=lambda: avisos.append(1))
+    hilo.join(5)
+    assert avisos == [1]
+    assert importes.precargar(["json"]) is None
+
+
+def test_precarga_desactivada(monkeypatch):
+    monkeypatch.setattr(importes, "PRECARGA", False)
+    monkeypatch.setattr(importes, "_precargas", set())
+    assert importes.precargar(["json"]) is None
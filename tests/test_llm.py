@@ -0,0 +1,28 @@
+from llm import BackendFalso, tomar_tokens
+
+SISTEMA = "Esquema:\nTabla: clientes\nColumnas: id, nombre, estado\nTabla: productos\nColumnas: id, nombre, precio\n"
+
+
+def _mensajes(pregunta):
+    return [{"role": "system", "content": SISTEMA}, {"role": "user", "content": pregunta}]
+
+
+def test_falso_respuesta_fija():
+    backend = BackendFalso({"hola": "SELECT 1;"})
+    assert backend.complete(_mensajes("hola"), "modelo") == "SELECT 1;"
+
+
+def test_falso_regla_por_tabla():
+    backend = BackendFalso()
+    assert backend.complete(_mensajes("dame los productos"), "modelo") == "SELECT * FROM productos LIMIT 10;"
+    assert backend.complete(_mensajes("algo sin tabla"), "modelo") == "SELECT name FROM sqlite_master WHERE type='table';"
+
+
+def test_falso_stream_igual_que_complete_y_cuenta_tokens():
+    backend = BackendFalso()
+    tomar_tokens()
+    completo = backend.complete(_mensajes("lista de clientes"), "modelo")
+    tokens_complete = tomar_tokens()
+    assert "".join(backend.stream(_mensajes("lista de clientes"), "modelo")) == completo
+    assert tomar_tokens() == tokens_complete > 0
+
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import llm
+import lote
+from lote import _completar_con_reintentos, _espera, errores_reintentables, leer_entrada
+
+
+class Transitorio(Exception):
+    pass
+
+
+class BackendInestable:
+    def __init__(self, fallos):
+        self.fallos = fallos
+
+    def complete(self, messages, modelo):
+        if self.fallos:
+            self.fallos -= 1
+            raise Transitorio()
+        return "SELECT 1;"
+
+
+@pytest.fixture
+def reintentables(monkeypatch):
+    monkeypatch.setattr(lote, "_errores", (Transitorio,))
+
+
+def test_leer_entrada_jsonl_y_csv(tmp_path):
+    jsonl = tmp_path / "preguntas.jsonl"
+    jsonl.write_text(json.dumps({"request_id": "r1", "title": "cuantos clientes hay"}) + "\n\n"
+                     + json.dumps({"audio": "a.wav"}) + "\n", encoding="utf-8")
+    assert leer_entrada(str(jsonl)) == [
+        {"id": "r1", "pregunta": "cuantos clientes hay", "audio": None},
+        {"id": 1, "pregunta": None, "audio": "a.wav"},
+    ]
+    csv = tmp_path / "preguntas.csv"
+    csv.write_text("id,pregunta\n7,lista de productos\n", encoding="utf-8")
+    assert leer_entrada(str(csv)) == [{"id": "7", "pregunta": "lista de productos", "audio": None}]
+
+
+def test_espera_respeta_retry_after():
+    class Respuesta:
+        headers = {"retry-after": "3"}
+
+    error = Transitorio()
+    error.response = Respuesta()
+    assert _espera(error, 5, 1.0) == 3.0
+    assert 1.0 <= _espera(Transitorio(), 2, 0.5) <= 3.0
+
+
+def test_reintenta_errores_transitorios(reintentables, monkeypatch):
+    monkeypatch.setattr(llm, "_backend", BackendInestable(2))
+    assert _completar_con_reintentos([], "modelo", reintentos=3, espera_base=0) == ("SELECT 1;", 3)
+
+
+def test_agota_los_reintentos(reintentables, monkeypatch):
+    monkeypatch.setattr(llm, "_backend", BackendInestable(5))
+    with pytest.raises(Transitorio):
+        _completar_con_reintentos([], "modelo", reintentos=2, espera_base=0)
+
+
+def test_errores_reintentables_sin_openai(monkeypatch):
+    def importar(nombre):
+        raise ImportError(nombre)
+    monkeypatch.setattr(lote, "_errores", None)
+    monkeypatch.setattr(lote, "importar", importar)
+    assert errores_reintentables() == ()
+    monkeypatch.setattr(llm, "_backend", BackendInestable(1))
+    with pytest.raises(Transitorio):
+        _completar_con_reintentos([], "modelo", reintentos=3, espera_base=0)
+
+
+def test_errores_reintentables_se_resuelven_una_vez(monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(lote, "_errores", None)
+    monkeypatch.setattr(lote, "importar", lambda nombre: llamadas.append(nombre) or pytest.importorskip(nombre))
+    assert errores_reintentables() is errores_reintentables()
+    assert llamadas == ["openai"]
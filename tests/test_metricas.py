@@ -0,0 +1,65 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import metricas
+
+
+@pytest.fixture(autouse=True)
+def base_metricas(tmp_path, monkeypatch):
+    monkeypatch.setattr(metricas, "METRICAS_PATH", str(tmp_path / "metricas.sqlite"))
+    monkeypatch.setattr(metricas, "_conn", None)
+    monkeypatch.setattr(metricas, "_ultima_purga", 0.0)
+
+
+def test_percentiles_por_rango_mas_cercano():
+    for segundos in range(1, 101):
+        metricas.registrar("p", "app", "whisper", float(segundos))
+    metricas.registrar("p", "app", "generar_sql", 2.0, tokens=30)
+    metricas.registrar("p", "app", "generar_sql", 4.0, tokens=12, error=True)
+    whisper, generar = sorted(metricas.resumen(), key=lambda f: f["etapa"], reverse=True)
+    assert (whisper["n"], whisper["p50"], whisper["p95"], whisper["p99"]) == (100, 50.0, 95.0, 99.0)
+    assert whisper["total_segundos"] == 5050.0
+    assert (generar["p50"], generar["p99"], generar["tokens"], generar["errores"]) == (2.0, 4.0, 42, 1)
+
+
+def test_medir_registra_extras_y_errores():
+    peticion = metricas.nueva_peticion()
+    with metricas.medir(peticion, "main", "ejecutar_sql") as extras:
+        extras["filas"] = 7
+    with pytest.raises(ValueError):
+        with metricas.medir(peticion, "main", "ejecutar_sql"):
+            raise ValueError()
+    [fila] = metricas.resumen()
+    assert (fila["n"], fila["filas"], fila["errores"], fila["tokens"]) == (2, 7, 1, 0)
+
+
+def test_ventana_y_retencion(monkeypatch):
+    ahora = time.time()
+
+    def en(segundos):
+        monkeypatch.setattr(metricas, "time", SimpleNamespace(time=lambda: segundos, perf_counter=time.perf_counter))
+    monkeypatch.setattr(metricas, "_ultima_purga", ahora)
+    en(ahora - 10 * 86400)
+    metricas.registrar("p", "lote", "total", 1.0)
+    en(ahora - 120)
+    metricas.registrar("p", "lote", "total", 2.0)
+    en(ahora)
+    assert metricas.resumen()[0]["n"] == 2
+    assert metricas.resumen(ventana=60) == []
+    assert metricas.resumen(ventana=300)[0]["n"] == 1
+    # Pasado el intervalo de purga se borran las metricas fuera de la retencion
+    en(ahora + metricas.INTERVALO_PURGA)
+    metricas.registrar("p", "lote", "total", 3.0)
+    assert metricas.resumen()[0]["n"] == 2
+    assert metricas.resumen()[0]["total_segundos"] == 5.0
+
+
+def test_exportar_prometheus():
+    metricas.registrar("p", "app", "whisper", 0.5, bytes=100)
+    texto = metricas.exportar_prometheus()
+    assert 'voicetosql_etapa_segundos{origen="app",etapa="whisper",quantile="0.95"} 0.500000' in texto
+    assert 'voicetosql_etapa_segundos_count{origen="app",etapa="whisper"} 1' in texto
+    assert "# TYPE voicetosql_bytes_total counter\nvoicetosql_bytes_total{origen=\"app\",etapa=\"whisper\"} 100" in texto
+    assert texto.endswith("\n")
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import plan_consulta
+from plan_consulta import crear_copia_indexada, recomendar_indices, revisar
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_consulta, "PLANES_PATH", str(tmp_path / "planes.sqlite"))
+    monkeypatch.setattr(plan_consulta, "_conn_planes", None)
+    monkeypatch.setattr(plan_consulta, "FILAS_TABLA_GRANDE", 1000)
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE v (id INTEGER PRIMARY KEY, k TEXT, x INTEGER, y TEXT)")
+    conn.execute("CREATE TABLE w (id INTEGER PRIMARY KEY, v_id INTEGER)")
+    # El tamano se estima con MAX(rowid): basta una fila con rowid alto
+    conn.executemany("INSERT INTO v VALUES (?, 'a', 1, 'y')", [(1,), (10_000,)])
+    conn.executemany("INSERT INTO w VALUES (?, 1)", [(1,), (10_000,)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_busqueda_por_clave_primaria_es_barata(db):
+    revision = revisar(db, "SELECT k FROM v WHERE id = 5", registrar=False)
+    assert revision["escaneos"] == [] and revision["avisos"] == []
+    assert revision["coste"] < 20
+
+
+def test_escaneo_de_tabla_grande_avisa(db):
+    revision = revisar(db, "SELECT * FROM v WHERE k = 'a'", registrar=False)
+    assert revision["escaneos"] == [{"tabla": "v", "filas": 10_000, "veces": 1}]
+    assert revision["avisos"] == ["Recorre entera la tabla v (10,000 filas)"]
+
+
+def test_subconsulta_correlacionada_rechazada_por_coste(db):
+    sql = "SELECT * FROM v WHERE x > (SELECT COUNT(*) FROM w WHERE w.v_id + 0 = v.x)"
+    with pytest.raises(ValueError, match="Consulta rechazada"):
+        revisar(db, sql, coste_maximo=1e6, registrar=False)
+    revision = revisar(db, sql, coste_maximo=1e9, registrar=False)
+    assert revision["coste"] > 1e6
+    assert "Recorre entera la tabla w (10,000 filas) unas 10,000 veces" in revision["avisos"]
+
+
+def test_recomienda_indice_de_cobertura_sin_el_rowid(db):
+    for _ in range(3):
+        revisar(db, "SELECT id, x FROM v WHERE k = 'b'")
+    [recomendacion] = recomendar_indices(db)
+    assert recomendacion["columnas"] == ["k", "x"]
+    assert recomendacion["cobertura"] and recomendacion["usos"] == 3
+    assert recomendacion["sql"] == 'CREATE INDEX IF NOT EXISTS "idx_vts_v_k" ON "v" ("k", "x")'
+
+
+def test_recomendacion_con_pocos_usos_o_ya_indexada(db):
+    revisar(db, "SELECT x FROM v WHERE k = 'b'")
+    revisar(db, "SELECT k FROM v WHERE id = 3")
+    revisar(db, "SELECT k FROM v WHERE id = 3")
+    revisar(db, "SELECT k FROM v WHERE id = 3")
+    assert recomendar_indices(db) == []
+    assert len(recomendar_indices(db, min_usos=1)) == 1
+
+
+def test_crear_copia_indexada(db, tmp_path):
+    for _ in range(3):
+        revisar(db, "SELECT x FROM v WHERE k = 'b'")
+    destino = crear_copia_indexada(db, recomendar_indices(db), str(tmp_path / "copia.sqlite"))
+    conn = sqlite3.connect(destino)
+    assert [fila[1] for fila in conn.execute("PRAGMA index_list(v)")] == ["idx_vts_v_k"]
+    conn.close()
+    original = sqlite3.connect(db)
+    assert original.execute("PRAGMA index_list(v)").fetchall() == []
+    original.close()
@@ -0,0 +1,72 @@
+import pytest
+
+from plantillas_sql import generar
+
+TABLAS = {
+    "clientes": ["id", "nombre", "email", "edad", "estado"],
+    "productos": ["id", "nombre", "precio"],
+    "pedidos": ["id", "cliente_id", "fecha"],
+    "detalle_pedido": ["id", "pedido_id", "producto_id", "cantidad"],
+}
+
+
+@pytest.mark.parametrize("pregunta", [
+    "Clientes cuyo estado no es activo",
+    "Productos con precio distinto de 10",
+    "Productos con precio diferente de 10",
+    "Clientes sin email",
+    "Todos los clientes excepto los inactivos",
+    "Clientes salvo los de estado activo",
+    "Todos los productos menos los caros",
+    # Disyunciones: con AND la consulta no devolveria nada
+    "Clientes menores de 18 años o mayores de 65",
+    "Productos con precio menor que 5 u otros",
+])
+def test_negaciones_sin_plantilla(pregunta):
+    assert generar(pregunta, TABLAS) == (None, 0.0)
+
+
+@pytest.mark.parametrize("pregunta, sql", [
+    ("Productos con precio menos de 10", "SELECT * FROM productos WHERE precio < 10;"),
+    ("Productos con precio menor que 10", "SELECT * FROM productos WHERE precio < 10;"),
+    ("Clientes cuyo estado es activo", "SELECT * FROM clientes WHERE estado = 'activo';"),
+    ("¿Cuántos clientes hay?", "SELECT COUNT(*) FROM clientes;"),
+    ("Los 5 productos más caros", "SELECT * FROM productos ORDER BY precio DESC LIMIT 5;"),
+    ("Clientes mayores de 30 años", "SELECT * FROM clientes WHERE edad > 30;"),
+    ("Detalle de pedidos", "SELECT * FROM detalle_pedido;"),
+])
+def test_plantillas(pregunta, sql):
+    generado, confianza = generar(pregunta, TABLAS)
+    assert generado == sql
+    assert confianza == 1.0
+
+
+@pytest.mark.parametrize("pregunta", [
+    # "estado activo" es una condicion sin reconocer, no una columna a mostrar
+    "Clientes con la edad mayor que 30 y estado activo",
+    # Agregado sin columna
+    "Máximo de clientes",
+    "Clientes con edad mayor 30",
+])
+def test_fragmentos_sin_usar_sin_plantilla(pregunta):
+    assert generar(pregunta, TABLAS) == (None, 0.0)
+
+
+def test_agregado_con_del_y_grupo():
+    sql, confianza = generar("Suma del precio de productos por nombre", TABLAS)
+    assert sql == "SELECT nombre, SUM(precio) FROM productos GROUP BY nombre;"
+    assert confianza == 1.0
+
+
+def test_proyeccion_con_filtro():
+    assert generar("Nombre de clientes mayores de 30", TABLAS) == (
+        "SELECT nombre FROM clientes WHERE edad > 30;", 1.0)
+
+
+def test_valor_con_mayusculas_originales():
+    sql, _ = generar("Clientes con nombre 'Ana Pérez'", TABLAS)
+    assert sql == "SELECT * FROM clientes WHERE nombre = 'Ana Pérez';"
+
+
+def test_varias_tablas_fuera_de_alcance():
+    assert generar("clientes y sus pedidos", TABLAS) == (None, 0.0)
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+import resultados
+from conexiones import cancelable
+from resultados import iterar_paginas, leer_pagina, leer_resultado, sin_punto_y_coma
+
+LARGA = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT i FROM n"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, texto TEXT)")
+    conn.executemany("INSERT INTO t (texto) VALUES (?)", [("x" * 10,) for _ in range(25)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_sin_punto_y_coma():
+    assert sin_punto_y_coma("  SELECT 1 ;  ") == "SELECT 1"
+
+
+def test_iterar_paginas(db):
+    paginas = list(iterar_paginas(db, "SELECT id FROM t", tam_pagina=10))
+    assert [len(filas) for _, filas in paginas] == [10, 10, 5]
+    assert paginas[0][0] == ["id"]
+
+
+def test_resultado_vacio_conserva_columnas(db):
+    assert list(iterar_paginas(db, "SELECT id, texto FROM t WHERE id < 0")) == [(["id", "texto"], [])]
+    resultado = leer_resultado(db, "SELECT id, texto FROM t WHERE id < 0")
+    assert (resultado.columnas, resultado.filas, resultado.truncado) == (["id", "texto"], [], False)
+
+
+def test_leer_resultado_completo(db):
+    resultado = leer_resultado(db, "SELECT id, texto FROM t")
+    assert (len(resultado), resultado.truncado, resultado.bytes_leidos) == (25, False, 25 * 18)
+
+
+def test_truncado_por_filas(db):
+    resultado = leer_resultado(db, "SELECT id FROM t", max_filas=7)
+    assert (len(resultado), resultado.truncado) == (7, True)
+
+
+def test_truncado_por_bytes(db):
+    resultado = leer_resultado(db, "SELECT id, texto FROM t", max_bytes=50)
+    assert (len(resultado), resultado.truncado) == (3, True)
+
+
+def test_truncado_en_consulta_infinita(db):
+    resultado = leer_resultado(db, LARGA, max_filas=5)
+    assert resultado.filas == [(1,), (2,), (3,), (4,), (5,)]
+    assert resultado.truncado
+
+
+def test_leer_pagina(db):
+    assert leer_pagina(db, "SELECT id FROM t ORDER BY id;", 2, tam_pagina=10).filas == [(i,) for i in range(21, 26)]
+    assert leer_pagina(db, "SELECT id FROM t ORDER BY id", 3, tam_pagina=10).filas == []
+
+
+def test_leer_pagina_pragma_por_cursor(db):
+    pagina = leer_pagina(db, "PRAGMA table_info(t)", 1, tam_pagina=1)
+    assert pagina.columnas[1] == "name"
+    assert [fila[1] for fila in pagina.filas] == ["texto"]
+
+
+def test_leer_pagina_cancelada_no_repite_la_consulta(db, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(resultados, "iterar_paginas", lambda *a, **k: llamadas.append(a) or iter(()))
+    evento = threading.Event()
+    evento.set()
+    with cancelable(evento), pytest.raises(CancelledError):
+        leer_pagina(db, LARGA + " WHERE i < 0", 0)
+    assert llamadas == []
+
+
+def test_leer_pagina_timeout(db):
+    with pytest.raises(TimeoutError):
+        leer_pagina(db, LARGA + " WHERE i < 0", 0, timeout=0.05)
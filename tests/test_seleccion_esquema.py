@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from seleccion_esquema import get_indice, seleccionar_esquema, tokenizar
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "tienda.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT, ciudad TEXT);
+        CREATE TABLE pedidos (id INTEGER PRIMARY KEY, cliente_id INTEGER REFERENCES clientes (id), fecha TEXT);
+        CREATE TABLE productos (id INTEGER PRIMARY KEY, nombre TEXT, precio REAL);
+        CREATE TABLE empleados (id INTEGER PRIMARY KEY, nombre TEXT, puesto TEXT);
+        CREATE TABLE proveedores (id INTEGER PRIMARY KEY, nombre TEXT, pais TEXT);
+        CREATE TABLE almacenes (id INTEGER PRIMARY KEY, direccion TEXT);
+        INSERT INTO almacenes (direccion) VALUES ('Poligono Norte');
+    """)
+    conn.close()
+    return path
+
+
+def test_tokenizar():
+    assert tokenizar("detalleDePedidos top 10 CLIENTES_activos") == ["detalle", "de", "pedido", "top", "client", "activo"]
+    assert tokenizar("Almacén") == ["almacen"]
+
+
+def test_selecciona_tablas_y_vecinas_por_clave_foranea(db):
+    texto, estadisticas = seleccionar_esquema(db, "fecha de los pedidos", k=1)
+    assert texto == ("Tabla: clientes\nColumnas: id, nombre, ciudad\n"
+                     "Tabla: pedidos\nColumnas: id, cliente_id, fecha\n")
+    assert (estadisticas["tablas_total"], estadisticas["tablas_seleccionadas"]) == (6, 2)
+    assert 0 < estadisticas["reduccion"] < 1
+
+
+def test_vecinas_en_sentido_inverso(db):
+    texto, _ = seleccionar_esquema(db, "ciudad de cada cliente", k=1)
+    assert "Tabla: clientes\n" in texto and "Tabla: pedidos\n" in texto
+
+
+def test_sin_coincidencias_envia_todo(db):
+    _, estadisticas = seleccionar_esquema(db, "hola", k=1)
+    assert estadisticas["tablas_seleccionadas"] == 6
+
+
+def test_pocas_tablas_no_se_filtran(db):
+    _, estadisticas = seleccionar_esquema(db, "precio de productos", k=10)
+    assert estadisticas["tablas_seleccionadas"] == 6
+
+
+def test_indice_con_muestras_y_reutilizado(db):
+    assert get_indice(db) is get_indice(db)
+    texto, _ = seleccionar_esquema(db, "lo que hay en poligono norte", k=1, muestras=True)
+    assert texto == "Tabla: almacenes\nColumnas: id, direccion\n"
@@ -0,0 +1,72 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import streaming_voz
+from streaming_voz import FRAME_BYTES, FRAME_MUESTRAS, DetectorVoz, FuentePCM, transcribir_en_streaming
+
+
+def _frames(amplitud, n):
+    return np.full(FRAME_MUESTRAS * n, amplitud, dtype=np.int16).tobytes()
+
+
+@pytest.fixture
+def segmentos(monkeypatch):
+    # Transcripcion falsa: cada segmento devuelve su duracion en frames
+    enviados = []
+
+    def submit(modelo, audio, initial_prompt=None):
+        enviados.append((len(audio) // FRAME_MUESTRAS, initial_prompt))
+        futuro = Future()
+        futuro.set_result({"text": f" {len(audio) // FRAME_MUESTRAS} "})
+        return futuro
+    monkeypatch.setattr(streaming_voz.modelos_audio, "submit", submit)
+    return enviados
+
+
+def test_fuente_pcm_descarta_el_frame_incompleto():
+    frames = list(FuentePCM(_frames(1, 3) + b"\x00\x00").frames())
+    assert [len(f) for f in frames] == [FRAME_BYTES] * 3
+
+
+def test_detector_calibra_con_silencio():
+    detector = DetectorVoz(frames_calibracion=3)
+    assert [detector.es_voz(_frames(100, 1)) for _ in range(3)] == [False] * 3
+    assert detector.piso == 100
+    assert detector.es_voz(_frames(400, 1))
+    assert not detector.es_voz(_frames(250, 1))
+
+
+def test_detector_no_calibra_con_voz_inicial():
+    detector = DetectorVoz(frames_calibracion=2)
+    assert detector.es_voz(_frames(5000, 1))
+    assert detector.piso is None
+
+
+def test_detector_piso_acotado():
+    detector = DetectorVoz(frames_calibracion=2, umbral_minimo=1000, piso_maximo=600)
+    detector.es_voz(_frames(800, 1))
+    detector.es_voz(_frames(800, 1))
+    assert detector.piso == 600
+    for _ in range(50):
+        detector.es_voz(_frames(2000, 1))
+    assert detector.piso == 600
+
+
+def test_segmenta_en_pausas_y_termina_en_silencio(segmentos):
+    pcm = _frames(50, 10) + _frames(5000, 20) + _frames(50, 12) + _frames(5000, 5) + _frames(50, 40)
+    eventos = list(transcribir_en_streaming(FuentePCM(pcm), pausa_ms=300, fin_ms=600))
+    # Cada segmento se corta tras 10 frames de pausa; el silencio final no se envia
+    assert segmentos == [(30, None), (17, "30")]
+    assert [e["tipo"] for e in eventos] == ["parcial", "parcial", "final"]
+    assert eventos[-1]["texto"] == "30 17"
+    assert eventos[-1]["ttft"] is not None
+
+
+def test_sin_voz_no_transcribe(segmentos):
+    eventos = list(transcribir_en_streaming(FuentePCM(_frames(50, 200)), espera_voz_s=1))
+    assert segmentos == []
+    assert eventos == [{"tipo": "final", "texto": "", "ttft": None,
+                        "fin_habla": eventos[0]["fin_habla"],
+                        "latencia_transcripcion": eventos[0]["latencia_transcripcion"]}]
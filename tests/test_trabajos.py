@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import trabajos
+from resultados import leer_resultado
+
+
+def _esperar(trabajo):
+    trabajo.future.result(timeout=5)
+    return trabajo
+
+
+def test_resultado_y_progreso():
+    def sumar(trabajo, a, b=0):
+        trabajo.actualizar(paso="suma")
+        return a + b
+    trabajo = _esperar(trabajos.lanzar("prueba", "clave", sumar, 2, b=3))
+    assert (trabajo.estado, trabajo.resultado, trabajo.progreso()) == ("terminado", 5, {"paso": "suma"})
+    assert trabajos.get(trabajo.id) is trabajo
+    assert trabajos.get(None) is None and not trabajo.activo()
+
+
+def test_error():
+    def fallar(trabajo):
+        raise ValueError("sin datos")
+    trabajo = _esperar(trabajos.lanzar("prueba", None, fallar))
+    assert (trabajo.estado, trabajo.error) == ("error", "sin datos")
+
+
+def test_cancelar_corta_el_iterable():
+    empezado = threading.Event()
+    leidos = []
+
+    def infinito():
+        n = 0
+        while True:
+            n += 1
+            yield n
+
+    def consumir(trabajo):
+        for n in trabajo.iterar(infinito()):
+            leidos.append(n)
+            empezado.set()
+            time.sleep(0.01)
+    trabajo = trabajos.lanzar("prueba", None, consumir)
+    assert empezado.wait(5)
+    trabajos.cancelar(trabajo.id)
+    assert _esperar(trabajo).estado == "cancelado"
+    assert 0 < len(leidos) < 1000
+
+
+def test_cancelar_interrumpe_la_consulta(tmp_path):
+    db = str(tmp_path / "datos.sqlite")
+    sqlite3.connect(db).close()
+    infinita = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    trabajo = trabajos.lanzar("prueba", None, lambda trabajo: leer_resultado(db, infinita, timeout=30))
+    while trabajo.estado == "pendiente":
+        time.sleep(0.01)
+    time.sleep(0.05)
+    trabajos.cancelar(trabajo.id)
+    assert _esperar(trabajo).estado == "cancelado"
+
+
+def test_esperar_otro_trabajo_atiende_la_cancelacion():
+    bloqueo = threading.Event()
+    otro = trabajos.lanzar("prueba", None, lambda trabajo: bloqueo.wait(5))
+    trabajo = trabajos.lanzar("prueba", None, lambda trabajo: trabajo.esperar(otro, intervalo=0.01))
+    time.sleep(0.05)
+    trabajos.cancelar(trabajo.id)
+    assert _esperar(trabajo).estado == "cancelado"
+    bloqueo.set()
+    assert _esperar(otro).estado == "terminado"
+
+
+def test_purga_los_terminados():
+    viejo = _esperar(trabajos.lanzar("prueba", None, lambda trabajo: 1))
+    viejo.terminado -= trabajos.TTL_SEGUNDOS + 1
+    nuevo = _esperar(trabajos.lanzar("prueba", None, lambda trabajo: 2))
+    assert trabajos.get(viejo.id) is None
+    assert trabajos.get(nuevo.id) is nuevo
+    assert trabajos.stats().get("terminado", 0) >= 1
+
+
+@pytest.mark.parametrize("id_trabajo", [None, "no-existe"])
+def test_cancelar_desconocido(id_trabajo):
+    trabajos.cancelar(id_trabajo)
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+pytest.importorskip("whisper")
+
+from transcripcion_lote import _cerrar_ultima_linea, buscar_audios, leer_checkpoint
+
+
+def test_buscar_audios(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for nombre in ("b.wav", "sub/a.MP3", "notas.txt"):
+        (tmp_path / nombre).write_bytes(b"")
+    assert buscar_audios(str(tmp_path)) == [str(tmp_path / "b.wav"), str(tmp_path / "sub" / "a.MP3")]
+
+
+def test_checkpoint_con_linea_cortada(tmp_path):
+    salida = tmp_path / "salida.jsonl"
+    salida.write_text(json.dumps({"audio": "a.wav", "texto": "hola"}) + '\n{"audio": "b.w', encoding="utf-8")
+    assert leer_checkpoint(str(salida)) == {"a.wav"}
+    _cerrar_ultima_linea(str(salida))
+    with open(salida, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"audio": "b.wav", "texto": "adios"}) + "\n")
+    assert leer_checkpoint(str(salida)) == {"a.wav", "b.wav"}
+
+
+def test_cerrar_ultima_linea_no_toca_un_archivo_completo(tmp_path):
+    salida = tmp_path / "salida.jsonl"
+    _cerrar_ultima_linea(str(salida))
+    assert not salida.exists()
+    salida.write_text('{"audio": "a.wav"}\n', encoding="utf-8")
+    _cerrar_ultima_linea(str(salida))
+    assert salida.read_text(encoding="utf-8") == '{"audio": "a.wav"}\n'
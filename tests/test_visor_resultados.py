@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from visor_resultados import agrupar, consulta_vista, contar, histograma, leer_ventana, resumen
+
+SQL = "SELECT nombre, edad, ciudad FROM clientes;"
+COLUMNAS = ["nombre", "edad", "ciudad"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "datos.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre TEXT, edad, ciudad TEXT)")
+    conn.executemany("INSERT INTO clientes (nombre, edad, ciudad) VALUES (?, ?, ?)", [
+        ("Ana", 30, "Madrid"), ("Luis", 45, "Sevilla"), ("O'Neil", None, "Madrid"),
+        ("Marta", 22, "Madrid"), ("Pedro", "desconocida", None),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_filtros_y_ventana(db):
+    vista = consulta_vista(SQL, COLUMNAS, [("ciudad", "=", "Madrid"), ("nombre", "contiene", "a")])
+    assert contar(db, vista) == 2
+    filas = leer_ventana(db, vista, 0, 10, orden="edad", descendente=True).filas
+    assert filas == [("Ana", 30, "Madrid"), ("Marta", 22, "Madrid")]
+
+
+def test_literales_escapados_y_numericos(db):
+    assert contar(db, consulta_vista(SQL, COLUMNAS, [("nombre", "=", "O'Neil")])) == 1
+    assert contar(db, consulta_vista(SQL, COLUMNAS, [("edad", ">=", "30")])) == 3
+
+
+def test_filtro_no_valido(db):
+    with pytest.raises(ValueError):
+        consulta_vista(SQL, COLUMNAS, [("precio", "=", "1")])
+    with pytest.raises(ValueError):
+        consulta_vista(SQL, COLUMNAS, [("edad", "; DROP", "1")])
+
+
+def test_paginas(db):
+    vista = consulta_vista(SQL, COLUMNAS)
+    assert [f[0] for f in leer_ventana(db, vista, 1, 2, orden="nombre").filas] == ["Marta", "O'Neil"]
+    assert leer_ventana(db, vista, 5, 2).filas == []
+
+
+def test_resumen(db):
+    filas = {fila[0]: fila[1:] for fila in resumen(db, consulta_vista(SQL, COLUMNAS), COLUMNAS).filas}
+    assert filas["edad"] == (4, 1, "22", "desconocida", pytest.approx(97 / 3))
+    assert filas["ciudad"] == (4, 1, "Madrid", "Sevilla", None)
+
+
+def test_agrupar(db):
+    vista = consulta_vista(SQL, COLUMNAS)
+    assert agrupar(db, vista, "ciudad").filas[0] == ("Madrid", 3)
+    numericas = consulta_vista(SQL, COLUMNAS, [("edad", "<", "100")])
+    assert agrupar(db, numericas, "ciudad", "edad", "MAX", max_grupos=1).filas == [("Sevilla", 45)]
+    with pytest.raises(ValueError):
+        agrupar(db, vista, "ciudad", "edad", "DROP")
+
+
+def test_histograma(db):
+    vista = consulta_vista(SQL, COLUMNAS, [("edad", "<", "100")])
+    resultado = histograma(db, vista, "edad", bins=2)
+    assert resultado.columnas == ["edad", "filas"]
+    assert resultado.filas == [("22 - 33.5", 2), ("33.5 - 45", 1)]
+    with pytest.raises(ValueError):
+        histograma(db, vista, "nombre")
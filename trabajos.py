@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait
+
+from conexiones import cancelable
+
+# Trabajos en segundo plano a nivel de proceso (p.ej. el pipeline de una
+# consulta o la precarga del SQL). La interfaz guarda solo el id del trabajo y
+# consulta su progreso por sondeo. La cancelacion es cooperativa: el trabajo
+# comprueba su evento entre pasos y las consultas SQLite en curso se
+# interrumpen desde el progress handler de la conexion.
+WORKERS = int(os.getenv("VOICETOSQL_TRABAJOS_WORKERS", "4"))
+# Los trabajos terminados se olvidan pasado este tiempo
+TTL_SEGUNDOS = 600
+
+_lock = threading.Lock()
+_trabajos = {}
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="trabajo")
+
+
+class Trabajo:
+    def __init__(self, tipo, clave):
+        self.id = uuid.uuid4().hex[:12]
+        self.tipo = tipo
+        # Lo que identifica el trabajo para reutilizarlo (p.ej. el texto de la pregunta)
+        self.clave = clave
+        self.estado = "pendiente"
+        self.resultado = None
+        self.error = None
+        self.cancelado = threading.Event()
+        self.creado = time.time()
+        self.terminado = None
+        self.future = None
+        self._progreso = {}
+        self._lock = threading.Lock()
+
+    def activo(self):
+        return self.estado in ("pendiente", "en_curso")
+
+    def actualizar(self, **cambios):
+        with self._lock:
+            self._progreso.update(cambios)
+
+    def progreso(self):
+        with self._lock:
+            return dict(self._progreso)
+
+    # Lanza CancelledError si se pidio cancelar el trabajo
+    def comprobar(self):
+        if self.cancelado.is_set():
+            raise CancelledError("Trabajo cancelado")
+
+    # Recorre un iterable (p.ej. el stream del LLM) cortandolo si se cancela
+    def iterar(self, iterable):
+        try:
+            for elemento in iterable:
+                self.comprobar()
+                yield elemento
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    # Espera a que termine otro trabajo sin dejar de atender la cancelacion propia
+    def esperar(self, otro, intervalo=0.1):
+        while not wait([otro.future], timeout=intervalo).done:
+            self.comprobar()
+
+
+def _ejecutar(trabajo, funcion, args, kwargs):
+    trabajo.estado = "en_curso"
+    try:
+        with cancelable(trabajo.cancelado):
+            trabajo.comprobar()
+            trabajo.resultado = funcion(trabajo, *args, **kwargs)
+        trabajo.estado = "terminado"
+    except CancelledError:
+        trabajo.estado = "cancelado"
+    except Exception as e:
+        trabajo.error = str(e)
+        trabajo.estado = "error"
+    finally:
+        trabajo.terminado = time.time()
+
+
+def _purgar():
+    limite = time.time() - TTL_SEGUNDOS
+    for id_, trabajo in list(_trabajos.items()):
+        if trabajo.terminado is not None and trabajo.terminado < limite:
+            del _trabajos[id_]
+
+
+# Encola funcion(trabajo, *args, **kwargs) y devuelve el Trabajo
+def lanzar(tipo, clave, funcion, *args, **kwargs):
+    trabajo = Trabajo(tipo, clave)
+    with _lock:
+        _purgar()
+        _trabajos[trabajo.id] = trabajo
+    trabajo.future = _executor.submit(_ejecutar, trabajo, funcion, args, kwargs)
+    return trabajo
+
+
+def get(id_trabajo):
+    if id_trabajo is None:
+        return None
+    with _lock:
+        return _trabajos.get(id_trabajo)
+
+
+def cancelar(id_trabajo):
+    trabajo = get(id_trabajo)
+    if trabajo is None:
+        return
+    trabajo.cancelado.set()
+    # Si aun no habia empezado se quita de la cola directamente
+    if trabajo.future.cancel():
+        trabajo.estado = "cancelado"
+        trabajo.terminado = time.time()
+
+
+# Numero de trabajos conocidos por estado
+def stats():
+    with _lock:
+        estados = {}
+        for trabajo in _trabajos.values():
+            estados[trabajo.estado] = estados.get(trabajo.estado, 0) + 1
+        return estados
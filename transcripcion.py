@@ -0,0 +1,23 @@
+import numpy as np
+
+import modelos_audio
+
+# Whisper trabaja con audio mono float32 a 16 kHz
+SAMPLE_RATE = 16000
+
+
+# Convierte PCM de 16 bits (bytes) a un array float32 normalizado en [-1, 1]
+def pcm16_a_numpy(pcm):
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# Convierte un sr.AudioData a float32 a 16 kHz sin pasar por disco ni ffmpeg
+def audio_a_numpy(audio):
+    pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+    return pcm16_a_numpy(pcm)
+
+
+# Transcribe un sr.AudioData directamente desde memoria
+def transcribir_audio(audio, modelo="tiny", **kwargs):
+    result = modelos_audio.transcribe(modelo, audio_a_numpy(audio), **kwargs)
+    return result['text'].strip()
@@ -0,0 +1,134 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+import whisper
+
+import modelos_audio
+
+# Transcripcion masiva de directorios de audio. La decodificacion (ffmpeg) y
+# el espectrograma log-mel se calculan en un pool de procesos; los mel se
+# rellenan a 30 s y se pasan al modelo por lotes con whisper.decode. Los
+# audios de mas de 30 s se transcriben uno a uno con transcribe().
+# La salida es un JSONL que hace de checkpoint: al relanzar se saltan los
+# archivos ya transcritos.
+EXTENSIONES = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm")
+
+
+def buscar_audios(directorio):
+    audios = []
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            if nombre.lower().endswith(EXTENSIONES):
+                audios.append(os.path.join(raiz, nombre))
+    return sorted(audios)
+
+
+def leer_checkpoint(salida):
+    hechos = set()
+    if os.path.exists(salida):
+        with open(salida, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    hechos.add(json.loads(linea)["audio"])
+                except (ValueError, KeyError):
+                    # Linea cortada por una interrupcion: se vuelve a procesar
+                    continue
+    return hechos
+
+
+# Si la ultima linea quedo cortada, se cierra antes de seguir anadiendo
+def _cerrar_ultima_linea(salida):
+    if os.path.exists(salida) and os.path.getsize(salida):
+        with open(salida, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+# Se ejecuta en los procesos del pool: decodifica y calcula el log-mel
+def _decodificar(path, n_mels):
+    torch.set_num_threads(1)
+    audio = whisper.load_audio(path)
+    duracion = len(audio) / whisper.audio.SAMPLE_RATE
+    if len(audio) > whisper.audio.N_SAMPLES:
+        return path, duracion, None, audio
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels)
+    return path, duracion, mel.numpy(), None
+
+
+# Decodifica en ventanas para no acumular en memoria los mel de todo el directorio
+def _decodificar_en_ventanas(pool, pendientes, n_mels, ventana):
+    for inicio in range(0, len(pendientes), ventana):
+        trozo = pendientes[inicio:inicio + ventana]
+        yield from pool.map(_decodificar, trozo, [n_mels] * len(trozo), chunksize=4)
+
+
+def _transcribir_lote(modelo, lote, opciones):
+    mels = torch.from_numpy(np.stack([mel for _, _, mel, _ in lote])).to(modelo.device)
+    resultados = whisper.decode(modelo, mels, opciones)
+    return [(path, duracion, r.text.strip()) for (path, duracion, _, _), r in zip(lote, resultados)]
+
+
+def transcribir_directorio(directorio, salida, modelo_nombre="tiny", tam_lote=16, procesos=None, idioma=None):
+    modelo = modelos_audio.get_model(modelo_nombre)
+    fp16 = torch.cuda.is_available()
+    opciones = whisper.DecodingOptions(language=idioma, without_timestamps=True, fp16=fp16)
+
+    hechos = leer_checkpoint(salida)
+    _cerrar_ultima_linea(salida)
+    pendientes = [path for path in buscar_audios(directorio) if path not in hechos]
+    print(f"{len(pendientes)} audios pendientes ({len(hechos)} ya transcritos)")
+
+    inicio = time.perf_counter()
+    segundos_audio = 0.0
+    lote = []
+    # spawn: los procesos no heredan por fork el modelo ni el estado de torch/CUDA
+    contexto = multiprocessing.get_context("spawn")
+    with open(salida, "a", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        def escribir(path, duracion, texto):
+            nonlocal segundos_audio
+            segundos_audio += duracion
+            f.write(json.dumps({"audio": path, "duracion": duracion, "texto": texto}, ensure_ascii=False) + "\n")
+            f.flush()
+
+        decodificados = _decodificar_en_ventanas(pool, pendientes, modelo.dims.n_mels, tam_lote * 8)
+        for n, (path, duracion, mel, audio_largo) in enumerate(decodificados, 1):
+            if audio_largo is not None:
+                texto = modelos_audio.transcribe(modelo_nombre, audio_largo, fp16=fp16, language=idioma)["text"].strip()
+                escribir(path, duracion, texto)
+            else:
+                lote.append((path, duracion, mel, None))
+                if len(lote) >= tam_lote:
+                    for resultado in _transcribir_lote(modelo, lote, opciones):
+                        escribir(*resultado)
+                    lote = []
+            print(f"\r[{n}/{len(pendientes)}]", end="", flush=True)
+        if lote:
+            for resultado in _transcribir_lote(modelo, lote, opciones):
+                escribir(*resultado)
+    print()
+
+    segundos = time.perf_counter() - inicio
+    rendimiento = segundos_audio / segundos if segundos else 0.0
+    print(f"{segundos_audio:.0f} s de audio en {segundos:.1f} s: {rendimiento:.1f} s de audio por segundo")
+    return {"audios": len(pendientes), "segundos_audio": segundos_audio,
+            "segundos": segundos, "rendimiento": rendimiento}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directorio", help="Directorio con archivos de audio")
+    parser.add_argument("--salida", default="transcripciones.jsonl", help="JSONL de salida (y checkpoint)")
+    parser.add_argument("--model", default="tiny", choices=modelos_audio.MODELOS)
+    parser.add_argument("--lote", default=16, type=int, help="Audios por lote en el modelo")
+    parser.add_argument("--procesos", default=None, type=int, help="Procesos para decodificar audio")
+    parser.add_argument("--idioma", default=None, help="Idioma (p.ej. es); por defecto se detecta")
+    args = parser.parse_args()
+    transcribir_directorio(args.directorio, args.salida, args.model, args.lote, args.procesos, args.idioma)
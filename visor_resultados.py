@@ -0,0 +1,124 @@
+import re
+
+from cache_resultados import leer_resultado_cacheado
+from resultados import Resultado, sin_punto_y_coma
+
+# Vista de resultados grandes sin traerlos enteros a la interfaz. La consulta
+# generada se envuelve en otra que aplica en SQLite los filtros y el orden de
+# la tabla, y solo se lee la ventana visible (LIMIT/OFFSET). El total de filas,
+# el resumen por columna y los datos de los graficos tambien se calculan en
+# SQLite con agregados, de modo que lo que viaja al navegador es siempre
+# pequeno aunque el resultado tenga millones de filas. Todas las lecturas pasan
+# por la cache de resultados: cambiar de pagina o repintar no repite consultas.
+OPERADORES = {
+    "contiene": "LIKE",
+    "=": "=",
+    "!=": "!=",
+    ">": ">",
+    ">=": ">=",
+    "<": "<",
+    "<=": "<=",
+}
+SIN_ORDEN = "(sin orden)"
+MAX_GRUPOS = 50
+BINS_HISTOGRAMA = 20
+AGREGACIONES = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+
+def _columna(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+# Literal SQL para un valor escrito en la interfaz: los numeros se comparan
+# como numeros y el resto como texto
+def _literal(valor):
+    if re.fullmatch(r"-?\d+(?:\.\d+)?", valor.strip()):
+        return valor.strip()
+    return "'" + valor.replace("'", "''") + "'"
+
+
+def _texto(valor):
+    return None if valor is None else str(valor)
+
+
+# SQL de la vista: la consulta original con los filtros aplicados. filtros es
+# una lista de (columna, operador, valor) con operador de OPERADORES.
+def consulta_vista(sql_query, columnas, filtros=()):
+    sql = f"SELECT * FROM ({sin_punto_y_coma(sql_query)})"
+    condiciones = []
+    for columna, operador, valor in filtros:
+        if columna not in columnas or operador not in OPERADORES:
+            raise ValueError(f"Filtro no valido: {columna} {operador}")
+        if operador == "contiene":
+            condiciones.append(f"{_columna(columna)} LIKE '%' || {_literal(valor)} || '%'")
+        else:
+            condiciones.append(f"{_columna(columna)} {OPERADORES[operador]} {_literal(valor)}")
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    return sql
+
+
+# Una ventana de filas de la vista. El orden se aplica aqui y no en la vista:
+# con ORDER BY ... LIMIT SQLite solo guarda las filas de la ventana al ordenar,
+# y los agregados (total, resumen, graficos) no pagan una ordenacion inutil.
+def leer_ventana(db_path, sql_vista, pagina, tam_pagina, orden=None, descendente=False):
+    ventana = sql_vista
+    if orden and orden != SIN_ORDEN:
+        ventana += f" ORDER BY {_columna(orden)}{' DESC' if descendente else ''}"
+    ventana += f" LIMIT {int(tam_pagina)} OFFSET {int(pagina) * int(tam_pagina)}"
+    resultado, _ = leer_resultado_cacheado(db_path, ventana, max_filas=tam_pagina)
+    return resultado
+
+
+def contar(db_path, sql_vista):
+    resultado, _ = leer_resultado_cacheado(db_path, f"SELECT COUNT(*) FROM ({sql_vista})")
+    return resultado.filas[0][0]
+
+
+# Resumen por columna (no nulos, min, max y media de los valores numericos)
+# en una sola pasada de SQLite. Devuelve un Resultado con una fila por columna;
+# min y max van como texto porque cada columna tiene su propio tipo.
+def resumen(db_path, sql_vista, columnas):
+    agregados = []
+    for columna in columnas:
+        c = _columna(columna)
+        agregados += [
+            f"COUNT({c})",
+            f"MIN({c})",
+            f"MAX({c})",
+            f"AVG(CASE WHEN typeof({c}) IN ('integer', 'real') THEN {c} END)",
+        ]
+    resultado, _ = leer_resultado_cacheado(db_path, f"SELECT COUNT(*), {', '.join(agregados)} FROM ({sql_vista})")
+    fila = resultado.filas[0]
+    total = fila[0]
+    filas = []
+    for i, columna in enumerate(columnas):
+        no_nulos, minimo, maximo, media = fila[1 + i * 4:5 + i * 4]
+        filas.append((columna, no_nulos, total - no_nulos, _texto(minimo), _texto(maximo), media))
+    return Resultado(["columna", "no_nulos", "nulos", "min", "max", "media"], filas)
+
+
+# Datos de un grafico de barras: AGREGACION(y) por cada valor de x, los
+# MAX_GRUPOS grupos mayores. Sin y se cuentan las filas.
+def agrupar(db_path, sql_vista, x, y=None, agregacion="COUNT", max_grupos=MAX_GRUPOS):
+    if agregacion not in AGREGACIONES:
+        raise ValueError(f"Agregacion no valida: {agregacion}")
+    valor = f"{agregacion}({_columna(y)})" if y else "COUNT(*)"
+    sql = (f"SELECT {_columna(x)} AS {_columna(x)}, {valor} AS valor FROM ({sql_vista}) "
+           f"GROUP BY 1 ORDER BY 2 DESC LIMIT {int(max_grupos)}")
+    resultado, _ = leer_resultado_cacheado(db_path, sql)
+    return resultado
+
+
+# Histograma de una columna numerica en `bins` tramos de igual ancho
+def histograma(db_path, sql_vista, columna, bins=BINS_HISTOGRAMA):
+    c = _columna(columna)
+    minimo, maximo = leer_resultado_cacheado(db_path, f"SELECT MIN({c}), MAX({c}) FROM ({sql_vista})")[0].filas[0]
+    if not isinstance(minimo, (int, float)) or not isinstance(maximo, (int, float)):
+        raise ValueError(f"La columna {columna} no es numerica")
+    ancho = (maximo - minimo) / bins or 1
+    sql = (f"SELECT MIN(CAST(({c} - {minimo!r}) / {ancho!r} AS INTEGER), {bins - 1}) AS tramo, COUNT(*) "
+           f"FROM ({sql_vista}) WHERE typeof({c}) IN ('integer', 'real') GROUP BY 1 ORDER BY 1")
+    resultado, _ = leer_resultado_cacheado(db_path, sql)
+    filas = [(f"{minimo + tramo * ancho:.4g} - {minimo + (tramo + 1) * ancho:.4g}", n) for tramo, n in resultado.filas]
+    return Resultado([columna, "filas"], filas)